@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark of Tao.get_output, in lines/s.
+
+libtao only provides the output one line at a time, through
+tao_c_out_io_buffer_get_line, so both paths make one ctypes call per line.
+get_output binds the function once, instead of looking it up per line.
+
+Requires libtao. Example:
+
+    python benchmarks/bench_get_output.py \
+        -init $ACC_ROOT_DIR/regression_tests/python_test/cesr/tao.init -noplot
+
+The command whose output is retrieved can be changed with --cmd.
+"""
+import argparse
+import os
+import time
+
+from pytao import Tao
+
+
+def get_output_lookup_per_line(tao):
+    """
+    The original retrieval, looking up the ctypes function for every line.
+    """
+    n_lines = tao.so_lib.tao_c_out_io_buffer_num_lines()
+    return [tao.so_lib.tao_c_out_io_buffer_get_line(i).decode('utf-8') for i in range(1, n_lines+1)]
+
+
+def get_output(tao):
+    return tao.get_output(reset=False)
+
+
+def timeit(func, tao, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        lines = func(tao)
+        best = min(best, time.perf_counter() - t0)
+    return best, len(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cmd', default='show lattice -all', help='Tao command that produces the output')
+    parser.add_argument('--repeat', type=int, default=20)
+    args, init = parser.parse_known_args()
+
+    tao = Tao(os.path.expandvars(' '.join(init)))
+    tao.so_lib.tao_c_command(args.cmd.encode('utf-8'))
+
+    results = {'original': timeit(get_output_lookup_per_line, tao, args.repeat),
+               'get_output': timeit(get_output, tao, args.repeat)}
+    tao.reset_output()
+
+    print(f'Tao> {args.cmd}')
+    for name, (dt, n_lines) in results.items():
+        print(f'{name:>10}: {n_lines} lines in {dt*1e3:.3f} ms, {n_lines/dt:,.0f} lines/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark of lat_table and lat_list_multi (one lat_list command per column)
+against simple_lat_table (one lat_ele1 command per element).
+
+Requires libtao. Example:
+
+    python benchmarks/bench_lat_table.py \
+        -init $ACC_ROOT_DIR/regression_tests/python_test/cesr/tao.init -noplot
+
+The twiss columns of both tables are compared, and the command counts
+and times are printed.
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from pytao import Tao
+from pytao.tao_ctypes.util import simple_lat_table
+
+
+def lat_list_who(key):
+    """
+    lat_list {who} for a simple_lat_table twiss key, like beta_a -> ele.a.beta
+    """
+    if key == 'name':
+        return 'ele.name'
+    if key == 'ix_ele':
+        return 'ele.ix_ele'
+    m = re.fullmatch(r'(beta|alpha|gamma|phi|eta|etap)_([ab])', key)
+    if m:
+        return f'ele.{m.group(2)}.{m.group(1)}'
+    return None
+
+
+def timed(tao, func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        # Results are not served from the command cache
+        tao.cmd_cache.clear()
+        with tao.collect_stats() as stats:
+            t0 = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - t0)
+    n_cmds = sum(d['count'] for d in stats.as_dict().values())
+    return result, best, n_cmds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ix-branch', default='0')
+    parser.add_argument('--repeat', type=int, default=3)
+    args, init = parser.parse_known_args()
+
+    tao = Tao(os.path.expandvars(' '.join(init)))
+
+    old, t_old, n_old = timed(tao, lambda: simple_lat_table(tao, ix_branch=args.ix_branch, who='twiss'), args.repeat)
+    whos = {key: lat_list_who(key) for key in old if lat_list_who(key)}
+    new, t_new, n_new = timed(tao, lambda: tao.lat_table(list(whos.values()), ix_branch=args.ix_branch), args.repeat)
+
+    multi, t_multi, n_multi = timed(tao, lambda: tao.lat_list_multi('*', list(whos.values()), ix_branch=args.ix_branch), args.repeat)
+    # Reusing the memory
+    _, t_out, _ = timed(tao, lambda: tao.lat_list_multi('*', list(whos.values()), ix_branch=args.ix_branch, out=multi), args.repeat)
+
+    print(f'simple_lat_table: {t_old*1e3:10.3f} ms, {n_old} commands')
+    print(f'       lat_table: {t_new*1e3:10.3f} ms, {n_new} commands, {t_old/t_new:.1f}x faster')
+    print(f'  lat_list_multi: {t_multi*1e3:10.3f} ms, {n_multi} commands, {t_old/t_multi:.1f}x faster')
+    print(f' ... with out=  : {t_out*1e3:10.3f} ms')
+
+    for key, who in whos.items():
+        a, b = np.array(old[key]), new[who]
+        if a.dtype.kind in 'fi':
+            same = len(a) == len(b) and np.allclose(a, b, rtol=1e-10, atol=0)
+        else:
+            same = len(a) == len(b) and bool(np.all(a == b))
+        same = same and bool(np.all(multi[who] == b))
+        print(f'{key:>10} == {who:<12} {"OK" if same else "MISMATCH"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the pytao-side parsing of Tao python command output.
+
+Every parse_* function in pytao.util.parsers, plus parse_tao_python_data
+and tao_parameter_dict, is run on synthetic output sized like a real
+lattice (see synthetic.py). No libtao is needed.
+
+Times are normalized by a short pure-Python calibration loop, so that
+baselines saved on one machine can be compared on another.
+
+    python benchmarks/bench_parsers.py                     # Run all
+    python benchmarks/bench_parsers.py -k derivative       # Run matching cases
+    python benchmarks/bench_parsers.py --save              # Store baselines
+    python benchmarks/bench_parsers.py --compare           # Exit 1 on regression
+
+Baselines are stored in benchmarks/baselines/parsers.json. Save new
+baselines when a change makes parsing intentionally slower or faster.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic  # noqa: E402
+
+from pytao.tao_ctypes.util import parse_tao_python_data  # noqa: E402
+from pytao.util import parsers  # noqa: E402
+from pytao.util.parameters import tao_parameter_dict  # noqa: E402
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baselines', 'parsers.json')
+
+# name: (function, callable returning the arguments)
+CASES = {
+    'data_d_array_5k': (parsers.parse_data_d_array, lambda: (synthetic.data_d_array(5_000),)),
+    'data_d_array_5k_columns': (parsers.parse_data_d_array, lambda: (synthetic.data_d_array(5_000), 'columns')),
+    'data_d_array_5k_structured': (parsers.parse_data_d_array, lambda: (synthetic.data_d_array(5_000), 'structured')),
+    'derivative_1kx1k': (parsers.parse_derivative, lambda: (synthetic.derivative(1_000, 1_000),)),
+    'derivative_1kx1k_sparse': (parsers.parse_derivative, lambda: (synthetic.derivative(1_000, 1_000, density=0.1), True)),
+    'lat_ele_list_10k': (parsers.parse_lat_ele_list, lambda: (synthetic.lat_ele_list(10_000),)),
+    'matrix': (parsers.parse_matrix, lambda: (synthetic.matrix(),)),
+    'plot_list_template_200': (parsers.parse_plot_list, lambda: (synthetic.plot_list_templates(200),)),
+    'plot_list_region_50': (parsers.parse_plot_list, lambda: (synthetic.plot_list_regions(50),)),
+    'spin_invariant_10k': (parsers.parse_spin_invariant, lambda: (synthetic.spin_invariant(10_000),)),
+    'taylor_map_order5': (parsers.parse_taylor_map, lambda: (synthetic.taylor_map(5),)),
+    'taylor_map_order5_array': (parsers.parse_taylor_map, lambda: (synthetic.taylor_map(5), True)),
+    'var_v_array_1k': (parsers.parse_var_v_array, lambda: (synthetic.var_v_array(1_000),)),
+    'tao_python_data_global': (parse_tao_python_data, lambda: (synthetic.tao_global(),)),
+    'tao_python_data_bmad_com': (parse_tao_python_data, lambda: (synthetic.bmad_com(),)),
+    'tao_python_data_gen_attribs': (parse_tao_python_data, lambda: (synthetic.ele_gen_attribs(100),)),
+    'tao_python_data_gen_attribs_10k': (parse_tao_python_data, lambda: (synthetic.ele_gen_attribs(10_000),)),
+    'tao_parameter_dict_global': (tao_parameter_dict, lambda: (synthetic.tao_global(),)),
+    'tao_parameter_dict_gen_attribs_10k': (tao_parameter_dict, lambda: (synthetic.ele_gen_attribs(10_000),)),
+}
+
+
+def calibrate(repeat=20):
+    """
+    Seconds for a fixed pure-Python workload, similar to parsing.
+    """
+    strs = [f'{0.1*i: .16E}' for i in range(10_000)]
+    return min(timeit.repeat(lambda: [float(s) for s in strs], number=10, repeat=repeat)) / 10
+
+
+def time_case(func, args, repeat=5):
+    """
+    Best time in seconds of one call of func(*args).
+    """
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(names, repeat=5):
+    results = {}
+    for name in names:
+        func, make_args = CASES[name]
+        try:
+            results[name] = time_case(func, make_args(), repeat=repeat)
+        except ImportError as ex:
+            # Optional dependency
+            print(f'{name:<40}{"skipped":>12}: {ex}')
+            continue
+        print(f'{name:<40}{results[name]*1e3:>12.4f} ms', flush=True)
+    return results
+
+
+def compare(results, calibration, baseline, tolerance):
+    """
+    Prints the normalized times against the baseline, and returns the list
+    of cases slower than tolerance times the baseline.
+    """
+    scale = baseline['calibration'] / calibration
+    regressions = []
+    print(f'\n{"case":<40}{"baseline [ms]":>15}{"now [ms]":>12}{"ratio":>8}')
+    for name, t in results.items():
+        t0 = baseline['results'].get(name)
+        if t0 is None:
+            print(f'{name:<40}{"-":>15}{t*scale*1e3:>12.4f}{"new":>8}')
+            continue
+        ratio = t * scale / t0
+        flag = ''
+        if ratio > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:<40}{t0*1e3:>15.4f}{t*scale*1e3:>12.4f}{ratio:>8.2f}{flag}')
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('-k', dest='match', default='', help='Only run cases containing this string')
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--save', action='store_true', help='Save the results as the baselines')
+    p.add_argument('--compare', action='store_true', help='Compare to the baselines, exit 1 on regression')
+    p.add_argument('--tolerance', type=float, default=1.5,
+                   help='Maximum allowed ratio of normalized time to baseline (default 1.5)')
+    p.add_argument('--baseline-file', default=BASELINE_FILE)
+    args = p.parse_args()
+
+    names = [name for name in CASES if args.match in name]
+    results = run(names, repeat=args.repeat)
+    # Calibrated after the cases, when the CPU is at steady state
+    calibration = calibrate()
+    print(f'{"calibration":<40}{calibration*1e3:>12.4f} ms')
+
+    if args.save:
+        baseline = {'results': {}}
+        if os.path.exists(args.baseline_file):
+            with open(args.baseline_file) as f:
+                baseline = json.load(f)
+        # Store normalized to any existing calibration, so partial saves stay consistent
+        scale = baseline.get('calibration', calibration) / calibration
+        baseline['calibration'] = calibration * scale
+        baseline['machine'] = {'python': platform.python_version(), 'numpy': np.__version__,
+                               'platform': platform.platform(), 'processor': platform.processor()}
+        for name, t in results.items():
+            baseline['results'][name] = t * scale
+        os.makedirs(os.path.dirname(args.baseline_file), exist_ok=True)
+        with open(args.baseline_file, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'\nSaved baselines to {args.baseline_file}')
+
+    if args.compare:
+        with open(args.baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare(results, calibration, baseline, args.tolerance)
+        if regressions:
+            # Time flagged cases again, to rule out a noisy machine
+            print('\nRetrying:')
+            retry = run(regressions, repeat=2*args.repeat)
+            results.update({name: min(t, results[name]) for name, t in retry.items()})
+            regressions = compare({name: results[name] for name in regressions}, calibration, baseline, args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
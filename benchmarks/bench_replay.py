@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Profile the pytao-side parsing of a recorded Tao session, without libtao.
+
+Record a session with:
+
+    from pytao import TaoRecorder
+    with TaoRecorder(tao, 'session.trace.gz'):
+        ...
+
+then run:
+
+    python benchmarks/bench_replay.py session.trace.gz --repeat 5
+
+For every recorded string command, the output is parsed as interface_commands
+would (special parser, or parse_tao_python_data), and the parse time is
+compared to the time the command took when recorded.
+"""
+import argparse
+import time
+
+from pytao.tao_ctypes.cache import python_subcommand
+from pytao.tao_ctypes.replay import read_trace
+from pytao.tao_ctypes.stats import TaoStats, command_verb
+from pytao.tao_ctypes.util import parse_tao_python_data
+from pytao.util import parsers
+
+
+def method_name(cmd):
+    sub = python_subcommand(cmd)
+    if sub is None:
+        return None
+    sub = sub.replace(':', '_')
+    return 'tao_global' if sub == 'global' else sub
+
+
+def parser_for(cmd):
+    parser = getattr(parsers, f'parse_{method_name(cmd)}', None)
+    return parser or parse_tao_python_data
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('trace')
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    records = [r for r in read_trace(args.trace) if r['type'] == 'cmd' and python_subcommand(r['cmd'])]
+    recorded = TaoStats()
+    replayed = TaoStats()
+    # verb: (number of failed parses, first exception)
+    failures = {}
+    for r in records:
+        recorded.add(r['cmd'], 'libtao', r['dt'])
+        parser = parser_for(r['cmd'])
+        best = float('inf')
+        try:
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                parser(r['lines'])
+                best = min(best, time.perf_counter() - t0)
+        except Exception as ex:
+            # Not timed, as a failed parse may stop early
+            verb = command_verb(r['cmd'])
+            n, first = failures.get(verb, (0, ex))
+            failures[verb] = (n + 1, first)
+            continue
+        replayed.timer(r['cmd'])
+        replayed.add(r['cmd'], 'parse', best)
+
+    rec = recorded.as_dict()
+    print(f'{"verb":<28}{"count":>8}{"recorded [ms]":>15}{"parse [ms]":>13}{"failed":>8}')
+    for verb, count, _, *times in replayed.rows():
+        n_failed = failures.get(verb, (0, None))[0]
+        print(f'{verb:<28}{count:>8}{rec[verb]["total"]*1e3:>15.3f}{times[-1]*1e3:>13.3f}{n_failed:>8}')
+    for verb in [verb for verb in failures if verb not in replayed.data]:
+        print(f'{verb:<28}{0:>8}{rec[verb]["total"]*1e3:>15.3f}{"-":>13}{failures[verb][0]:>8}')
+
+    if failures:
+        print(f'\n{sum(n for n, _ in failures.values())} of {len(records)} outputs could not be parsed:')
+        for verb, (n, ex) in failures.items():
+            print(f'  {verb}: {n} x {ex!r}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark of Tao() construction time: eager vs. lazy binding of the
+methods in interface_commands and extra_commands.
+
+Each sample runs in a fresh interpreter, so that module imports are cold.
+If libtao cannot be found, the library loading is skipped and only the
+method binding is timed.
+
+    python benchmarks/bench_tao_startup.py --repeat 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+SETUP = """
+import time
+import types
+from pytao.tao_ctypes.core import Tao
+
+def make_tao():
+    try:
+        return Tao()
+    except ValueError:
+        # No libtao
+        return Tao.__new__(Tao)
+
+def eager_bind(tao):
+    # Tao.__init__ binding before it was made lazy
+    from pytao import interface_commands
+    from pytao.tao_ctypes import extra_commands
+    for module in (interface_commands, extra_commands):
+        deny_list = getattr(module, '__deny_list', [])
+        methods = [m for m in dir(module) if not m.startswith('__') and m not in deny_list]
+        for m in methods:
+            func = module.__dict__[m]
+            setattr(tao, m, types.MethodType(func, tao))
+"""
+
+SAMPLE = {
+    'eager': SETUP + """
+t0 = time.perf_counter()
+tao = make_tao()
+eager_bind(tao)
+print(time.perf_counter() - t0)
+""",
+    'lazy': SETUP + """
+t0 = time.perf_counter()
+tao = make_tao()
+print(time.perf_counter() - t0)
+""",
+    'lazy_first_call': SETUP + """
+t0 = time.perf_counter()
+tao = make_tao()
+tao.lat_list
+print(time.perf_counter() - t0)
+""",
+}
+
+
+def sample(code):
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return float(out.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    for name, code in SAMPLE.items():
+        times = [sample(code) for _ in range(args.repeat)]
+        print(f'{name:>16}: median {statistics.median(times)*1e3:8.3f} ms, min {min(times)*1e3:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Synthetic Tao python command outputs, sized like real lattices.
+
+Used by the parsing benchmarks. Formats follow tao_python_cmd.f90.
+"""
+import itertools
+
+import numpy as np
+
+
+def lat_ele_list(n=10_000):
+    return [f'{i};Q{i:05d}' for i in range(n)]
+
+
+def data_d_array(n=5_000):
+    return [f'{i};orbit.x;target;;;BPM{i:05d};0.0000000E+00;{1e-4*np.sin(i): .16E};0.0000000E+00;T;T;T;1.0000000E+06;T'
+            for i in range(1, n+1)]
+
+
+def derivative(n_data=1_000, n_var=1_000, per_line=10, n_universe=1, density=1.0, seed=0):
+    """
+    Rows of dModel/dVar, split into lines of per_line values:
+        ix_uni;ix_data;ix_var_start;values...
+    density < 1 sets a fraction of the entries to exactly zero.
+    """
+    rng = np.random.default_rng(seed)
+    lines = []
+    for iu in range(1, n_universe+1):
+        m = rng.normal(size=(n_data, n_var))
+        if density < 1:
+            m[rng.random(size=m.shape) > density] = 0
+        for id in range(n_data):
+            for iv in range(0, n_var, per_line):
+                vals = ';'.join(f'{v: .7E}' for v in m[id, iv:iv+per_line])
+                lines.append(f'{iu};{id+1};{iv+1};{vals}')
+    return lines
+
+
+def matrix():
+    return [f'{i};' + ';'.join(f'{0.1*i*j: .16E}' for j in range(1, 8)) for i in range(1, 7)]
+
+
+def plot_list_templates(n=200):
+    return [f'{i};template{i}' for i in range(1, n+1)]
+
+
+def plot_list_regions(n=50):
+    return [f'{i};r{i};plot{i};T;0.0;1.0;0.0;0.5' for i in range(1, n+1)]
+
+
+def spin_invariant(n=10_000):
+    return np.random.default_rng(0).normal(size=3*n)
+
+
+def taylor_map(order=5):
+    """
+    All terms up to order in 6 variables, for each of the 6 outputs.
+    """
+    lines = []
+    for out in range(1, 7):
+        expns = [expn for expn in itertools.product(range(order+1), repeat=6) if sum(expn) <= order]
+        for i, expn in enumerate(expns, 1):
+            lines.append(f'{out};{i};{1.0/(1+sum(expn)): .16E};' + ';'.join(str(e) for e in expn))
+    return lines
+
+
+def var_v_array(n=1_000):
+    return [f'{i};K1;0.0000000E+00;{0.1*i: .16E};1.0000000E-01;T;T;1.0000000E+00' for i in range(1, n+1)]
+
+
+def tao_global():
+    """
+    Mixed types, like python global
+    """
+    lines = []
+    for i in range(20):
+        lines += [f'real_param{i};REAL;T;{1.23e-4*i: .16E}',
+                  f'int_param{i};INT;T;{i}',
+                  f'logic_param{i};LOGIC;T;{"T" if i % 2 else "F"}',
+                  f'str_param{i};STR;T;value{i}',
+                  f'enum_param{i};ENUM;T;beam']
+    lines += ['beam_file;FILE;T;beam.h5',
+              'inum_param;INUM;T;3',
+              'real_arr_param;REAL_ARR;T;' + ';'.join(f'{0.5*j: .16E}' for j in range(6)),
+              'struct_param;STRUCT;T;x;REAL;1.0000000E+00;y;REAL;2.0000000E+00;n;INT;3']
+    return lines
+
+
+def bmad_com():
+    lines = []
+    for i in range(30):
+        lines += [f'param_{i};REAL;T;{1e-9*i: .16E}',
+                  f'flag_{i};LOGIC;T;F',
+                  f'n_{i};INT;T;{i}']
+    return lines
+
+
+def ele_gen_attribs(n=100):
+    """
+    Like python ele:gen_attribs, mostly REAL attributes
+    """
+    lines = []
+    for i in range(n):
+        lines.append(f'ATTRIB{i};REAL;{"T" if i % 3 else "F"};{0.01*i: .16E}')
+    lines += ['FIELD_CALC;ENUM;T;Bmad_Standard', 'IS_ON;LOGIC;T;T', 'N_SLICE;INT;T;20']
+    return lines
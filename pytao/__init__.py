@@ -5,12 +5,39 @@ place of the tao command line interface, with matplotlib plotting capabilities.
 pytao also has some pre-defined constructs for dealing with data from tao
 in the util package.
 '''
-from .tao_pexpect import tao_io
+import importlib
+
 from .tao_ctypes import Tao, TaoModel, run_tao
 from .tao_ctypes.evaluate import evaluate_tao
 from .tao_interface import tao_interface
 
+# These are only imported on first use, to keep `import pytao` fast.
+# See __getattr__
+_lazy_imports = {
+    'tao_io': '.tao_pexpect',
+    'TaoPool': '.tao_ctypes.pool',
+    'AsyncTao': '.tao_ctypes.async_tao',
+    'TaoRecorder': '.tao_ctypes.replay',
+    'TaoReplay': '.tao_ctypes.replay',
+    'TaoObjective': '.tao_ctypes.objective',
+    'BeamSnapshotWriter': '.tao_ctypes.beam_snapshots',
+    'write_beam_snapshots': '.tao_ctypes.beam_snapshots',
+}
+
+
+def __getattr__(name):
+    if name == '__version__':
+        # versioneer may call git
+        from ._version import get_versions
+        value = get_versions()['version']
+    elif name in _lazy_imports:
+        module = importlib.import_module(_lazy_imports[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_imports) | {'__version__'})
@@ -13,4 +13,11 @@ on the command line.  <args> can be any switches that tao supports.
 Additionally, the GUI supports the -gui_init switch, which takes a
 gui.init file as its argument (see GUI documentation for more info)
 '''
-from .main import tao_root_window
+
+
+def __getattr__(name):
+    # main imports matplotlib and tkinter. Only load it when it is needed.
+    if name == 'tao_root_window':
+        from .main import tao_root_window
+        return tao_root_window
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
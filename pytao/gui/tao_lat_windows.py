@@ -149,8 +149,7 @@ class tao_ele_window(tao_list_window):
                         x = self.list_frame.scale_mp_var.get()
                     except:
                         self.list_frame.scale_mp_var = tk.BooleanVar()
-                    tao_output = self.pipe.cmd_in(
-                            "python ele:" + key + ' ' + self.element.id)
+                    tao_output = self.element.cmd_in(key)
                     self.p_frames.append(
                             tao_multipole_frame(self.list_frame, tao_output, self.pipe))
                     self.p_names.append(key)
@@ -161,10 +160,7 @@ class tao_ele_window(tao_list_window):
                 if key == "lord_slave": # extremely special case
                     self.sh_b_list.append(tk.Button(self.list_frame, text=key))
                     ls_frame = tk.Frame(self.list_frame)
-                    ls_list = self.pipe.cmd_in("python ele:lord_slave "
-                            + self.ele_wids.uni.get() + '@' + self.ele_wids.branch.get()
-                            + '>>' + self.ele_wids.ele.get() + '|'
-                            + (self.ele_wids.bmd.get()).lower())
+                    ls_list = self.element.cmd_in('lord_slave')
                     ls_list = ls_list.splitlines()
                     self.tao_lists.append(ls_list) # Don't want to misalign indices
                     ls_cols = ['Index', 'Name', 'Key', 'Slave/Lord Status']
@@ -218,13 +214,11 @@ class tao_ele_window(tao_list_window):
                 if key == 'mat6':
                     #tao_list = '\n' + self.pipe.cmd_in("python ele:mat6 "
                     #        + self.element.id + ' err')
-                    tao_list = self.pipe.cmd_in("python ele:mat6 "
-                            + self.element.id + ' mat6')
+                    tao_list = self.element.cmd_in('mat6', 'mat6')
                     #tao_list += '\n' + self.pipe.cmd_in("python ele:mat6 "
                     #        + self.element.id + ' vec0')
                 else:
-                    tao_list = self.pipe.cmd_in("python ele:" + key
-                            + ' ' + self.element.id)
+                    tao_list = self.element.cmd_in(key)
                 self.tao_lists.append(tao_list.splitlines())
                 for j in range(len(self.tao_lists[i])):
                     self.tao_lists[i][j] = str_to_tao_param(self.tao_lists[i][j])
@@ -250,15 +244,13 @@ class tao_ele_window(tao_list_window):
                     title_frame.grid(row=0, column=1, sticky='EW')
                 if key == 'mat6':
                     # add symplectic error
-                    sym_err = self.pipe.cmd_in('python ele:mat6 '
-                            + self.element.id + ' err')
+                    sym_err = self.element.cmd_in('mat6', 'err')
                     sym_err = tk_tao_parameter(str_to_tao_param(sym_err),
                             self.p_frames[i], self.pipe)
                     sym_err.tk_label.grid(row=0, column=0, sticky='W')
                     sym_err.tk_wid.grid(row=0, column=1, sticky='W')
                     # add vec0
-                    vec0 = self.pipe.cmd_in('python ele:mat6 '
-                            + self.element.id + ' vec0')
+                    vec0 = self.element.cmd_in('mat6', 'vec0')
                     vec0 = tk_tao_parameter(str_to_tao_param(vec0),
                             self.p_frames[i], self.pipe)
                     separator = tk.Frame(self.p_frames[i], height=10, bd=1).grid(
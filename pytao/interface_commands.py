@@ -1,4 +1,6 @@
 
+import time
+
 from pytao.tao_ctypes.util import parse_tao_python_data
 from pytao.util.parameters import tao_parameter_dict
 from pytao.util import parsers as __parsers
@@ -12,6 +14,17 @@ def __execute(tao, cmd, as_dict=True, raises=True, method_name=None, cmd_type="s
     }
     func = func_for_type.get(cmd_type, tao.cmd)
     ret = func(cmd, raises=raises)
+    # Timing statistics, see Tao.collect_stats
+    stats = getattr(tao, '_stats', None)
+    if stats is None:
+        return __parse(ret, as_dict, method_name, cmd_type)
+    t0 = time.perf_counter()
+    data = __parse(ret, as_dict, method_name, cmd_type)
+    stats.add(cmd, 'parse', time.perf_counter() - t0)
+    return data
+
+
+def __parse(ret, as_dict=True, method_name=None, cmd_type="string_list"):
     special_parser = getattr(__parsers, f'parse_{method_name}', "")
     if special_parser:
         data = special_parser(ret)
@@ -1,4 +1,23 @@
+import importlib
+
 from .core import *
 
 initialized = False
 
+# These are only imported on first use. See __getattr__
+_lazy_imports = {
+    'TaoPool': '.pool',
+    'AsyncTao': '.async_tao',
+    'TaoRecorder': '.replay',
+    'TaoReplay': '.replay',
+    'TaoObjective': '.objective',
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_imports:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    module = importlib.import_module(_lazy_imports[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,153 @@
+"""
+asyncio front-end for Tao.
+
+A blocking libtao call (for example, tracking a beam) would stall every
+other coroutine in an event loop. AsyncTao runs all Tao calls on a single
+dedicated worker thread that owns the Tao instance, and exposes them as
+coroutines.
+
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pytao.tao_ctypes.core import Tao, command_function
+
+
+class AsyncTao:
+    """
+    asyncio facade for Tao.
+
+    Every Tao method (cmd, cmd_real, cmd_integer, init, and the methods in
+    interface_commands and extra_commands) is available as a coroutine,
+    with the same arguments, plus an optional timeout in seconds.
+
+    Calls are queued, and run in order on one worker thread that owns
+    the Tao instance. Each call retrieves and resets the Tao output buffer
+    on the worker thread before the next one starts, so a call that times
+    out or is cancelled cannot corrupt the output of later calls:
+        - if it has not started yet, it is removed from the queue.
+        - if it is running, it runs to completion and its result is discarded.
+
+    Example:
+        async with AsyncTao('-init tao.init -noplot') as tao:
+            await tao.cmd('set global track_type = beam', timeout=60)
+            x = await tao.bunch1('end', 'x')
+
+    Parameters
+    ----------
+    init : str, optional
+        Tao init string.
+    so_lib : str, optional
+        Passed onto Tao.
+    timeout : float, optional
+        Default timeout for every call, in seconds. None means no timeout.
+    tao : Tao, optional
+        Existing Tao instance (or TaoReplay) to use instead of creating one.
+        init and so_lib are then ignored. It must only be used through
+        this AsyncTao afterwards.
+    """
+
+    def __init__(self, init='', so_lib='', timeout=None, tao=None):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncTao')
+        # Submitted calls that are not done, to be cancelled by close
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Tao is created on the worker thread. Calls are queued behind it.
+        if tao is None:
+            self._tao_future = self._executor.submit(Tao, init=init, so_lib=so_lib)
+        else:
+            self._tao_future = self._executor.submit(lambda: tao)
+        self._closed = False
+
+    def _call(self, name, args, kwargs):
+        # Runs on the worker thread.
+        # Methods are looked up on the instance, so that subclasses of Tao work.
+        return getattr(self._tao_future.result(), name)(*args, **kwargs)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    async def _run(self, name, *args, timeout=None, **kwargs):
+        if self._closed:
+            raise RuntimeError('AsyncTao is closed')
+        if timeout is None:
+            timeout = self.timeout
+        with self._lock:
+            future = self._executor.submit(self._call, name, args, kwargs)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        # Cancellation of the awaitable (by wait_for or the caller)
+        # cancels the queued call if it has not started.
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    async def tao(self):
+        """
+        Returns the underlying Tao instance, after it is initialized.
+        It must only be used through this AsyncTao.
+        """
+        return await asyncio.wrap_future(self._tao_future)
+
+    async def init(self, cmd, timeout=None):
+        return await self._run('init', cmd, timeout=timeout)
+
+    async def cmd(self, cmd, raises=True, timeout=None):
+        return await self._run('cmd', cmd, raises=raises, timeout=timeout)
+
+    async def cmds(self, cmds, timeout=None, **kwargs):
+        return await self._run('cmds', cmds, timeout=timeout, **kwargs)
+
+    async def cmd_real(self, cmd, raises=True, timeout=None):
+        # Always copies: a scratch buffer view would be invalidated by queued calls.
+        return await self._run('cmd_real', cmd, raises=raises, timeout=timeout)
+
+    async def cmd_integer(self, cmd, raises=True, timeout=None):
+        return await self._run('cmd_integer', cmd, raises=raises, timeout=timeout)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        func = command_function(name)
+        if func is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        @functools.wraps(func)
+        async def method(*args, timeout=None, **kwargs):
+            return await self._run(name, *args, timeout=timeout, **kwargs)
+
+        # Drop the tao argument from the signature
+        sig = inspect.signature(func)
+        params = list(sig.parameters.values())[1:]
+        params.append(inspect.Parameter('timeout', inspect.Parameter.KEYWORD_ONLY, default=None))
+        method.__signature__ = sig.replace(parameters=params)
+
+        setattr(self, name, method)
+        return method
+
+    def close(self):
+        """
+        Waits for running calls to finish, cancels queued calls,
+        and stops the worker thread.
+        """
+        self._closed = True
+        # As shutdown(cancel_futures=True), which needs Python 3.9.
+        # Running calls cannot be cancelled, and are waited for.
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        await self.tao()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
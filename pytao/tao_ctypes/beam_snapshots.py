@@ -0,0 +1,269 @@
+"""
+Streaming export of beam snapshots along the lattice to HDF5.
+
+write_beam_snapshots pulls the bunch at each element with bunch1 (see
+bunch_data), and writes it as an openPMD-beamphysics particle group in
+chunked, compressed datasets. Only one snapshot (or a bounded number, with
+a background writer) is held in memory at a time, so any number of save
+points can be exported. Snapshots are flushed as they are written, and an
+interrupted export is resumed by calling it again with the same file.
+
+Example:
+    write_beam_snapshots(tao, 'beam.h5', ['BEGINNING', 'Q1', 'END'], background=True)
+
+    from pmd_beamphysics import ParticleGroup
+    with h5py.File('beam.h5', 'r') as h5:
+        P = ParticleGroup(h5['data/00002/particles'])
+
+"""
+import queue
+import threading
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# openPMD-beamphysics dataset: (bunch_data key, unitSI, unitDimension)
+# unitDimension powers are of (length, mass, time, current, temperature, amount, luminous)
+PMD_DATASETS = {
+    'position/x': ('x', 1.0, (1, 0, 0, 0, 0, 0, 0)),
+    'position/y': ('y', 1.0, (1, 0, 0, 0, 0, 0, 0)),
+    'position/z': ('z', 1.0, (1, 0, 0, 0, 0, 0, 0)),
+    'momentum/x': ('px', 5.344285992678308e-28, (1, 1, -1, 0, 0, 0, 0)),
+    'momentum/y': ('py', 5.344285992678308e-28, (1, 1, -1, 0, 0, 0, 0)),
+    'momentum/z': ('pz', 5.344285992678308e-28, (1, 1, -1, 0, 0, 0, 0)),
+    'time': ('t', 1.0, (0, 0, 1, 0, 0, 0, 0)),
+    'weight': ('weight', 1.0, (0, 0, 1, 1, 0, 0, 0)),
+    'particleStatus': ('status', 1.0, (0, 0, 0, 0, 0, 0, 0)),
+}
+
+PMD_ROOT_ATTRS = {
+    'dataType': 'openPMD',
+    'openPMD': '2.0.0',
+    'openPMDextension': 'BeamPhysics;SpeciesType',
+    'basePath': '/data/%T/',
+    'particlesPath': 'particles/',
+}
+
+
+class BeamSnapshotWriter:
+    """
+    Writes bunch data dicts, as returned by bunch_data, to an HDF5 file
+    as openPMD-beamphysics particle groups:
+        /data/{index:05}/particles/
+
+    Each group has the attribute locationName. Snapshots that were completely
+    written are marked with the attribute snapshotComplete, and are
+    skipped when the file is reopened, so an export can be resumed.
+    Incomplete snapshots are removed when the file is opened.
+
+    Parameters
+    ----------
+    h5file : str
+        File to write. It is created if it does not exist.
+    compression : str, optional
+        h5py compression filter. Default: 'gzip'
+    compression_opts : optional
+        Filter options, for example the gzip level. Default: 4
+    chunk_size : int, optional
+        Maximum number of particles per chunk. Default: 2**16
+    background : bool, optional
+        If True, snapshots are written by a background thread, so that
+        the caller can continue tracking. At most max_pending snapshots
+        wait to be written, and write() blocks when the queue is full.
+    max_pending : int, optional
+        Default: 2
+    """
+
+    def __init__(self, h5file, *, compression='gzip', compression_opts=4, chunk_size=2**16,
+                 background=False, max_pending=2):
+        # h5py is only needed for writing
+        import h5py
+
+        self.h5 = h5py.File(h5file, 'a')
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.chunk_size = chunk_size
+
+        for k, v in PMD_ROOT_ATTRS.items():
+            self.h5.attrs.setdefault(k, v)
+        data = self.h5.require_group('data')
+        for name in list(data):
+            if not data[name].attrs.get('snapshotComplete', False):
+                logger.info(f'Removing incomplete snapshot {name}')
+                del data[name]
+        self._completed = {data[name].attrs['locationName']: name for name in data}
+        self._next_index = 1 + max((int(name) for name in data), default=0)
+
+        self._error = None
+        self._error_raised = False
+        self._failed = False
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._thread = threading.Thread(target=self._run, name='BeamSnapshotWriter', daemon=True)
+            self._thread.start()
+
+    def __contains__(self, location):
+        return location in self._completed
+
+    def completed(self):
+        """
+        Returns the dict of locationName: group name of the complete snapshots.
+        """
+        return dict(self._completed)
+
+    def write(self, location, data, attrs=None):
+        """
+        Writes the bunch data dict of a location (usually the element name).
+        In background mode, the arrays in data must not be changed afterwards.
+        Once the background writer has failed, raises its error.
+
+        attrs: optional dict of extra attributes for the snapshot group.
+        """
+        if location in self._completed:
+            raise ValueError(f'Snapshot at {location} already written')
+        # After a background error, every write fails with it
+        self._raise_error()
+        name = f'{self._next_index:05}'
+        self._next_index += 1
+        if self._queue is None:
+            self._write(name, location, data, attrs)
+            self._completed[location] = name
+        else:
+            # Removed again by the writer thread if the snapshot is not written
+            self._completed[location] = name
+            self._queue.put((name, location, data, attrs))
+
+    def _write(self, name, location, data, attrs):
+        g = self.h5.create_group(f'data/{name}')
+        g.attrs['locationName'] = location
+        for k, v in (attrs or {}).items():
+            g.attrs[k] = v
+
+        p = g.create_group('particles')
+        n = len(data['x'])
+        weight, status = data['weight'], data['status']
+        p.attrs['speciesType'] = data['species']
+        p.attrs['numParticles'] = n
+        p.attrs['totalCharge'] = np.sum(weight)
+        p.attrs['chargeLive'] = np.sum(weight[status == 1])
+        p.attrs['chargeUnitSI'] = 1.0
+
+        options = {}
+        if n:
+            options = {'chunks': (min(n, self.chunk_size),), 'compression': self.compression,
+                       'compression_opts': self.compression_opts, 'shuffle': True}
+        for path, (key, unit_si, unit_dimension) in PMD_DATASETS.items():
+            dset = p.create_dataset(path, data=data[key], **options)
+            dset.attrs['unitSI'] = unit_si
+            dset.attrs['unitDimension'] = unit_dimension
+
+        # Mark as complete only after everything is on disk
+        self.h5.flush()
+        g.attrs['snapshotComplete'] = True
+        self.h5.flush()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                # Nothing more is written after an error
+                if self._failed:
+                    self._completed.pop(item[1], None)
+                else:
+                    self._write(*item)
+            except Exception as ex:
+                # Raised in the calling thread
+                self._completed.pop(item[1], None)
+                self._error = ex
+                self._failed = True
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            self._error_raised = True
+            raise self._error
+
+    def close(self):
+        """
+        Waits for pending snapshots to be written, and closes the file.
+        Raises any error of the background writer.
+        """
+        if self.h5 is None:
+            return
+        try:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+            # Unless a write already raised it
+            if not self._error_raised:
+                self._raise_error()
+        finally:
+            self.h5.close()
+            self.h5 = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_beam_snapshots(tao, h5file, elements, *, which='model', ix_bunch=1,
+                         background=False, verbose=False, **kwargs):
+    """
+    Writes the bunch at each of elements to an HDF5 file, as
+    openPMD-beamphysics particle groups. See BeamSnapshotWriter.
+
+    Elements already in the file are skipped, so this resumes an
+    interrupted export.
+
+    Parameters
+    ----------
+    tao : Tao
+    h5file : str
+    elements : list of str
+        Element names or indices, for example from beam_init%saved_at.
+    which : str, optional
+        'model', 'base' or 'design'
+    ix_bunch : int, optional
+    background : bool, optional
+        Write in a background thread, while the next bunch is fetched.
+    **kwargs
+        Passed to BeamSnapshotWriter, for example compression.
+
+    Returns
+    -------
+    list of str
+        The elements written by this call.
+    """
+    written = []
+    data = None
+    with BeamSnapshotWriter(h5file, background=background, **kwargs) as writer:
+        for ele_id in elements:
+            ele_id = str(ele_id)
+            if ele_id in writer:
+                if verbose:
+                    print(f'Skipping {ele_id}, already written')
+                continue
+            if background or data is None:
+                # The writer thread holds on to the arrays
+                data = tao.bunch_data(ele_id, which=which, ix_bunch=ix_bunch, verbose=verbose)
+            else:
+                try:
+                    data = tao.bunch_data(ele_id, which=which, ix_bunch=ix_bunch, out=data, verbose=verbose)
+                except ValueError:
+                    # Different number of particles
+                    data = tao.bunch_data(ele_id, which=which, ix_bunch=ix_bunch, verbose=verbose)
+            writer.write(ele_id, data)
+            written.append(ele_id)
+    return written
+
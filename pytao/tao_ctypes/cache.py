@@ -0,0 +1,233 @@
+"""
+Result cache for read-only Tao python commands.
+
+Results are only valid for a given lattice "generation". Any command that
+is not known to be read-only (set, reinit, call, change, run, python *_create,
+python *_destroy, ...) increments the generation and invalidates the cache.
+
+Turning plot_on or lattice_calc_on off does not change the lattice. Turning
+them back on only increments the generation if another command changed the
+state while they were off, as Tao recalculates at that point.
+python global reports them, so its output is never cached.
+
+"""
+import re
+from collections import OrderedDict
+
+
+# python subcommands that never change the state of Tao,
+# and whose string output can be reused until the state changes.
+CACHEABLE_PYTHON_COMMANDS = {
+    'beam',
+    'beam_init',
+    'bmad_com',
+    'branch1',
+    'building_wall_list',
+    'building_wall_graph',
+    'constraints',
+    'data',
+    'data_d_array',
+    'data_d1_array',
+    'data_d2',
+    'data_d2_array',
+    'data_parameter',
+    'datum_has_ele',
+    'enum',
+    'floor_plan',
+    'floor_orbit',
+    'help',
+    'inum',
+    'lat_branch_list',
+    'lat_ele_list',
+    'lat_list',
+    'lat_param_units',
+    'matrix',
+    'orbit_at_s',
+    'plot_curve',
+    'plot_graph',
+    'plot_lat_layout',
+    'plot_list',
+    'plot1',
+    'ring_general',
+    'shape_list',
+    'shape_pattern_list',
+    'species_to_int',
+    'species_to_str',
+    'super_universe',
+    'taylor_map',
+    'twiss_at_s',
+    'universe',
+    'var',
+    'var_general',
+    'var_v_array',
+    'var_v1_array',
+}
+
+# All ele:xxx python subcommands are cacheable
+CACHEABLE_PYTHON_PREFIXES = ('ele:',)
+
+# Read-only python subcommands whose output should not be reused,
+# because it depends on more than the lattice state, or is array output.
+UNCACHED_READ_ONLY_PYTHON_COMMANDS = {
+    'bunch_comb',
+    'bunch_params',
+    'bunch1',
+    'da_aperture',
+    'da_params',
+    'derivative',
+    'em_field',
+    'evaluate',
+    'global',
+    'lat_calc_done',
+    'merit',
+    'plot_histogram',
+    'plot_line',
+    'plot_symbol',
+    'ptc_com',
+    'spin_invariant',
+    'spin_polarization',
+    'spin_resonance',
+    'wave',
+}
+
+
+def python_subcommand(cmd):
+    """
+    Returns the python subcommand of a command string, or None if cmd
+    is not a python command.
+
+    Example:
+        python_subcommand('python lat_list -array_out 1@0>>*|model ele.s')
+    returns:
+        'lat_list'
+    """
+    words = cmd.split()
+    if len(words) < 2 or words[0] != 'python':
+        return None
+    return words[1]
+
+
+# set global commands that only turn calculations on or off
+CALC_TOGGLE_GLOBALS = ('plot_on', 'lattice_calc_on')
+
+_CALC_TOGGLE_RE = re.compile(r'^\s*set\s+global\s+(' + '|'.join(CALC_TOGGLE_GLOBALS) + r')\s*=\s*(\S+)\s*$',
+                             re.IGNORECASE)
+
+
+def calc_toggle(cmd):
+    """
+    Returns (name, on) if cmd only sets one of CALC_TOGGLE_GLOBALS,
+    or None otherwise.
+
+    Example:
+        calc_toggle('set global lattice_calc_on = F')
+    returns:
+        ('lattice_calc_on', False)
+    """
+    m = _CALC_TOGGLE_RE.match(cmd)
+    if m is None:
+        return None
+    value = m.group(2).upper().strip('.')
+    if value not in ('T', 'F', 'TRUE', 'FALSE'):
+        return None
+    return m.group(1).lower(), value.startswith('T')
+
+
+def is_cacheable(cmd):
+    sub = python_subcommand(cmd)
+    if sub is None:
+        return False
+    return sub in CACHEABLE_PYTHON_COMMANDS or sub.startswith(CACHEABLE_PYTHON_PREFIXES)
+
+
+def is_read_only(cmd):
+    """
+    Returns True if cmd is known not to change the state of Tao.
+    """
+    if is_cacheable(cmd):
+        return True
+    sub = python_subcommand(cmd)
+    if sub is not None:
+        return sub in UNCACHED_READ_ONLY_PYTHON_COMMANDS
+    words = cmd.split(maxsplit=1)
+    # show and help only print
+    return bool(words) and words[0] in ('show', 'help')
+
+
+class CommandCache:
+    """
+    LRU cache of command string -> output lines, valid for one generation.
+
+    maxsize: maximum number of cached results. 0 disables storage,
+             but the generation is still tracked.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        # Generation when each of CALC_TOGGLE_GLOBALS was turned off
+        self._off_generation = {}
+
+    def get(self, cmd):
+        """
+        Returns the cached lines for cmd, or None.
+        """
+        lines = self._data.get(cmd)
+        if lines is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(cmd)
+        self.hits += 1
+        return list(lines)
+
+    def put(self, cmd, lines):
+        if self.maxsize <= 0:
+            return
+        self._data[cmd] = tuple(lines)
+        self._data.move_to_end(cmd)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def bump(self):
+        """
+        Increments the generation, invalidating all cached results.
+        """
+        self.generation += 1
+        self._data.clear()
+
+    def update(self, cmd):
+        """
+        To be called for every command sent to Tao.
+        Bumps the generation if cmd may have changed the state of Tao.
+        """
+        toggle = calc_toggle(cmd)
+        if toggle is None:
+            if not is_read_only(cmd):
+                self.bump()
+            return
+        name, on = toggle
+        if not on:
+            self._off_generation.setdefault(name, self.generation)
+        elif self._off_generation.pop(name, None) != self.generation:
+            # Changed while off, or not known to have been off
+            self.bump()
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Returns a dict with hits, misses, size, maxsize, generation
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'generation': self.generation}
+
+    def __repr__(self):
+        return f'CommandCache({self.stats()})'
@@ -3,11 +3,12 @@ import ctypes
 import numpy as np
 from pytao import tao_ctypes
 from pytao.tao_ctypes.util import error_in_lines
+from pytao.tao_ctypes.cache import CommandCache, is_cacheable
+from pytao.tao_ctypes.stats import TaoStats, NULL_TIMER
 from pytao.util.parameters import tao_parameter_dict
 from pytao.tao_ctypes.tools import full_path
-import tempfile
-import shutil
 import types
+from contextlib import contextmanager
 
 
 import logging
@@ -32,22 +33,19 @@ class Tao:
     tao.init("command line args here...")
     """
 
+    # Timing statistics being collected, see collect_stats
+    _stats = None
+
+    # LatticeIndex per (ix_uni, ix_branch, which), see lattice_index
+    _lattice_indexes = None
+
     #---------------------------------------------
 
-    def __init__(self, init='', so_lib=''):
-        # TL/DR; Leave this import out of the global scope.
-        #
-        # Make it lazy import to avoid cyclical dependency.
-        # at __init__.py there is an import for Tao which
-        # would cause interface_commands to be imported always
-        # once we import pytao.
-        # If by any chance the interface_commands.py is broken and
-        # we try to autogenerate it will complain about the broken
-        # interface_commands file.
-        
-        from pytao import interface_commands 
-        from pytao.tao_ctypes import extra_commands
-        
+    def __init__(self, init='', so_lib='', cache_size=0):
+        # Results of read-only python commands, see cmd.
+        # Off by default: cache_size > 0 enables it.
+        self.cmd_cache = CommandCache(maxsize=cache_size)
+
         # Library needs to be set.
         self.so_lib_file = None
         if so_lib == '':
@@ -73,9 +71,10 @@ class Tao:
         self.so_lib.tao_c_out_io_buffer_get_line.restype = ctypes.c_char_p
         self.so_lib.tao_c_out_io_buffer_reset.restype = None
 
-        # Extra methods
-        self._import_commands(interface_commands)
-        self._import_commands(extra_commands)
+        # Array getters return pointers to the scratch space.
+        # The size is only known per command, and is applied in scratch_array.
+        self.so_lib.tao_c_get_real_array.restype = ctypes.POINTER(ctypes.c_double)
+        self.so_lib.tao_c_get_integer_array.restype = ctypes.POINTER(ctypes.c_int)
 
         try:
             self.register_cell_magic()
@@ -86,13 +85,20 @@ class Tao:
             self.init(init)
             
             
-    def _import_commands(self, module):
-        deny_list = getattr(module, '__deny_list', [])
-        # Add in methods from `interface_commands`
-        methods = [m for m in dir(module) if not m.startswith('__') and m not in deny_list]
-        for m in methods:
-            func = module.__dict__[m]
-            setattr(self, m, types.MethodType(func, self))            
+    def __getattr__(self, name):
+        # Methods from `interface_commands` and `extra_commands` are
+        # bound on first access, and then stored on the instance.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        func = command_function(name)
+        if func is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        method = types.MethodType(func, self)
+        setattr(self, name, method)
+        return method
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(command_names()))
 
     #---------------------------------------------
     # Used by init and cmd routines
@@ -103,7 +109,9 @@ class Tao:
         If reset, the internal Tao buffers will be reset.
         """
         n_lines = self.so_lib.tao_c_out_io_buffer_num_lines()
-        lines = [self.so_lib.tao_c_out_io_buffer_get_line(i).decode('utf-8') for i in range(1, n_lines+1)]
+        # libtao only provides the output one line at a time
+        get_line = self.so_lib.tao_c_out_io_buffer_get_line
+        lines = [get_line(i).decode('utf-8') for i in range(1, n_lines+1)]
         if reset:
             self.so_lib.tao_c_out_io_buffer_reset()
         return lines
@@ -125,6 +133,7 @@ class Tao:
             if err != 0:
                 raise ValueError(f'Unable to init Tao with: {cmd}')
             tao_ctypes.initialized = True
+            self.cmd_cache.bump()
             return self.get_output()
         else:
             # Reinit
@@ -133,30 +142,57 @@ class Tao:
     #---------------------------------------------
     # Send a command to Tao and return the output
 
-    def cmd(self, cmd, raises=True):
+    def cmd(self, cmd, raises=True, cache=True):
         """
         Runs a command, and returns the text output
         
         cmd: command string
         raises: will raise an exception of [ERROR or [FATAL is detected in the output
+        cache: if True, the output of read-only python commands is reused
+               until a command that may change the lattice is run.
+               Only used if the cache is enabled, with Tao(cache_size=...).
+               See: cmd_cache
         
         Returns a list of strings
         """
+        timer = NULL_TIMER if self._stats is None else self._stats.timer(cmd)
+
+        cacheable = cache and self.cmd_cache.maxsize > 0 and is_cacheable(cmd)
+        if cacheable:
+            lines = self.cmd_cache.get(cmd)
+            if lines is not None:
+                logger.debug(f'Tao> {cmd} (cached)')
+                timer.hit()
+                return lines
         
         logger.debug(f'Tao> {cmd}')
 
         self.so_lib.tao_c_command(cmd.encode('utf-8'))
+        timer.lap('libtao')
         lines = self.get_output()
+        self.cmd_cache.update(cmd)
+        timer.lap('output')
         
         # Error checking
-        if not raises:
+        if not raises and not cacheable:
             return lines
         
         err = error_in_lines(lines)
-        if err:
+        timer.lap('errors')
+        if cacheable and not err:
+            self.cmd_cache.put(cmd, lines)
+        if err and raises:
             raise RuntimeError(f'Command: {cmd} causes error: {err}')
         
         return lines
+
+    @property
+    def generation(self):
+        """
+        Lattice generation counter.
+        Incremented by every command that may change the state of Tao.
+        """
+        return self.cmd_cache.generation
     
     def cmds(self, cmds, 
              suppress_lattice_calc=True, 
@@ -185,93 +221,168 @@ class Tao:
             list of results corresponding to the commands
         
         """
-        # Get globals to detect plotting
-        g = self.tao_global()
-        ploton, laton = g['plot_on'], g['lattice_calc_on']
-        
-        if suppress_plotting and ploton:
-            self.cmd('set global plot_on = F')
-        if suppress_lattice_calc and laton:
-            self.cmd('set global lattice_calc_on = F')            
-    
-        # Actually apply commands
         results = []
-        for cmd in cmds:
-            res = self.cmd(cmd, raises=raises)
-            results.append(res)
-            
-        if suppress_plotting and ploton:
-            self.cmd('set global plot_on = T')
-        if suppress_lattice_calc and laton:
-            self.cmd('set global lattice_calc_on = T')               
+        with self.suspend_calc(lattice_calc=suppress_lattice_calc, plotting=suppress_plotting):
+            for cmd in cmds:
+                res = self.cmd(cmd, raises=raises)
+                results.append(res)
             
         return results
             
         
     
+    @contextmanager
+    def suspend_calc(self, lattice_calc=True, plotting=True):
+        """
+        Context manager that turns off lattice calculations and plotting
+        within a block, if they are on, and turns them back on at the end,
+        even if an exception is raised.
+
+        Example:
+            with tao.suspend_calc():
+                tao.cmd('set ele Q1 k1 = 0.1')
+                tao.cmd('set ele Q2 k1 = -0.1')
+            # The lattice is calculated once here
+        """
+        # Get globals to detect plotting
+        g = self.tao_global() if (lattice_calc or plotting) else {}
+        ploton = plotting and g['plot_on']
+        laton = lattice_calc and g['lattice_calc_on']
+
+        if ploton:
+            self.cmd('set global plot_on = F')
+        if laton:
+            self.cmd('set global lattice_calc_on = F')
+        try:
+            yield
+        finally:
+            if ploton:
+                self.cmd('set global plot_on = T')
+            if laton:
+                self.cmd('set global lattice_calc_on = T')
+
     #---------------------------------------------
     # Get real array output.
     # Only python commands that load the real array buffer can be used with this method.
 
-    def cmd_real (self, cmd, raises=True):
-        logger.debug(f'Tao> {cmd}')
-        
-        self.so_lib.tao_c_command(cmd.encode('utf-8'))
-        n = self.so_lib.tao_c_real_array_size()
-        self.so_lib.tao_c_get_real_array.restype = ctypes.POINTER(ctypes.c_double * n)
+    def cmd_real(self, cmd, raises=True, *, copy=True, out=None):
+        """
+        Runs a command, and returns the real array output.
 
-        # Check the output for errors
-        lines = self.get_output(reset=False)
-        err = error_in_lines(lines)
-        if err:
-            self.reset_output()
-            if raises:
-                raise RuntimeError(err)
-            else:
-                return None
-    
-        # Extract array data
-        # This is a pointer to the scratch space.
-        array = np.ctypeslib.as_array(
-            (ctypes.c_double * n).from_address(ctypes.addressof(self.so_lib.tao_c_get_real_array().contents)))
-        
-        array = array.copy()
-        self.reset_output()
-        
-        return array  
+        cmd: command string
+        raises: will raise an exception of [ERROR or [FATAL is detected in the output
+        copy: if False, returns a read-only view into the Tao scratch space.
+              The view is only valid until the next command is sent to Tao.
+        out: optional float array of the right size to write the data into.
+             This avoids any allocation. out is returned.
+
+        Returns an np.ndarray, or None if there was an error and raises=False
+        """
+        return self._cmd_array(cmd, self.so_lib.tao_c_real_array_size,
+                               self.so_lib.tao_c_get_real_array,
+                               raises=raises, copy=copy, out=out)
 
     #----------
     # Get integer array output.
     # Only python commands that load the integer array buffer can be used with this method.
 
-    def cmd_integer (self, cmd, raises=True):
+    def cmd_integer(self, cmd, raises=True, *, copy=True, out=None):
+        """
+        Runs a command, and returns the integer array output.
+
+        See: cmd_real
+        """
+        return self._cmd_array(cmd, self.so_lib.tao_c_integer_array_size,
+                               self.so_lib.tao_c_get_integer_array,
+                               raises=raises, copy=copy, out=out)
+
+    def _cmd_array(self, cmd, size_func, array_func, raises=True, copy=True, out=None):
         logger.debug(f'Tao> {cmd}')
-        
+
+        timer = NULL_TIMER if self._stats is None else self._stats.timer(cmd)
         self.so_lib.tao_c_command(cmd.encode('utf-8'))
-        n = self.so_lib.tao_c_integer_array_size()
-        self.so_lib.tao_c_get_integer_array.restype = ctypes.POINTER(ctypes.c_int * n)
+        timer.lap('libtao')
+        self.cmd_cache.update(cmd)
+        n = size_func()
 
         # Check the output for errors
         lines = self.get_output(reset=False)
+        timer.lap('output')
         err = error_in_lines(lines)
+        timer.lap('errors')
         if err:
             self.reset_output()
             if raises:
                 raise RuntimeError(err)
             else:
-                return None  
-        
-        # Extract array data
-        # This is a pointer to the scratch space.
-        array = np.ctypeslib.as_array(
-            (ctypes.c_int * n).from_address(ctypes.addressof(self.so_lib.tao_c_get_integer_array().contents)))
+                return None
 
-        array = array.copy()
+        # Extract array data
+        # This is a view into the scratch space.
+        array = scratch_array(array_func(), n)
         self.reset_output()
-        
-        return array  
-    
- 
+
+        if out is not None:
+            if out.shape != array.shape:
+                raise ValueError(f'out has shape {out.shape}, but the command returned shape {array.shape}')
+            if not np.can_cast(array.dtype, out.dtype):
+                raise ValueError(f'out has dtype {out.dtype}, which cannot hold the command dtype {array.dtype}')
+            np.copyto(out, array)
+            array = out
+        elif copy:
+            array = array.copy()
+        else:
+            array.flags.writeable = False
+        timer.lap('output')
+
+        return array
+
+    #---------------------------------------------
+    # Timing statistics
+
+    def stats(self):
+        """
+        Returns the TaoStats being collected, or None.
+
+        See: collect_stats
+        """
+        return self._stats
+
+    def start_stats(self):
+        """
+        Starts collecting timing statistics for every command.
+        Returns the new TaoStats.
+        """
+        self._stats = TaoStats()
+        return self._stats
+
+    def stop_stats(self):
+        """
+        Stops collecting timing statistics, and returns them.
+        """
+        stats, self._stats = self._stats, None
+        return stats
+
+    @contextmanager
+    def collect_stats(self):
+        """
+        Context manager to collect timing statistics within a block.
+        Per command verb, the call count and the time spent in libtao,
+        output retrieval, error scanning and parsing are recorded.
+
+        Example:
+            with tao.collect_stats() as stats:
+                tao.cmd('set ele Q1 k1 = 0.1')
+                tao.lat_list('*', 'ele.s')
+            print(stats)
+            stats.to_json('stats.json')
+        """
+        previous = self._stats
+        stats = self.start_stats()
+        try:
+            yield stats
+        finally:
+            self._stats = previous
 
     #---------------------------------------------
 
@@ -298,6 +409,56 @@ class Tao:
       del tao
 
 
+def _command_modules():
+    # TL/DR; Leave these imports out of the global scope.
+    #
+    # Make it lazy import to avoid cyclical dependency.
+    # at __init__.py there is an import for Tao which
+    # would cause interface_commands to be imported always
+    # once we import pytao.
+    # If by any chance the interface_commands.py is broken and
+    # we try to autogenerate it will complain about the broken
+    # interface_commands file.
+    from pytao.tao_ctypes import extra_commands
+    # extra_commands take precedence
+    yield extra_commands
+    from pytao import interface_commands
+    yield interface_commands
+
+
+def command_function(name):
+    """
+    Returns the function from `extra_commands` or `interface_commands`
+    that is bound to Tao as method `name`, or None.
+
+    interface_commands is only imported if name is not an extra command.
+    """
+    if name.startswith('__'):
+        return None
+    for module in _command_modules():
+        if name in getattr(module, '__deny_list', []):
+            continue
+        func = module.__dict__.get(name)
+        if isinstance(func, types.FunctionType) and func.__module__ == module.__name__:
+            return func
+    return None
+
+
+def command_names():
+    """
+    Returns the names of all methods bound from `interface_commands` and `extra_commands`.
+    """
+    names = set()
+    for module in _command_modules():
+        deny_list = getattr(module, '__deny_list', [])
+        for name, func in module.__dict__.items():
+            if name.startswith('__') or name in deny_list:
+                continue
+            if isinstance(func, types.FunctionType) and func.__module__ == module.__name__:
+                names.add(name)
+    return names
+
+
 def find_libtao(base_dir):  
     """
     Searches base_for for an appropriate libtao shared library. 
@@ -309,6 +470,16 @@ def find_libtao(base_dir):
     return None
     
 
+def scratch_array(pointer, n):
+    """
+    Returns an np.ndarray of length n viewing the memory at a ctypes pointer.
+    No data is copied.
+    """
+    if n == 0:
+        return np.empty(0, dtype=pointer._type_)
+    return np.ctypeslib.as_array(pointer, shape=(n,))
+
+
 def auto_discovery_libtao():
     """
     Use system loader to try and find libtao.
@@ -369,6 +540,9 @@ class TaoModel(Tao):
 
     def configure(self):
 
+        import tempfile
+        import shutil
+
         # Set paths
         if self.use_tempdir:
             # Need to attach this to the object. Otherwise it will go out of scope.
@@ -439,16 +613,6 @@ class TaoModel(Tao):
         self.vprint(cmd)
         self.cmd(cmd)
 
-    #---------------------------------
-    def evaluate(self, expression):
-        """
-        Example: 
-            .evaluate('lat::orbit.x[beginning:end]')
-        Returns an np.array of floats
-        """
-
-        return tao_object_evaluate(self, expression)
-
     #---------------------------------
     def __str__(self):
         s = 'Tao Model initialized from: '+self.original_path
@@ -466,23 +630,32 @@ def tao_object_evaluate(tao_object, expression):
     Example expressions:
         beam::norm_emit.x[end]        # returns a single float
         lat::orbit.x[beginning:end]   # returns an np array of floats 
-    """
     
-    cmd = f'python evaluate {expression}'
-    res = tao_object.cmd(cmd)
-
-    # Cast to float
-    vals = [x.split(';')[1] for x in res]
+    See: evaluate_many
+    """
     
-    try:
-        fvals = np.asarray(vals, dtype=np.float)
-    except:
-        fvals = vals
+    cmd = f'python evaluate -array_out {expression}'
+    fvals = tao_object.cmd_real(cmd)
     
     # Return single value, or array
     if len(fvals) == 1:
-        return fvals[0]
+        return float(fvals[0])
     return fvals        
+
+
+class TaoEvaluateError(RuntimeError):
+    """
+    Raised by evaluate_many when expressions cannot be evaluated.
+    
+    errors: dict of expression: error message
+    values: dict of expression: value, of the expressions without errors
+    """
+    def __init__(self, errors, values):
+        self.errors = errors
+        self.values = values
+        msg = '; '.join(f'{expr}: {err}' for expr, err in errors.items())
+        super().__init__(f'{len(errors)} expression(s) could not be evaluated: {msg}')
+
         
 def form_set_command(s, value,  delim=':'):    
     """
@@ -1,9 +1,8 @@
-from .core import run_tao
+from .core import run_tao, TaoEvaluateError
 from ..misc.csr import parse_csr_wake, write_csr_wake_data_h5
 
 from .tools import fingerprint
-
-from h5py import File
+from .beam_snapshots import write_beam_snapshots
 
 import os
 
@@ -15,6 +14,7 @@ def evaluate_tao(settings,
                      ploton=False,
                     
                      beam_archive_path=None,
+                     beam_archive_elements=None,
                      archive_csr_wake=False,
                      workdir=None,
                      so_lib='',
@@ -37,6 +37,10 @@ def evaluate_tao(settings,
             write beam -at *
         which writes ALL of the bunches that are saved using the beam_saved_at list in beam_init.
         
+    beam_archive_elements: optional list of element names or indices. If given, the bunches
+        at these elements are streamed to the archive one at a time with write_beam_snapshots,
+        instead of using write beam. 
+        
     archive_csr_wake: if given, will look for csr_wake.dat, parse, and archive to the h5 file above.
     
     Returns a dict of expression:value, according to the expressions above, as well as 
@@ -74,15 +78,12 @@ def evaluate_tao(settings,
                 verbose=verbose)
     
     
-    output = {}
-    
-    for expression in expressions:
-        try:
-            val = M.evaluate(expression)
-        except:
-            print(f'error with {expression}')
-            val = None
-        output[expression] = val    
+    try:
+        output = M.evaluate_many(expressions)
+    except TaoEvaluateError as ex:
+        for expression, error in ex.errors.items():
+            print(f'error with {expression}: {error}')
+        output = {expression:ex.values.get(expression) for expression in expressions}
     
     if beam_archive_path:
         ff = fingerprint({'input_file':input_file, 'settings':settings})
@@ -90,29 +91,35 @@ def evaluate_tao(settings,
         beam_archive = os.path.abspath(os.path.join(beam_archive_path, f'bmad_beam_{ff}'+'.h5'))
         if verbose:
             print('Archiving beam to', beam_archive)
-        M.cmd(f'write beam -at * {beam_archive}')    
+        if beam_archive_elements is None:
+            M.cmd(f'write beam -at * {beam_archive}')    
+        else:
+            write_beam_snapshots(M, beam_archive, beam_archive_elements, verbose=verbose)
         output['beam_archive'] = beam_archive
         
 
         # Reopen and attach settings
         assert os.path.exists(beam_archive), 'No archive was written. Perhaps there was no beam?'
         
+        # h5py is only needed for archiving
+        from h5py import File
+        
         with File(beam_archive, 'r+') as h5:
             # Input
-            g = h5.create_group('input')
+            g = h5.require_group('input')
             g.attrs['input_file'] = input_file
             
             #g.attrs['input_file'] = input_file
             
             
             # Settings
-            g = h5.create_group('settings')
+            g = h5.require_group('settings')
             for k, v in settings.items():
                 g.attrs[k] = v
         
-            g = h5.create_group('expressions')
+            g = h5.require_group('expressions')
             for k, v in output.items():
-                if v:
+                if v is not None:
                     g.attrs[k] = v
                     
             # CSR wake
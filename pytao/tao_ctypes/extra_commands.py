@@ -1,15 +1,75 @@
 import numpy as np
 
+from pytao.tao_ctypes.core import TaoEvaluateError
+from pytao.tao_ctypes.lattice_index import LatticeIndex
+from pytao.tao_ctypes.util import parse_tao_python_data
+
 # These methods will be added to the Tao class
 # Skip these:
-__deny_list = ['np']
+__deny_list = ['np', 'TaoEvaluateError', 'LatticeIndex', 'parse_tao_python_data']
+
+# lat_list {who} that are output as strings or integers with -array_out.
+# Others are real.
+LAT_LIST_STRING_WHO = ('ele.name', 'ele.key')
+LAT_LIST_INTEGER_WHO = ('orbit.state', 'ele.ix_ele')
+# Shape per element of lat_list {who} with several values.
+LAT_LIST_SHAPES = {'ele.mat6': (6, 6), 'ele.vec0': (6,), 'ele.c_mat': (2, 2)}
+
+
 
+def bunch_array(tao, ele_id, coordinates=('x', 'px', 'y', 'py', 't', 'pz'), *, which='model', ix_bunch=1, out=None, verbose=False):
+    """
+    Returns bunch coordinates as one (n_particles, n_coordinates) float array,
+    in Bmad units, with one 'python bunch1' command per coordinate.
+    
+    The array is in Fortran order, so each column is contiguous and is 
+    copied directly from the Tao scratch space, without temporary arrays.
+    
+    Parameters
+    ----------
+    ele_id : str
+        Element name or index
+    coordinates : list of str, optional
+        bunch1 coordinates, any of: x, px, y, py, z, pz, s, t, charge, p0c, state.
+        Default: ('x', 'px', 'y', 'py', 't', 'pz')
+    which : str, optional
+        'model', 'base' or 'design'
+    ix_bunch : int, optional
+    out : np.ndarray, optional
+        float array of shape (n_particles, n_coordinates), preferably in Fortran order,
+        to write into, for example from a previous call. It is returned.
+        
+    Returns
+    -------
+    np.ndarray of shape (n_particles, n_coordinates)
+    
+    Example:
+        coords = tao.bunch_array('end')
+        # Later snapshots reuse the memory
+        tao.bunch_array('end', out=coords)
+    """
+    for j, coordinate in enumerate(coordinates):
+        cmd = f'python bunch1 {ele_id}|{which} {ix_bunch} {coordinate}'
+        if verbose: print(cmd)
+        cmd_array = tao.cmd_integer if coordinate == 'state' else tao.cmd_real
+        if out is None:
+            # The first column gives the number of particles.
+            # The view is only valid until the next command.
+            col = cmd_array(cmd, copy=False)
+            out = np.empty((len(col), len(coordinates)), order='F')
+            out[:, j] = col
+        else:
+            cmd_array(cmd, out=out[:, j])
+    return out
 
 
-def bunch_data(tao, ele_id, *, which='model', ix_bunch=1,  verbose=False):
+def bunch_data(tao, ele_id, *, which='model', ix_bunch=1, out=None, verbose=False):
     """    
     Returns bunch data in openPMD-beamphysics format/notation.
     
+    The coordinates are fetched into one array with bunch_array, 
+    and converted in place.
+    
     Notes
     -----
     Note that Tao's 'write beam' will also write a proper h5 file in this format.
@@ -19,6 +79,11 @@ def bunch_data(tao, ele_id, *, which='model', ix_bunch=1,  verbose=False):
         from pmd_beamphysics import ParticleGroup
         P = ParicleGroup(data=data)
         
+    Parameters
+    ----------
+    out : dict, optional
+        data returned by a previous call, for a bunch with the same number of particles. 
+        Its arrays are overwritten with the new data, and it is returned.
         
     Returns
     -------
@@ -41,26 +106,450 @@ def bunch_data(tao, ele_id, *, which='model', ix_bunch=1,  verbose=False):
     stats = tao.bunch_params(ele_id, which=which, verbose=verbose)
     species = stats['species']
     
-    dat = {}
-    for coordinate in ['x', 'px', 'y', 'py',  't', 'pz', 'p0c', 'charge', 'state']:
-        dat[coordinate] = tao.bunch1(ele_id, coordinate=coordinate, which=which, ix_bunch=ix_bunch, verbose=verbose)
+    # p0c is fetched into z, which is used as scratch space below
+    coordinates = ['x', 'px', 'y', 'py', 't', 'pz', 'charge', 'p0c']
+    keys = ['x', 'px', 'y', 'py', 't', 'pz', 'weight', 'z']
+    
+    state_cmd = f'python bunch1 {ele_id}|{which} {ix_bunch} state'
+    if out is None:
+        array = bunch_array(tao, ele_id, coordinates, which=which, ix_bunch=ix_bunch, verbose=verbose)
+        # Columns are contiguous views
+        columns = {key:array[:, j] for j, key in enumerate(keys)}
+        if verbose: print(state_cmd)
+        status = tao.cmd_integer(state_cmd)
+        dat = {key:columns[key] for key in keys[:6]}
+        dat.update({'status':status, 'weight':columns['weight'], 'z':columns['z']})
+    else:
+        dat = out
+        for coordinate, key in zip(coordinates, keys):
+            cmd = f'python bunch1 {ele_id}|{which} {ix_bunch} {coordinate}'
+            if verbose: print(cmd)
+            tao.cmd_real(cmd, out=dat[key])
+        if verbose: print(state_cmd)
+        tao.cmd_integer(state_cmd, out=dat['status'])
         
     # Remove normalizations
-    p0c = dat.pop('p0c')
-    
-    dat['status'] = dat.pop('state')
-    dat['weight'] = dat.pop('charge')
+    p0c, scratch = dat['z'], dat['z']
+    px, py, pz = dat['px'], dat['py'], dat['pz']
     
     # px from Bmad is px/p0c 
     # pz from Bmad is delta = p/p0c -1. 
     # pz = sqrt( (delta+1)**2 -px**2 -py**2)*p0c
-    dat['pz'] = np.sqrt((dat['pz'] + 1)**2 - dat['px']**2 - dat['py']**2) * p0c
-    dat['px'] = dat['px']*p0c
-    dat['py'] = dat['py']*p0c
+    #    = sqrt( ((delta+1)*p0c)**2 - (px*p0c)**2 - (py*p0c)**2 )
+    px *= p0c
+    py *= p0c
+    pz += 1
+    pz *= p0c
+    np.square(pz, out=pz)
+    # p0c is not needed anymore
+    np.square(px, out=scratch)
+    pz -= scratch
+    np.square(py, out=scratch)
+    pz -= scratch
+    np.sqrt(pz, out=pz)
 
     # z = 0 by definition
-    dat['z'] = np.full(len(dat['x']), 0)
+    dat['z'][...] = 0
         
     dat['species'] = species.lower()
     
-    return dat
\ No newline at end of file
+    return dat
+
+
+def derivative_labels(tao, ix_uni='1', *, data=True):
+    """
+    Returns the names of the data and variables of the rows and columns 
+    of the optimization derivative matrix, tao.derivative()[ix_uni].
+    
+    The rows are the data with useit_opt, in the order of the universe's data,
+    and the columns are the variables with useit_opt, in the order of all variables.
+    The d2/d1 data arrays and v1 variable arrays are listed from Tao, 
+    in the order they are defined.
+    
+    Parameters
+    ----------
+    ix_uni : str, optional
+        Universe index of the data
+    data : bool, optional
+        If False, only the variables are listed, and 'data' is None.
+        
+    Returns
+    -------
+    labels : dict with keys:
+        'data': list of datum names, as 'orbit.x[3]', one per row
+        'variables': list of variable names, as 'quad_k1[3]', one per column
+    
+    Example:
+        m = tao.derivative()[1]
+        labels = tao.derivative_labels()
+        # m[i, j] is the derivative of labels['data'][i] with respect to labels['variables'][j]
+    
+    """
+    labels = {'data': None, 'variables': []}
+    if data:
+        labels['data'] = []
+        for d2_name, d1_name in __data_d1_names(tao, ix_uni):
+            for datum in tao.data_d_array(d2_name, d1_name, ix_uni=ix_uni):
+                if datum['useit_opt']:
+                    labels['data'].append(f"{d2_name}.{d1_name}[{datum['ix_d1']}]")
+    
+    var_arrays = [line.split(';')[0] for line in tao.cmd('python var_general') if line.strip()]
+    for v1_name in var_arrays:
+        for var in tao.var_v_array(v1_name):
+            if var['useit_opt']:
+                labels['variables'].append(f"{v1_name}[{var['ix_v1']}]")
+    
+    return labels
+
+
+def __data_d1_names(tao, ix_uni='1'):
+    """
+    Returns the list of (d2_name, d1_name) of a universe, in the order they are defined.
+    """
+    names = []
+    for d2_name in tao.cmd(f'python data_d2_array {ix_uni}'):
+        d2_name = d2_name.strip()
+        if not d2_name:
+            continue
+        # Lines are: ...;...;...;{d1_name};{using};{ix_lbound};{ix_ubound}, as read by the GUI
+        for line in tao.cmd(f'python data_d1_array {ix_uni}@{d2_name}'):
+            if ';' in line:
+                names.append((d2_name, line.split(';')[3]))
+    return names
+
+
+def lat_table(tao, who, elements='*', *, ix_uni='1', ix_branch='0', which='model', flags='-track_only', verbose=False):
+    """
+    Returns columns of lat_list parameters for the matched elements.
+    
+    Each column is fetched with a single 'python lat_list' command, 
+    with -array_out for numbers, instead of one command per element
+    as in simple_lat_table.
+    
+    Parameters
+    ----------
+    who : str or list of str
+        lat_list parameters, for example: ['ele.name', 'ele.s', 'ele.a.beta', 'orbit.state']
+        See tao.lat_list for the full list.
+    elements : str, optional
+        Elements to match. Default: '*'
+    ix_uni : str, optional
+    ix_branch : str, optional
+    which : str, optional
+        'model', 'base' or 'design'
+    flags : str, optional
+        lat_list flags, other than -array_out. Default: '-track_only'
+    
+    Returns
+    -------
+    table : dict of np.ndarray
+        with keys who, each with one row per element. 
+        ele.name and ele.key are string arrays, orbit.state and ele.ix_ele integer arrays.
+        Parameters with several values per element, such as ele.mat6, have shape (n_elements, n_values).
+    
+    Example:
+        table = tao.lat_table(['ele.name', 'ele.s', 'ele.a.beta', 'ele.b.beta'])
+        
+    """
+    if isinstance(who, str):
+        who = [who]
+    base = f'{ix_uni}@{ix_branch}>>{elements}|{which}'
+    
+    # Number of elements
+    cmd = f'python lat_list -array_out {flags} {base} ele.ix_ele'
+    if verbose: print(cmd)
+    ix_ele = tao.cmd_integer(cmd)
+    n = len(ix_ele)
+    
+    table = {}
+    for w in who:
+        if w == 'ele.ix_ele':
+            table[w] = ix_ele
+            continue
+        if w in LAT_LIST_STRING_WHO:
+            cmd = f'python lat_list {flags} {base} {w}'
+            if verbose: print(cmd)
+            col = np.array(tao.cmd(cmd), dtype=str)
+        else:
+            cmd = f'python lat_list -array_out {flags} {base} {w}'
+            if verbose: print(cmd)
+            if w in LAT_LIST_INTEGER_WHO:
+                col = tao.cmd_integer(cmd)
+            else:
+                col = tao.cmd_real(cmd)
+        if n and len(col) != n:
+            if len(col) % n:
+                raise ValueError(f'{w} has {len(col)} values for {n} elements')
+            col = col.reshape(n, -1)
+        table[w] = col
+    return table
+
+
+def lat_list_multi(tao, elements, whos, *, which='model', ix_uni='1', ix_branch='0', flags='-track_only', out=None, verbose=False):
+    """
+    Fetches several lat_list parameters into one NumPy structured array,
+    with one field per who and one row per matched element.
+    
+    Each numeric field is filled directly from the Tao real or integer 
+    scratch space by a 'python lat_list -array_out' command.
+    Lattice calculations and plotting are suspended during the fetches.
+    
+    Parameters
+    ----------
+    elements : str
+        Elements to match, for example: '*' or 'Q*'
+    whos : list of str
+        lat_list parameters, for example: ['ele.s', 'ele.a.beta', 'orbit.state']
+    which : str, optional
+        'model', 'base' or 'design'
+    ix_uni : str, optional
+    ix_branch : str, optional
+    flags : str, optional
+        lat_list flags, other than -array_out. Default: '-track_only'
+    out : np.ndarray, optional
+        Structured array with a field for each who, and a row for each element,
+        as returned by a previous call. It is filled and returned.
+        A ValueError is raised if a string is longer than its field.
+        This avoids any allocation for repeated readbacks.
+    
+    Returns
+    -------
+    np.ndarray
+        Structured array with fields whos. orbit.state and ele.ix_ele are
+        integer fields, ele.name and ele.key string fields. 
+        ele.mat6 has shape (6, 6) per element, ele.vec0 (6,), and ele.c_mat (2, 2).
+    
+    Example:
+        table = tao.lat_list_multi('*', ['ele.s', 'ele.a.beta', 'ele.b.beta', 'orbit.state'])
+        table['ele.a.beta'][table['orbit.state'] == 1]
+        
+        # Reuse the memory after the next optics change
+        tao.lat_list_multi('*', ['ele.s', 'ele.a.beta', 'ele.b.beta', 'orbit.state'], out=table)
+    """
+    if isinstance(whos, str):
+        whos = [whos]
+    base = f'{ix_uni}@{ix_branch}>>{elements}|{which}'
+    
+    def array_cmd(w):
+        cmd = f'python lat_list -array_out {flags} {base} {w}'
+        if verbose: print(cmd)
+        return cmd
+    
+    def fill(w, view):
+        field = out[w]
+        if view.size != field.size:
+            raise ValueError(f'{w} has {view.size} values for {field.size} in out[{w!r}]')
+        field[...] = view.reshape(field.shape)
+    
+    with tao.suspend_calc():
+        # Strings are not in the scratch space
+        strings = {}
+        for w in whos:
+            if w in LAT_LIST_STRING_WHO:
+                cmd = f'python lat_list {flags} {base} {w}'
+                if verbose: print(cmd)
+                strings[w] = tao.cmd(cmd)
+        
+        numeric = [w for w in whos if w not in LAT_LIST_STRING_WHO]
+        first = None
+        if out is None:
+            if strings:
+                n = len(next(iter(strings.values())))
+            elif numeric:
+                # The size of the first array gives the number of elements.
+                # The view is only valid until the next command.
+                w = numeric[0]
+                first = tao.cmd_integer(array_cmd(w), copy=False) if w in LAT_LIST_INTEGER_WHO else tao.cmd_real(array_cmd(w), copy=False)
+                n = first.size // int(np.prod(LAT_LIST_SHAPES.get(w, ())))
+            else:
+                n = 0
+            dtype = []
+            for w in whos:
+                if w in strings:
+                    dtype.append((w, f'U{max(map(len, strings[w]), default=1)}'))
+                elif w in LAT_LIST_INTEGER_WHO:
+                    dtype.append((w, np.intc, LAT_LIST_SHAPES.get(w, ())))
+                else:
+                    dtype.append((w, float, LAT_LIST_SHAPES.get(w, ())))
+            out = np.empty(n, dtype=dtype)
+        
+        for w, lines in strings.items():
+            if len(lines) != len(out):
+                raise ValueError(f'{w} has {len(lines)} values for {len(out)} elements')
+            field_dtype = out.dtype[w]
+            width = max(map(len, lines), default=0)
+            if field_dtype.kind == 'U' and width > field_dtype.itemsize // 4:
+                # NumPy would silently truncate
+                raise ValueError(f'{w} has values of length {width}, too long for out[{w!r}] of dtype {field_dtype}')
+            out[w] = lines
+        for w in numeric:
+            if first is not None:
+                fill(w, first)
+                first = None
+            elif w in LAT_LIST_INTEGER_WHO:
+                fill(w, tao.cmd_integer(array_cmd(w), copy=False))
+            else:
+                fill(w, tao.cmd_real(array_cmd(w), copy=False))
+    
+    return out
+
+
+def lattice_index(tao, *, ix_uni='1', ix_branch='0', which='model'):
+    """
+    Returns the LatticeIndex of a branch, for element lookups by name, 
+    glob or regex, and by s position, without commands to Tao.
+    
+    The index is kept by tao, and is rebuilt on the first lookup 
+    after the lattice changes.
+    
+    Example:
+        index = tao.lattice_index()
+        index.indices('Q1')   # ix_ele of all elements named Q1
+        index.at_s(12.3)      # ix_ele of the element containing s = 12.3
+    
+    See: LatticeIndex
+    """
+    if tao._lattice_indexes is None:
+        tao._lattice_indexes = {}
+    key = (str(ix_uni), str(ix_branch), which)
+    index = tao._lattice_indexes.get(key)
+    if index is None:
+        index = tao._lattice_indexes[key] = LatticeIndex(tao, ix_uni=ix_uni, ix_branch=ix_branch, which=which)
+    return index
+
+
+def __at_s_array(tao, sub, s, ix_uni, ix_branch, which, verbose):
+    """
+    Runs 'python {sub} ...' at each s, and returns a structured array of the numeric results.
+    """
+    s = np.asarray(s, dtype=float)
+    index = tao.lattice_index(ix_uni=ix_uni, ix_branch=ix_branch, which=which)
+    
+    # Each distinct s once, in s order, as an offset from the exit end of the 
+    # last element that ends at or before it.
+    s_unique, inverse = np.unique(s.reshape(-1), return_inverse=True)
+    index.position(s_unique) # Check the range
+    i = np.searchsorted(index.s, s_unique, side='right') - 1
+    ix_ele = index.ix_ele[i]
+    offsets = s_unique - index.s[i]
+    
+    # Turning calculations off and back on does not change the generation,
+    # so the index stays valid.
+    results = []
+    with tao.suspend_calc():
+        for ix, offset in zip(ix_ele.tolist(), offsets.tolist()):
+            cmd = f'python {sub} {ix_uni}@{ix_branch}>>{ix}->{offset:.15g}|{which}'
+            if verbose: print(cmd)
+            results.append(parse_tao_python_data(tao.cmd(cmd)))
+    
+    # Numeric fields of the output
+    dtype = [('s', float)]
+    for k, v in (results[0].items() if results else []):
+        if isinstance(v, (bool, np.bool_)):
+            dtype.append((k, bool))
+        elif isinstance(v, (int, np.integer)):
+            dtype.append((k, int))
+        elif isinstance(v, (float, np.floating)):
+            dtype.append((k, float))
+        elif isinstance(v, np.ndarray) and v.dtype.kind in 'biuf':
+            dtype.append((k, v.dtype, v.shape))
+    table = np.empty(len(s_unique), dtype=dtype)
+    table['s'] = s_unique
+    for k in table.dtype.names[1:]:
+        table[k] = [r[k] for r in results]
+    
+    return table[inverse].reshape(s.shape)
+    
+
+def twiss_at_s_array(tao, s, *, ix_uni='1', ix_branch='0', which='model', verbose=False):
+    """
+    Returns the twiss parameters at each of an array of s positions, 
+    as from twiss_at_s, in a structured array. 
+    
+    The element and offset of each s are found with tao.lattice_index, 
+    and repeated s values are only evaluated once.
+    Lattice calculations and plotting are suspended during the fetches.
+    
+    Parameters
+    ----------
+    s : array_like
+        s positions in the branch
+    ix_uni : str, optional
+    ix_branch : str, optional
+    which : str, optional
+        'model', 'base' or 'design'
+    
+    Returns
+    -------
+    np.ndarray
+        Structured array with the shape of s, and the fields 's' and 
+        the numeric parameters of twiss_at_s, for example 'beta_a'.
+    
+    Example:
+        s = np.linspace(0, tao.lattice_index().s[-1], 1000)
+        twiss = tao.twiss_at_s_array(s)
+        plt.plot(twiss['s'], twiss['beta_a'])
+    """
+    return __at_s_array(tao, 'twiss_at_s', s, ix_uni, ix_branch, which, verbose)
+
+
+def orbit_at_s_array(tao, s, *, ix_uni='1', ix_branch='0', which='model', verbose=False):
+    """
+    Returns the orbit at each of an array of s positions, 
+    as from orbit_at_s, in a structured array. 
+    
+    See: twiss_at_s_array
+    
+    Returns
+    -------
+    np.ndarray
+        Structured array with the shape of s, and the fields 's' and 
+        the numeric parameters of orbit_at_s, for example 'x' and 'px'.
+    """
+    return __at_s_array(tao, 'orbit_at_s', s, ix_uni, ix_branch, which, verbose)
+
+
+def evaluate_many(tao, expressions, *, raises=True, verbose=False):
+    """
+    Evaluates a list of expressions, with one 'python evaluate -array_out'
+    command for each distinct expression. 
+    
+    Parameters
+    ----------
+    expressions : list of str
+        Expressions, for example: ['lat::orbit.x[end]', 'data::orbit.x[1:10]|model']
+        Repeated expressions are only evaluated once.
+    raises : bool, optional
+        If True, all expressions are evaluated, and then a TaoEvaluateError 
+        is raised with the error of each failing expression, and the other values.
+        If False, the value of failing expressions is None.
+    
+    Returns
+    -------
+    values : dict 
+        of expression: value, in the order of expressions. The value is a float
+        for expressions with a single value, otherwise an np.ndarray.
+    
+    Example:
+        values = tao.evaluate_many(['lat::orbit.x[end]', 'lat::r.11[q1&q2]'])
+    """
+    values = {}
+    errors = {}
+    for expression in dict.fromkeys(expressions):
+        cmd = f'python evaluate -array_out {expression}'
+        if verbose: print(cmd)
+        try:
+            # The view is only valid until the next command
+            array = tao.cmd_real(cmd, copy=False)
+        except RuntimeError as ex:
+            errors[expression] = str(ex)
+            values[expression] = None
+            continue
+        if len(array) == 1:
+            values[expression] = float(array[0])
+        else:
+            values[expression] = array.copy()
+    
+    if errors and raises:
+        raise TaoEvaluateError(errors, {k:v for k, v in values.items() if k not in errors})
+    return values
@@ -0,0 +1,173 @@
+"""
+Index of the elements of a lattice branch by name, key and s position.
+
+The index is built from one bulk lat_list fetch (see lat_table), and all
+lookups are then done in Python. It is rebuilt automatically on the first
+lookup after the lattice generation of Tao changes.
+
+Example:
+    index = tao.lattice_index()
+    index.indices('Q1')         # All elements named Q1, including duplicates
+    index.match('Q*')           # Glob, as in Tao
+    index.match('^Q[0-9]+W$', regex=True)
+    index.at_s(12.3)            # Element containing s = 12.3
+
+"""
+import bisect
+import fnmatch
+import re
+
+import numpy as np
+
+
+class LatticeIndex:
+    """
+    Element index of one branch of a universe.
+
+    Parameters
+    ----------
+    tao : Tao
+    ix_uni : str, optional
+    ix_branch : str, optional
+    which : str, optional
+        'model', 'base' or 'design'
+    flags : str, optional
+        lat_list flags for the fetch. Default: '-track_only'
+
+    Attributes (rebuilt on access after a lattice change)
+    ----------
+    names : np.ndarray of str
+    keys : np.ndarray of str
+    ix_ele : np.ndarray of int
+    s : np.ndarray of float
+        s position at the end of each element. Elements are in s order.
+    """
+
+    def __init__(self, tao, ix_uni='1', ix_branch='0', which='model', flags='-track_only'):
+        self.tao = tao
+        self.ix_uni = str(ix_uni)
+        self.ix_branch = str(ix_branch)
+        self.which = which
+        self.flags = flags
+        self.generation = None
+
+    def refresh(self, force=False):
+        """
+        Fetches the elements again if the lattice generation changed, or force is True.
+        """
+        if not force and self.generation is not None and self.generation == self.tao.generation:
+            return
+        table = self.tao.lat_table(['ele.name', 'ele.key', 'ele.ix_ele', 'ele.s'],
+                                   ix_uni=self.ix_uni, ix_branch=self.ix_branch,
+                                   which=self.which, flags=self.flags)
+        self._names = table['ele.name']
+        self._keys = table['ele.key']
+        self._ix_ele = table['ele.ix_ele']
+        self._s = table['ele.s']
+        # For bisect
+        self._s_list = self._s.tolist()
+
+        # Positions in the arrays of each name, upper case as Tao matching
+        self._positions = {}
+        for i, name in enumerate(self._names.tolist()):
+            self._positions.setdefault(name.upper(), []).append(i)
+
+        self.generation = self.tao.generation
+
+    @property
+    def names(self):
+        self.refresh()
+        return self._names
+
+    @property
+    def keys(self):
+        self.refresh()
+        return self._keys
+
+    @property
+    def ix_ele(self):
+        self.refresh()
+        return self._ix_ele
+
+    @property
+    def s(self):
+        self.refresh()
+        return self._s
+
+    def __len__(self):
+        self.refresh()
+        return len(self._names)
+
+    def __contains__(self, name):
+        self.refresh()
+        return name.upper() in self._positions
+
+    def indices(self, name):
+        """
+        Returns the list of ix_ele of all elements named name (case insensitive),
+        in s order. The list is empty if there is no such element.
+        """
+        self.refresh()
+        return [int(self._ix_ele[i]) for i in self._positions.get(name.upper(), [])]
+
+    def match(self, pattern, *, regex=False, key=None):
+        """
+        Returns the ix_ele of the elements with names matching pattern, in s order.
+
+        Parameters
+        ----------
+        pattern : str
+            Glob pattern with * and % (or ?), case insensitive as in Tao,
+            or a regular expression if regex is True.
+        regex : bool, optional
+            If True, pattern is a regular expression matched with re.search.
+        key : str, optional
+            Only elements with this key (case insensitive), for example 'Quadrupole'.
+
+        Returns
+        -------
+        np.ndarray of int
+        """
+        self.refresh()
+        if regex:
+            rx = re.compile(pattern)
+            positions = [i for i, name in enumerate(self._names.tolist()) if rx.search(name)]
+        else:
+            # % matches a single character in Tao
+            rx = re.compile(fnmatch.translate(pattern.upper().replace('%', '?')))
+            # Match once per distinct name
+            positions = sorted(i for name, pos in self._positions.items() if rx.match(name) for i in pos)
+        positions = np.array(positions, dtype=int)
+        if key is not None:
+            positions = positions[np.char.upper(self._keys[positions]) == key.upper()]
+        return self._ix_ele[positions]
+
+    def position(self, s):
+        """
+        Returns the position in the arrays of the element containing s,
+        that is the first element with an end at or after s.
+        s can be a float or an array.
+        """
+        self.refresh()
+        if np.ndim(s) == 0:
+            i = bisect.bisect_left(self._s_list, s)
+            if i == len(self._s_list) or s < self._s_list[0]:
+                raise ValueError(f's = {s} is outside of the branch')
+            return i
+        s = np.asarray(s, dtype=float)
+        i = np.searchsorted(self._s, s, side='left')
+        if len(self._s) == 0 or np.any(i == len(self._s)) or np.any(s < self._s[0]):
+            raise ValueError('s is outside of the branch')
+        return i
+
+    def at_s(self, s):
+        """
+        Returns the ix_ele of the element containing s, as position.
+        """
+        i = self.position(s)
+        if np.ndim(i) == 0:
+            return int(self._ix_ele[i])
+        return self._ix_ele[i]
+
+    def __repr__(self):
+        return f'<LatticeIndex of {self.ix_uni}@{self.ix_branch}|{self.which}, generation {self.generation}>'
@@ -0,0 +1,273 @@
+"""
+Objective function for running Tao optimizations from Python optimizers.
+
+TaoObjective maps a vector x of the optimizer variables (those with
+useit_opt) to the Tao merit, with as few commands as possible per
+evaluation:
+    - the variables are set in one batch, with lattice calculation and
+      plotting off, so the lattice is calculated once
+    - only the variables that changed since the last call are set, and
+      nothing is sent if x is the same, unless the lattice was changed
+      since (see tao.generation)
+    - the merit, and on request its gradient from the Tao derivative
+      matrix, are read back without the generic string parsing
+
+Example:
+    from scipy.optimize import minimize
+
+    objective = TaoObjective(tao)
+    result = minimize(objective.f, objective.x0(), jac=objective.jac, method='BFGS')
+    objective.set(result.x)
+    print(objective.timing_summary())
+
+"""
+import time
+
+import numpy as np
+
+from pytao.tao_ctypes.extra_commands import __data_d1_names as data_d1_names
+from pytao.util.parsers import parse_data_d_array, parse_derivative
+
+
+class TaoObjective:
+    """
+    Parameters
+    ----------
+    tao : Tao
+        plot_on and lattice_calc_on are read once here. They are turned off
+        while setting the variables, and back on if they were on.
+    variables : list of str, optional
+        Variable names, as 'quad_k1[3]'. Default: all variables with useit_opt,
+        in the order of the columns of the derivative matrix (see derivative_labels).
+        jac and derivative_matrix need all of them to have useit_opt.
+
+    Attributes
+    ----------
+    variables : list of str
+    timings : list of dict
+        One entry per call of f, jac or derivative_matrix, with keys:
+            call: 'f', 'jac' or 'derivative_matrix'
+            set: time in s to set the variables and calculate the lattice (0 if x did not change)
+            read: time in s to read the merit or derivatives
+            total: time in s of the call
+    n_set : int
+        Number of times the variables were set.
+    """
+
+    def __init__(self, tao, variables=None):
+        self.tao = tao
+        # Columns of the derivative matrix
+        self._derivative_variables = tao.derivative_labels(data=False)['variables']
+        if variables is None:
+            variables = self._derivative_variables
+        self.variables = list(variables)
+        self.timings = []
+        self.n_set = 0
+        # x and merit of the lattice at generation _generation
+        self._x = None
+        self._merit = None
+        self._generation = None
+        # (d2_name, d1_name) of the data of each universe, listed once
+        self._data_d1_names = {}
+        self._set_cmds = [f'set var {name}|model = ' for name in self.variables]
+
+        # Read once, instead of in every set, as in tao.suspend_calc
+        g = tao.tao_global()
+        self._calc_off, self._calc_on = [], []
+        for name in ('plot_on', 'lattice_calc_on'):
+            if g[name]:
+                self._calc_off.append(f'set global {name} = F')
+                self._calc_on.insert(0, f'set global {name} = T')
+
+    def __len__(self):
+        return len(self.variables)
+
+    def x0(self):
+        """
+        Returns the current model values of the variables.
+        """
+        values = {}
+        for v1_name in dict.fromkeys(name.split('[')[0] for name in self.variables):
+            for var in self.tao.var_v_array(v1_name):
+                values[f"{v1_name}[{var['ix_v1']}]"] = var['model_value']
+        return np.array([values[name] for name in self.variables])
+
+    def set(self, x):
+        """
+        Sets the variables to x, if x is not already set, and calculates the lattice.
+        Returns True if commands were sent.
+        """
+        x = np.asarray(x, dtype=float)
+        if x.shape != (len(self.variables),):
+            raise ValueError(f'x must have shape ({len(self.variables)},), got {x.shape}')
+        if self._valid():
+            changed = np.flatnonzero(x != self._x)
+            if not len(changed):
+                return False
+        else:
+            changed = range(len(x))
+
+        # If a command fails, the lattice is partly set
+        self._x = None
+        self._merit = None
+        for cmd in self._calc_off:
+            self.tao.cmd(cmd)
+        try:
+            for i in changed:
+                self.tao.cmd(f'{self._set_cmds[i]}{float(x[i])!r}')
+        finally:
+            # The lattice is calculated once, when lattice_calc_on is restored
+            for cmd in self._calc_on:
+                self.tao.cmd(cmd)
+        self._x = x.copy()
+        self._generation = self.tao.generation
+        self.n_set += 1
+        return True
+
+    def _valid(self):
+        """
+        True if the lattice was not changed since the variables were set to self._x.
+        """
+        return self._x is not None and self._generation == self.tao.generation
+
+    def merit(self):
+        """
+        Returns the merit of the current lattice.
+        """
+        lines = self.tao.cmd('python merit')
+        return float(lines[0])
+
+    def f(self, x):
+        """
+        Returns the merit at x.
+        """
+        t0 = time.perf_counter()
+        self.set(x)
+        t1 = time.perf_counter()
+        if self._merit is None or not self._valid():
+            self._merit = self.merit()
+        t2 = time.perf_counter()
+        self.timings.append({'call': 'f', 'set': t1 - t0, 'read': t2 - t1, 'total': t2 - t0})
+        return self._merit
+
+    def __call__(self, x):
+        return self.f(x)
+
+    def jac(self, x):
+        """
+        Returns the gradient of the merit at x, d(merit)/dx, with shape (n_variables,):
+            sum of 2 * weight * delta * d(delta)/dModel * dModel/dVar
+        over the data with useit_opt of all universes, where delta is
+        model - meas, limited for the min, max, abs_min and abs_max merit types.
+
+        Not included: the merit of the variables themselves (limits),
+        and opt_with_ref/opt_with_base.
+
+        Raises ValueError if some of self.variables are not optimizer variables.
+        """
+        columns = self._columns()
+        t0 = time.perf_counter()
+        self.set(x)
+        t1 = time.perf_counter()
+        grad = np.zeros(len(self._derivative_variables))
+        for iu, m in self._derivative().items():
+            coef = self._dmerit_dmodel(iu)
+            if m.shape[0] > len(coef):
+                raise ValueError(f'The derivative matrix of universe {iu} has {m.shape[0]} rows, '
+                                 f'but there are {len(coef)} optimized data')
+            # Data after the last row have zero derivatives
+            grad += coef[:m.shape[0]] @ m
+        t2 = time.perf_counter()
+        self.timings.append({'call': 'jac', 'set': t1 - t0, 'read': t2 - t1, 'total': t2 - t0})
+        return grad[columns]
+
+    def derivative_matrix(self, x):
+        """
+        Returns the derivative matrix dModel/dVar at x, with shape (n_data, n_variables).
+        The rows of all universes are stacked, in universe order.
+        The columns are in the order of self.variables.
+
+        Raises ValueError if some of self.variables are not optimizer variables.
+        """
+        columns = self._columns()
+        t0 = time.perf_counter()
+        self.set(x)
+        t1 = time.perf_counter()
+        matrices = self._derivative()
+        if matrices:
+            m = np.vstack([matrices[iu] for iu in sorted(matrices)])[:, columns]
+        else:
+            m = np.zeros((0, len(self.variables)))
+        t2 = time.perf_counter()
+        self.timings.append({'call': 'derivative_matrix', 'set': t1 - t0, 'read': t2 - t1, 'total': t2 - t0})
+        return m
+
+    def _derivative(self):
+        """
+        Calculates the derivative matrices, and returns the dict of
+        universe index: matrix with a column per optimizer variable.
+        """
+        valid = self._valid()
+        # 'python derivative' does not recalculate
+        self.tao.cmd('derivative')
+        if valid:
+            # The derivative command restores the variables
+            self._generation = self.tao.generation
+        matrices = parse_derivative(self.tao.cmd('python derivative'))
+        n_var = len(self._derivative_variables)
+        for iu, m in matrices.items():
+            if m.shape[1] > n_var:
+                raise ValueError(f'The derivative matrix of universe {iu} has {m.shape[1]} columns, '
+                                 f'but there are {n_var} optimizer variables')
+            # Trailing variables may be missing from the output
+            matrices[iu] = np.pad(m, ((0, 0), (0, n_var - m.shape[1])))
+        return matrices
+
+    def _dmerit_dmodel(self, iu):
+        """
+        Returns d(merit)/dModel of the data with useit_opt of universe iu,
+        in the order of the rows of its derivative matrix.
+        """
+        if iu not in self._data_d1_names:
+            self._data_d1_names[iu] = data_d1_names(self.tao, iu)
+        parts = []
+        for d2_name, d1_name in self._data_d1_names[iu]:
+            cols = parse_data_d_array(self.tao.cmd(f'python data_d_array {iu}@{d2_name}.{d1_name}'),
+                                      layout='columns')
+            used = cols['useit_opt']
+            parts.append([cols[k][used] for k in ('merit_type', 'model_value', 'meas_value', 'weight')])
+        if not parts:
+            return np.zeros(0)
+        merit_type, model, meas, weight = (np.concatenate(c) for c in zip(*parts))
+
+        is_abs = np.isin(merit_type, ('abs_min', 'abs_max'))
+        delta = np.where(is_abs, np.abs(model), model) - meas
+        ddelta = np.where(is_abs, np.sign(model), 1.0)
+        delta[np.isin(merit_type, ('max', 'abs_max')) & (delta < 0)] = 0
+        delta[np.isin(merit_type, ('min', 'abs_min')) & (delta > 0)] = 0
+        return 2 * weight * delta * ddelta
+
+    def _columns(self):
+        """
+        Returns the columns of the derivative matrix of self.variables.
+        """
+        position = {name: i for i, name in enumerate(self._derivative_variables)}
+        missing = [name for name in self.variables if name not in position]
+        if missing:
+            raise ValueError(f'Not optimizer variables (useit_opt), so not in the derivative matrix: {missing}')
+        return [position[name] for name in self.variables]
+
+    def timing_summary(self):
+        """
+        Returns a dict of call: {'count', 'set', 'read', 'total'} with the summed times.
+        """
+        summary = {}
+        for t in self.timings:
+            s = summary.setdefault(t['call'], {'count': 0, 'set': 0.0, 'read': 0.0, 'total': 0.0})
+            s['count'] += 1
+            for k in ('set', 'read', 'total'):
+                s[k] += t[k]
+        return summary
+
+    def __repr__(self):
+        return f'<TaoObjective with {len(self.variables)} variables, {len(self.timings)} calls>'
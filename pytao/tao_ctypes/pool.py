@@ -0,0 +1,315 @@
+"""
+Pool of worker processes, each running its own Tao.
+
+libtao is a process-wide singleton, so a single Python process can only
+drive one lattice. TaoPool starts independent worker processes that each
+hold a Tao instance, and distributes command lists among them.
+
+"""
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TaoWorkerError(RuntimeError):
+    """
+    Raised when a worker process dies while running a job.
+    """
+    pass
+
+
+def run_commands(tao, cmds):
+    """
+    Runs a list of commands on a Tao instance, and returns the list of results.
+
+    Each item in cmds can be:
+        str: a Tao command string, run with tao.cmd
+        tuple: (method_name, args) or (method_name, args, kwargs)
+            will call getattr(tao, method_name)(*args, **kwargs).
+            This allows the parsed output of any Tao method, for example:
+                ('lat_list', ('*', 'ele.s'), {'flags': '-array_out -track_only'})
+
+    Example:
+        run_commands(tao, ['set ele q1 k1 = 0.1', ('evaluate', ('lat::orbit.x[end]',))])
+    """
+    results = []
+    for cmd in cmds:
+        if isinstance(cmd, str):
+            res = tao.cmd(cmd)
+        else:
+            name, args, *kwargs = cmd
+            kwargs = kwargs[0] if kwargs else {}
+            res = getattr(tao, name)(*args, **kwargs)
+        results.append(res)
+    return results
+
+
+def _worker_main(conn, init, so_lib):
+    """
+    Entry point of a worker process.
+    """
+    from pytao.tao_ctypes.core import Tao
+
+    _serve(conn, lambda: Tao(init=init, so_lib=so_lib))
+
+
+def _serve(conn, make_tao):
+    """
+    Runs a worker on the process end of its pipe.
+
+    Sends ('ready', None) after make_tao() returns the Tao instance, then answers each
+    received command list with ('ok', results) or ('error', exception).
+    A received None stops the worker.
+    """
+    try:
+        tao = make_tao()
+    except Exception as ex:
+        conn.send(('error', ex))
+        return
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            cmds = conn.recv()
+        except EOFError:
+            break
+        if cmds is None:
+            break
+        try:
+            msg = ('ok', run_commands(tao, cmds))
+        except Exception as ex:
+            msg = ('error', ex)
+        try:
+            conn.send(msg)
+        except Exception as ex:
+            # Result or exception could not be pickled
+            conn.send(('error', RuntimeError(f'Unable to send result: {ex!r}')))
+
+
+class _Worker:
+    """
+    Thread in the parent process that owns one worker process.
+    Takes jobs from the pool queue, and restarts the process if it dies.
+    """
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.n_restarts = 0
+        self.thread = threading.Thread(target=self.run, name=f'TaoPool-worker-{index}', daemon=True)
+
+    def start_process(self):
+        """
+        Starts the process and waits for Tao to initialize.
+        Raises the initialization exception, or TaoWorkerError if the process died.
+        """
+        ctx = self.pool._mp_context
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=self.pool._worker_main,
+                                   args=(child_conn, self.pool.init, self.pool.so_lib),
+                                   name=f'TaoPool-{self.index}',
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        status, result = self.receive()
+        if status == 'error':
+            raise result
+
+    def stop_process(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (OSError, EOFError):
+                pass
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def receive(self):
+        """
+        Waits for a message from the process. Raises TaoWorkerError if it died.
+        """
+        multiprocessing.connection.wait([self.conn, self.process.sentinel])
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join()
+            raise TaoWorkerError(f'Tao worker {self.index} died with exit code {self.process.exitcode}')
+
+    def restart(self):
+        self.n_restarts += 1
+        logger.warning(f'Restarting Tao worker {self.index} (restart {self.n_restarts})')
+        self.stop_process()
+        self.start_process()
+
+    def run(self):
+        try:
+            self.start_process()
+        except Exception as ex:
+            self.pool._worker_failed(self, ex)
+            return
+
+        while True:
+            item = self.pool._queue.get()
+            if item is None:
+                break
+            future, cmds = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self.conn.send(cmds)
+                status, result = self.receive()
+            except (TaoWorkerError, OSError) as ex:
+                if not isinstance(ex, TaoWorkerError):
+                    ex = TaoWorkerError(f'Tao worker {self.index} failed: {ex!r}')
+                future.set_exception(ex)
+                try:
+                    self.restart()
+                except Exception as restart_ex:
+                    self.pool._worker_failed(self, restart_ex)
+                    return
+                continue
+            if status == 'ok':
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+        self.stop_process()
+
+
+class TaoPool:
+    """
+    Pool of worker processes, each holding its own Tao instance
+    initialized with the same init string.
+
+    Jobs are lists of commands (see run_commands). Each job runs on a
+    single worker, in order, and the list of results is returned.
+    Workers that crash are restarted automatically, and the job that was
+    running gets a TaoWorkerError.
+
+    Example:
+        with TaoPool('-init tao.init -noplot', n_workers=4) as pool:
+            jobs = [[f'set ele Q1 k1 = {k1}', ('evaluate', ('lat::orbit.x[end]',))] for k1 in k1_list]
+            results = pool.map(jobs)
+
+    Parameters
+    ----------
+    init : str
+        Tao init string for each worker.
+    n_workers : int, optional
+        Number of worker processes. Defaults to os.cpu_count().
+    so_lib : str, optional
+        Passed onto Tao.
+    mp_context : str, optional
+        multiprocessing start method. 'spawn' (default) is safe even if
+        this process has already initialized Tao.
+    """
+
+    # Target of the worker processes, called with (conn, init, so_lib).
+    # It must be importable by the workers.
+    _worker_main = staticmethod(_worker_main)
+
+    def __init__(self, init='', n_workers=None, so_lib='', mp_context='spawn'):
+        self.init = init
+        self.so_lib = so_lib
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._mp_context = multiprocessing.get_context(mp_context)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._error = None
+        self._closed = False
+
+        self._workers = [_Worker(self, i) for i in range(self.n_workers)]
+        for w in self._workers:
+            w.thread.start()
+
+    def _worker_failed(self, worker, ex):
+        """
+        Called by a worker thread that could not (re)start its process.
+        If no workers are left, all pending jobs fail with this exception.
+        """
+        logger.error(f'Tao worker {worker.index} failed to start: {ex!r}')
+        with self._lock:
+            self._workers.remove(worker)
+            self._error = ex
+            if self._workers:
+                return
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and item[0].set_running_or_notify_cancel():
+                    item[0].set_exception(ex)
+
+    def submit(self, cmds):
+        """
+        Submits a list of commands to be run on one worker.
+
+        Returns a concurrent.futures.Future with the list of results.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('TaoPool is closed')
+            if not self._workers:
+                raise RuntimeError(f'No Tao workers are running: {self._error!r}')
+            self._queue.put((future, list(cmds)))
+        return future
+
+    def map(self, cmds_list, timeout=None):
+        """
+        Runs each list of commands in cmds_list, distributed among the workers.
+
+        Returns the list of results, in the same order as cmds_list.
+
+        timeout is for all the results, in seconds. If it is exceeded,
+        or a job fails, the jobs that have not started are cancelled.
+        """
+        futures = [self.submit(cmds) for cmds in cmds_list]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            results = []
+            for f in futures:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                results.append(f.result(timeout=remaining))
+            return results
+        finally:
+            for f in futures:
+                f.cancel()
+
+    def close(self):
+        """
+        Stops the workers after all submitted jobs are done.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put(None)
+        for w in workers:
+            w.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f'TaoPool(init={self.init!r}, n_workers={self.n_workers})'
@@ -0,0 +1,245 @@
+"""
+Recording and replay of Tao sessions.
+
+TaoRecorder logs every command sent through a Tao instance, with its raw
+output lines or array data, to a compact trace file (gzipped JSON lines).
+
+TaoReplay serves a trace back through the Tao API without libtao, so that
+all pytao-side parsing (and code built on it) can be benchmarked and
+profiled on machines without Bmad.
+
+Example:
+    with TaoRecorder(tao, 'session.trace.gz'):
+        tao.lat_list('*', 'ele.s')
+        tao.data_d_array('orbit', 'x')
+
+    replay = TaoReplay('session.trace.gz')
+    replay.lat_list('*', 'ele.s')   # Same result, no libtao
+
+"""
+import base64
+import gzip
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from pytao.tao_ctypes.cache import CommandCache
+from pytao.tao_ctypes.core import Tao
+from pytao.tao_ctypes.stats import NULL_TIMER
+from pytao.tao_ctypes.util import error_in_lines
+
+
+def encode_array(array):
+    """
+    Encodes an array as a JSON serializable dict.
+    """
+    array = np.ascontiguousarray(array)
+    return {'dtype': array.dtype.str, 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def decode_array(d):
+    return np.frombuffer(base64.b64decode(d['data']), dtype=d['dtype'])
+
+
+def read_trace(path):
+    """
+    Yields the records of a trace file, as dicts with keys:
+        type: 'init', 'cmd', 'real' or 'integer'
+        cmd: the command string
+        dt: time in seconds of the call when recorded
+    and one of:
+        lines: list of output lines, for 'init' and 'cmd'
+        array: encoded array, for 'real' and 'integer'
+        error: error string, for 'real' and 'integer'
+    """
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class TaoRecorder:
+    """
+    Records all commands sent through a Tao instance to a trace file.
+
+    The recorder wraps the init, cmd, cmd_real and cmd_integer methods
+    of the instance, so every generated method and extra command is
+    recorded. The original methods are restored by close().
+
+    Parameters
+    ----------
+    tao : Tao
+        The instance to record.
+    path : str
+        Trace file to write. It is gzipped JSON lines.
+    """
+    _wrapped = ('init', 'cmd', 'cmd_real', 'cmd_integer')
+
+    def __init__(self, tao, path):
+        self.tao = tao
+        self.path = path
+        self.n_records = 0
+        self._file = gzip.open(path, 'wt')
+        self._saved = {name: tao.__dict__.get(name) for name in self._wrapped}
+        self._original = {name: getattr(tao, name) for name in self._wrapped}
+        tao.init = self._init
+        tao.cmd = self._cmd
+        tao.cmd_real = self._cmd_real
+        tao.cmd_integer = self._cmd_integer
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')))
+        self._file.write('\n')
+        self.n_records += 1
+
+    def _init(self, cmd):
+        t0 = time.perf_counter()
+        lines = self._original['init'](cmd)
+        self._write({'type': 'init', 'cmd': cmd, 'dt': time.perf_counter() - t0, 'lines': lines})
+        return lines
+
+    def _cmd(self, cmd, raises=True, cache=True):
+        t0 = time.perf_counter()
+        lines = self._original['cmd'](cmd, raises=False, cache=cache)
+        self._write({'type': 'cmd', 'cmd': cmd, 'dt': time.perf_counter() - t0, 'lines': lines})
+        if raises:
+            err = error_in_lines(lines)
+            if err:
+                raise RuntimeError(f'Command: {cmd} causes error: {err}')
+        return lines
+
+    def _record_array(self, kind, cmd, raises, copy, out):
+        t0 = time.perf_counter()
+        try:
+            array = self._original[f'cmd_{kind}'](cmd, raises=True, copy=copy, out=out)
+        except RuntimeError as ex:
+            self._write({'type': kind, 'cmd': cmd, 'dt': time.perf_counter() - t0, 'error': str(ex)})
+            if raises:
+                raise
+            return None
+        self._write({'type': kind, 'cmd': cmd, 'dt': time.perf_counter() - t0, 'array': encode_array(array)})
+        return array
+
+    def _cmd_real(self, cmd, raises=True, *, copy=True, out=None):
+        return self._record_array('real', cmd, raises, copy, out)
+
+    def _cmd_integer(self, cmd, raises=True, *, copy=True, out=None):
+        return self._record_array('integer', cmd, raises, copy, out)
+
+    def close(self):
+        """
+        Stops recording, restores the Tao methods, and closes the trace file.
+        """
+        if self._file.closed:
+            return
+        for name, value in self._saved.items():
+            if value is None:
+                del self.tao.__dict__[name]
+            else:
+                self.tao.__dict__[name] = value
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TaoReplay(Tao):
+    """
+    Tao backend that serves the results of a recorded trace, without libtao.
+
+    Results for the same command are served in the recorded order. When
+    they are exhausted, the last one is repeated, so replayed code can be
+    run in loops for benchmarking.
+
+    All generated methods, extra commands, and timing statistics work
+    as with Tao.
+
+    Parameters
+    ----------
+    trace : str or iterable of dict
+        Trace file written by TaoRecorder, or its records.
+    """
+
+    def __init__(self, trace):
+        self.so_lib = None
+        self.so_lib_file = None
+        # Nothing to cache, but the lattice generation is tracked
+        self.cmd_cache = CommandCache(maxsize=0)
+
+        if isinstance(trace, str):
+            trace = read_trace(trace)
+        self._records = {}
+        for record in trace:
+            key = (record['type'], record['cmd'])
+            self._records.setdefault(key, deque()).append(record)
+
+    def _next(self, kind, cmd):
+        records = self._records.get((kind, cmd))
+        if not records:
+            raise KeyError(f'Command not in trace: {cmd}')
+        if len(records) > 1:
+            return records.popleft()
+        return records[0]
+
+    def commands(self):
+        """
+        Returns the list of (type, cmd) in the trace.
+        """
+        return list(self._records)
+
+    def init(self, cmd):
+        self.cmd_cache.bump()
+        return list(self._next('init', cmd)['lines'])
+
+    def cmd(self, cmd, raises=True, cache=True):
+        timer = NULL_TIMER if self._stats is None else self._stats.timer(cmd)
+        lines = list(self._next('cmd', cmd)['lines'])
+        self.cmd_cache.update(cmd)
+        timer.lap('output')
+        if raises:
+            err = error_in_lines(lines)
+            timer.lap('errors')
+            if err:
+                raise RuntimeError(f'Command: {cmd} causes error: {err}')
+        return lines
+
+    def _replay_array(self, kind, cmd, raises, copy, out):
+        timer = NULL_TIMER if self._stats is None else self._stats.timer(cmd)
+        record = self._next(kind, cmd)
+        self.cmd_cache.update(cmd)
+        if 'error' in record:
+            if raises:
+                raise RuntimeError(record['error'])
+            return None
+        array = decode_array(record['array'])
+        if out is not None:
+            if out.shape != array.shape:
+                raise ValueError(f'out has shape {out.shape}, but the command returned shape {array.shape}')
+            if not np.can_cast(array.dtype, out.dtype):
+                raise ValueError(f'out has dtype {out.dtype}, which cannot hold the command dtype {array.dtype}')
+            np.copyto(out, array)
+            array = out
+        elif copy:
+            array = array.copy()
+        timer.lap('output')
+        return array
+
+    def cmd_real(self, cmd, raises=True, *, copy=True, out=None):
+        return self._replay_array('real', cmd, raises, copy, out)
+
+    def cmd_integer(self, cmd, raises=True, *, copy=True, out=None):
+        return self._replay_array('integer', cmd, raises, copy, out)
+
+    def get_output(self, reset=True):
+        return []
+
+    def reset_output(self):
+        pass
+
+    def register_cell_magic(self):
+        pass
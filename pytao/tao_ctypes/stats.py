@@ -0,0 +1,155 @@
+"""
+Per-command timing statistics for Tao.
+
+Times are accumulated per command verb ('python lat_list', 'set', 'show', ...)
+in these phases:
+    libtao: inside the libtao command call
+    output: retrieving the output buffer or array
+    errors: scanning the output for errors
+    parse:  parsing in interface_commands
+
+"""
+import csv
+import io
+import json
+import time
+
+
+PHASES = ('libtao', 'output', 'errors', 'parse')
+COLUMNS = ('verb', 'count', 'cache_hits') + PHASES + ('total',)
+
+
+def command_verb(cmd):
+    """
+    Returns the verb of a command string, used to group statistics.
+
+    Example:
+        command_verb('python lat_list -array_out 1@0>>*|model ele.s')
+    returns:
+        'python lat_list'
+    """
+    words = cmd.split(maxsplit=2)
+    if not words:
+        return ''
+    if words[0] == 'python' and len(words) > 1:
+        return 'python ' + words[1]
+    return words[0]
+
+
+class CommandTimer:
+    """
+    Accumulates the time between successive laps into the phases of one entry.
+    """
+    __slots__ = ('entry', 't')
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.t = time.perf_counter()
+
+    def lap(self, phase):
+        t = time.perf_counter()
+        self.entry[phase] += t - self.t
+        self.t = t
+
+    def hit(self):
+        self.entry['cache_hits'] += 1
+
+
+class _NullTimer:
+    """
+    Timer used when statistics are not being collected.
+    """
+    __slots__ = ()
+
+    def lap(self, phase):
+        pass
+
+    def hit(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class TaoStats:
+    """
+    Call counts and wall times per command verb.
+
+    Example:
+        with tao.collect_stats() as stats:
+            tao.cmd('set ele Q1 k1 = 0.1')
+            tao.lat_list('*', 'ele.s')
+        print(stats)
+        stats.to_csv('stats.csv')
+    """
+    def __init__(self):
+        self.data = {}
+
+    def _entry(self, verb):
+        entry = self.data.get(verb)
+        if entry is None:
+            entry = self.data[verb] = {'count': 0, 'cache_hits': 0, **{p: 0.0 for p in PHASES}}
+        return entry
+
+    def timer(self, cmd):
+        """
+        Counts a call of cmd, and returns a CommandTimer for its phases.
+        """
+        entry = self._entry(command_verb(cmd))
+        entry['count'] += 1
+        return CommandTimer(entry)
+
+    def add(self, cmd, phase, dt):
+        """
+        Adds dt seconds to a phase of cmd, without counting a call.
+        """
+        self._entry(command_verb(cmd))[phase] += dt
+
+    def reset(self):
+        self.data = {}
+
+    def as_dict(self):
+        """
+        Returns a dict of verb: dict with count, cache_hits, the time in seconds
+        of each phase, and the total time.
+        """
+        out = {}
+        for verb, entry in self.data.items():
+            out[verb] = dict(entry, total=sum(entry[p] for p in PHASES))
+        return out
+
+    def rows(self):
+        """
+        Returns a list of rows (tuples in COLUMNS order), slowest verbs first.
+        """
+        rows = [(verb,) + tuple(d[c] for c in COLUMNS[1:]) for verb, d in self.as_dict().items()]
+        return sorted(rows, key=lambda r: r[-1], reverse=True)
+
+    def to_json(self, path=None):
+        """
+        Returns the statistics as a JSON string, or writes them to path.
+        """
+        s = json.dumps(self.as_dict(), indent=2)
+        if path is None:
+            return s
+        with open(path, 'w') as f:
+            f.write(s)
+
+    def to_csv(self, path=None):
+        """
+        Returns the statistics as a CSV string, or writes them to path.
+        """
+        f = io.StringIO()
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(self.rows())
+        if path is None:
+            return f.getvalue()
+        with open(path, 'w', newline='') as out:
+            out.write(f.getvalue())
+
+    def __repr__(self):
+        lines = [f'{"verb":<28}{"count":>8}{"cached":>8}' + ''.join(f'{p + " [ms]":>13}' for p in PHASES + ('total',))]
+        for verb, count, hits, *times in self.rows():
+            lines.append(f'{verb:<28}{count:>8}{hits:>8}' + ''.join(f'{t*1e3:>13.3f}' for t in times))
+        return '\n'.join(lines)
@@ -1,5 +1,3 @@
-import subprocess
-from hashlib import blake2b
 import numpy as np
 import json
 import os
@@ -38,6 +36,7 @@ def fingerprint(keyed_data, digest_size=16):
     Used JSON dumps to form strings, and the blake2b algorithm to hash.
     
     """
+    from hashlib import blake2b
     h = blake2b(digest_size=16)
     for key in sorted(keyed_data.keys()):
         val = keyed_data[key]
@@ -59,6 +58,7 @@ def execute(cmd, cwd=None):
     Useful in Jupyter notebook
     
     """
+    import subprocess
     popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True, cwd=cwd)
     for stdout_line in iter(popen.stdout.readline, ""):
         yield stdout_line 
@@ -72,6 +72,7 @@ def execute2(cmd, timeout=None, cwd=None):
     """
     Execute with time limit (timeout) in seconds, catching run errors. 
     """
+    import subprocess
     
     output = {'error':True, 'log':''}
     try:
@@ -3,6 +3,10 @@ pytao specific utilities
 
 """
 
+import threading
+from itertools import chain
+from operator import getitem, itemgetter
+
 import numpy as np
 
 
@@ -53,6 +57,7 @@ def parse_tao_lat_ele_list(lines):
     returns mapping of names to index
     
     TODO: if elements are duplicated, this returns only the last one.
+    See tao.lattice_index for lookups that keep duplicates.
     
     Example: 
     ixlist = parse_tao_lat_ele_list(tao.cmd('python lat_ele_list 1@0'))
@@ -64,6 +69,45 @@ def parse_tao_lat_ele_list(lines):
     return ix
 
 
+def _identity(val):
+    return val
+
+
+def _parse_real_arr(val):
+    return np.array(val).astype(float)
+
+
+def _parse_complex(val):
+    re, im = val
+    return complex(float(re), float(im))
+
+
+def _parse_struct(val):
+    return {name:parse_pytype(t1, v1) for name, t1, v1 in chunks(val, 3)}
+
+
+# Parsers for the types from tao_python_cmd, called with the value
+# (the list of value strings, or the string if there is only one)
+PYTYPE_PARSERS = {
+    'STR': _identity,
+    'ENUM': _identity,
+    'FILE': _identity,
+    'CRYSTAL': _identity,
+    'COMPONENT': _identity,
+    'DAT_TYPE': _identity,
+    'DAT_TYPE_Z': _identity,
+    'SPECIES': _identity,
+    'ELE_PARAM': _identity,
+    'LOGIC': parse_bool,
+    'INT': int,
+    'INUM': int,
+    'REAL': float,
+    'REAL_ARR': _parse_real_arr,
+    'COMPLEX': _parse_complex,
+    'STRUCT': _parse_struct,
+}
+
+
 def parse_pytype(type, val):
     """
     Parses the various types from tao_python_cmd
@@ -75,31 +119,11 @@ def parse_pytype(type, val):
     if isinstance(val, list):
         if len(val) == 1:
             val = val[0]
-    
-    if type  in ['STR', 'ENUM', 'FILE', 'CRYSTAL', 'COMPONENT',
-                 'DAT_TYPE', 'DAT_TYPE_Z', 'SPECIES', 'ELE_PARAM']:
-        return val
-    
-    if type == 'LOGIC':
-        return parse_bool(val)
-
-    if type in ['INT', 'INUM']:
-        return int(val)     
-  
-    if type == 'REAL':
-        return float(val)
-
-    if type == 'REAL_ARR':
-        return np.array(val).astype(float)
-
-    if type == 'COMPLEX':
-        return complex(*val)
-      
-    if type == 'STRUCT':
-        return {name:parse_pytype(t1, v1) for name, t1, v1 in chunks(val, 3)}
-        
-    # Not found
-    raise ValueError ('Unknown type: '+type)
+
+    parser = PYTYPE_PARSERS.get(type)
+    if parser is None:
+        raise ValueError ('Unknown type: '+type)
+    return parser(val)
 
 
 def parse_tao_python_data1(line, clean_key=True):
@@ -131,10 +155,131 @@ def parse_tao_python_data1(line, clean_key=True):
         
     return {name:dat}
 
+
+# Types whose parser raises on a list anyway, so the value string
+# can be converted without checking for more values.
+_SCALAR_TYPES = {'INT', 'INUM', 'REAL'}
+_VALUE_PARSERS = {}
+
+
+def value_parser(type):
+    """
+    Returns a function parsing the value string of a line
+    (everything after <component_name>;<type>;<is_variable>;)
+    exactly as parse_pytype would parse its split.
+    """
+    if type in _VALUE_PARSERS:
+        return _VALUE_PARSERS[type]
+    if type not in PYTYPE_PARSERS:
+        raise ValueError ('Unknown type: '+type)
+    parser = PYTYPE_PARSERS[type]
+    if type not in _SCALAR_TYPES:
+        def parser(s, parser=parser):
+            if ';' in s:
+                return parser(s.split(';'))
+            return parser(s)
+    _VALUE_PARSERS[type] = parser
+    return parser
+
+
+def _item_getter(indices):
+    """
+    itemgetter that always returns a tuple
+    """
+    if len(indices) == 1:
+        i = indices[0]
+        return lambda seq: (seq[i],)
+    return itemgetter(*indices)
+
+
+class TaoPythonSchema:
+    """
+    Compiled schema of the output of a Tao>python command: the
+    '<component_name>;<type>;<is_variable>;' header, key and
+    value parser of each line.
+
+    Lines are converted in groups of the same type, and put back in order.
+    """
+    __slots__ = ('headers', 'slices', 'keys', 'groups', 'order')
+
+    def __init__(self, headers, keys, types):
+        self.headers = headers
+        self.slices = [slice(len(h), None) for h in headers]
+        self.keys = keys
+        indices = {}
+        for i, type in enumerate(types):
+            indices.setdefault(type, []).append(i)
+        self.groups = [(value_parser(type), _item_getter(ix)) for type, ix in indices.items()]
+        position = [0]*len(types)
+        for j, i in enumerate(i for ix in indices.values() for i in ix):
+            position[i] = j
+        self.order = _item_getter(position)
+
+    @classmethod
+    def compile(cls, lines, clean_key=True):
+        """
+        Returns the schema of lines, or None if a line does not have a value to parse.
+        """
+        headers, keys, types = [], [], []
+        for line in lines:
+            sline = line.split(';', 3)
+            if len(sline) < 4:
+                return None
+            name, type, setable, _ = sline
+            value_parser(type)
+            headers.append(f'{name};{type};{setable};')
+            keys.append(name.replace('.', '_') if clean_key else name)
+            types.append(type)
+        return cls(headers, keys, types)
+
+    def matches(self, lines):
+        return len(lines) == len(self.headers) and all(map(str.startswith, lines, self.headers))
+
+    def parse(self, lines):
+        """
+        Parses lines that match the schema into a dict.
+        """
+        values = list(map(getitem, lines, self.slices))
+        parsed = list(chain.from_iterable(map(parser, get(values)) for parser, get in self.groups))
+        return dict(zip(self.keys, self.order(parsed)))
+
+
+# Compiled schemas, keyed by (clean_key, number of lines, header of the first line)
+_SCHEMAS = {}
+_MAX_SCHEMAS = 256
+# Held while changing _SCHEMAS, which may be shared by threads (AsyncTao, TaoPool)
+_SCHEMAS_LOCK = threading.Lock()
+
+
 def parse_tao_python_data(lines, clean_key=True):
     """
     returns dict with data
+
+    The schema of the output (the component names and types) is compiled
+    and cached the first time an output is seen, so that parsing the same
+    command again only converts the values. Output that does not match the
+    cached schema is compiled again.
     """
+    if not lines:
+        return {}
+    sline = lines[0].split(';', 3)
+    if len(sline) < 4:
+        return _parse_tao_python_data_lines(lines, clean_key)
+    schema_key = (clean_key, len(lines), ';'.join(sline[:3]))
+
+    schema = _SCHEMAS.get(schema_key)
+    if schema is None or not schema.matches(lines):
+        schema = TaoPythonSchema.compile(lines, clean_key)
+        if schema is None:
+            return _parse_tao_python_data_lines(lines, clean_key)
+        with _SCHEMAS_LOCK:
+            if schema_key not in _SCHEMAS and len(_SCHEMAS) >= _MAX_SCHEMAS:
+                del _SCHEMAS[next(iter(_SCHEMAS))]
+            _SCHEMAS[schema_key] = schema
+    return schema.parse(lines)
+
+
+def _parse_tao_python_data_lines(lines, clean_key=True):
     dat = {}
     for l in lines:
         dat.update(parse_tao_python_data1(l, clean_key))
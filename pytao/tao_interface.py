@@ -9,8 +9,8 @@ import os
 import re
 import io
 
-from .tao_pexpect import tao_io
 from .tao_ctypes import Tao
+from .tao_ctypes.cache import CommandCache
 
 class new_stdout(object):
     '''
@@ -70,6 +70,8 @@ class tao_interface():
     '''
     def __init__(self, mode="ctypes", init_args = "", tao_exe =  "", expect_str = "Tao>", so_lib=""):
         self.mode = mode
+        # Tracks the lattice generation in pexpect mode (nothing is cached)
+        self._pexpect_generation = CommandCache(maxsize=0)
         self.exe_lib_warnings = ""
         self.exe_lib_warning_type = 'normal'
         # Where to look for the shared library/executable
@@ -141,6 +143,8 @@ class tao_interface():
         # new_stdout() needed to capture print statements from tao_io
         with new_stdout() as output:
             if mode == "pexpect":
+                # pexpect is only needed for this backend
+                from .tao_pexpect import tao_io
                 self.pexpect_pipe = tao_io(init_args=init_args,
                         tao_exe=tao_exe, expect_str=expect_str)
             if mode == "ctypes":
@@ -163,6 +167,7 @@ class tao_interface():
         '''
         # Run the command:
         if self.mode=="pexpect":
+            self._pexpect_generation.update(cmd_str)
             output = self.pexpect_pipe.cmd_in(cmd_str)
         elif self.mode=='ctypes':
             output_list = self.ctypes_pipe.cmd(cmd_str)
@@ -183,6 +188,16 @@ class tao_interface():
 
         return output
 
+    @property
+    def generation(self):
+        '''
+        Lattice generation counter, incremented by every command that may
+        change the state of Tao. See Tao.generation
+        '''
+        if self.mode == 'ctypes':
+            return self.ctypes_pipe.generation
+        return self._pexpect_generation.generation
+
     def cmd(self, cmd_str):
         '''
         Runs cmd_str at the Tao command line and prints the output
@@ -0,0 +1,87 @@
+"""
+Stand-in for the libtao shared library, to test Tao without libtao.
+"""
+import ctypes
+
+import numpy as np
+
+from pytao.tao_ctypes.cache import CommandCache, calc_toggle
+from pytao.tao_ctypes.core import Tao
+
+
+class FakeLibtao:
+    """
+    Has the functions of libtao used by Tao, with fixed outputs.
+
+    outputs: dict of command string -> output lines
+    real, integer: arrays loaded in the scratch space by every command
+
+    Handles 'set global plot_on/lattice_calc_on' and 'python global'.
+    All commands sent are appended to commands.
+    """
+    def __init__(self, outputs=None, real=(), integer=()):
+        self.outputs = dict(outputs or {})
+        self.globals = {'plot_on': True, 'lattice_calc_on': True}
+        self.commands = []
+        self.set_arrays(real, integer)
+        self._lines = []
+
+    def set_arrays(self, real=(), integer=()):
+        self.real = (ctypes.c_double * len(real))(*real)
+        self.integer = (ctypes.c_int * len(integer))(*integer)
+
+    def tao_c_command(self, cmd):
+        cmd = cmd.decode('utf-8')
+        self.commands.append(cmd)
+        toggle = calc_toggle(cmd)
+        if toggle is not None:
+            name, on = toggle
+            self.globals[name] = on
+            self._lines = []
+        elif cmd == 'python global':
+            self._lines = [f'{k};LOGIC;T;{"T" if v else "F"}' for k, v in self.globals.items()]
+        else:
+            self._lines = list(self.outputs.get(cmd, []))
+
+    def tao_c_out_io_buffer_num_lines(self):
+        return len(self._lines)
+
+    def tao_c_out_io_buffer_get_line(self, i):
+        return self._lines[i-1].encode('utf-8')
+
+    def tao_c_out_io_buffer_reset(self):
+        self._lines = []
+
+    def tao_c_real_array_size(self):
+        return len(self.real)
+
+    def tao_c_get_real_array(self):
+        # NULL if empty, as it must not be dereferenced
+        if not len(self.real):
+            return ctypes.POINTER(ctypes.c_double)()
+        return ctypes.cast(self.real, ctypes.POINTER(ctypes.c_double))
+
+    def tao_c_integer_array_size(self):
+        return len(self.integer)
+
+    def tao_c_get_integer_array(self):
+        if not len(self.integer):
+            return ctypes.POINTER(ctypes.c_int)()
+        return ctypes.cast(self.integer, ctypes.POINTER(ctypes.c_int))
+
+    def real_buffer(self):
+        """
+        Returns an np.ndarray viewing the real scratch space.
+        """
+        return np.ctypeslib.as_array(self.real)
+
+
+def fake_tao(libtao=None, cache_size=0):
+    """
+    Returns a Tao instance using libtao, a FakeLibtao, without loading the shared library.
+    """
+    tao = Tao.__new__(Tao)
+    tao.cmd_cache = CommandCache(maxsize=cache_size)
+    tao.so_lib = libtao if libtao is not None else FakeLibtao()
+    tao.so_lib_file = None
+    return tao
@@ -0,0 +1,26 @@
+"""
+Records for TaoReplay, to test Tao methods without libtao.
+"""
+import numpy as np
+
+from pytao.tao_ctypes.replay import encode_array
+
+
+def cmd_record(cmd, lines=()):
+    """
+    Record of tao.cmd(cmd) returning lines.
+    """
+    return {'type': 'cmd', 'cmd': cmd, 'dt': 0, 'lines': list(lines)}
+
+
+def array_record(kind, cmd, values=None, *, error=None):
+    """
+    Record of tao.cmd_real(cmd) (kind 'real') or tao.cmd_integer(cmd) (kind 'integer')
+    returning values, or failing with error.
+    """
+    record = {'type': kind, 'cmd': cmd, 'dt': 0}
+    if error is not None:
+        record['error'] = error
+    else:
+        record['array'] = encode_array(np.asarray(values, dtype=float if kind == 'real' else np.intc))
+    return record
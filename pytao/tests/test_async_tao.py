@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import pytest
+
+from pytao import TaoReplay
+from pytao.tao_ctypes.async_tao import AsyncTao
+from pytao.tests.replay_records import cmd_record
+
+
+def test_async_tao_order():
+    replay = TaoReplay([cmd_record('a', ['1']), cmd_record('a', ['2']), cmd_record('a', ['3']), cmd_record('b', ['4'])])
+
+    async def main():
+        async with AsyncTao(tao=replay) as tao:
+            return await asyncio.gather(tao.cmd('a'), tao.cmd('b'), tao.cmd('a'), tao.cmd('a'))
+
+    assert asyncio.run(main()) == [['1'], ['4'], ['2'], ['3']]
+
+
+def test_async_tao_errors():
+    replay = TaoReplay([cmd_record('bad', ['[ERROR] oops']), cmd_record('good', ['ok'])])
+
+    async def main():
+        async with AsyncTao(tao=replay) as tao:
+            with pytest.raises(RuntimeError, match='oops'):
+                await tao.cmd('bad')
+            # The worker keeps running
+            assert await tao.cmd('bad', raises=False) == ['[ERROR] oops']
+            assert await tao.cmd('good') == ['ok']
+            with pytest.raises(KeyError):
+                await tao.cmd('not recorded')
+
+    asyncio.run(main())
+
+
+def test_async_tao_close():
+    replay = TaoReplay([cmd_record('a', ['1']), cmd_record('b', ['2'])])
+    started, release = threading.Event(), threading.Event()
+    replay_cmd = replay.cmd
+
+    def blocking_cmd(cmd, **kwargs):
+        if cmd == 'a':
+            started.set()
+            release.wait(5)
+        return replay_cmd(cmd, **kwargs)
+
+    replay.cmd = blocking_cmd
+
+    async def main():
+        tao = AsyncTao(tao=replay)
+        running = asyncio.ensure_future(tao.cmd('a'))
+        queued = asyncio.ensure_future(tao.cmd('b'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+        # Releases the running call after close has cancelled the queued one
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        tao.close()
+        timer.join()
+
+        assert await running == ['1']
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        with pytest.raises(RuntimeError, match='closed'):
+            await tao.cmd('b')
+
+    asyncio.run(main())
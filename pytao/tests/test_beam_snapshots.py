@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+h5py = pytest.importorskip('h5py')
+
+from pytao import TaoReplay
+from pytao.tao_ctypes.beam_snapshots import BeamSnapshotWriter, write_beam_snapshots
+from pytao.tests.replay_records import array_record, cmd_record
+
+
+def bunch_records(elements, n=50):
+    records = []
+    for ele in elements:
+        rng = np.random.default_rng([ord(c) for c in ele])
+        records.append(cmd_record(f'python bunch_params {ele}|model', ['species;SPECIES;F;Electron']))
+        for c in ['x', 'px', 'y', 'py', 't', 'pz', 'charge', 'p0c']:
+            values = np.full(n, 1e9) if c == 'p0c' else rng.normal(size=n) * 1e-3
+            records.append(array_record('real', f'python bunch1 {ele}|model 1 {c}', values))
+        state = np.ones(n, dtype=np.intc)
+        state[0] = 2
+        records.append(array_record('integer', f'python bunch1 {ele}|model 1 state', state))
+    return records
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_write_beam_snapshots(tmp_path, background):
+    elements = ['BEGINNING', 'Q1', 'END']
+    path = tmp_path / 'beam.h5'
+    tao = TaoReplay(bunch_records(elements))
+    assert write_beam_snapshots(tao, path, elements, background=background, chunk_size=16) == elements
+
+    expected = TaoReplay(bunch_records(['END'])).bunch_data('END')
+    with h5py.File(path, 'r') as h5:
+        assert h5.attrs['basePath'] == '/data/%T/'
+        assert list(h5['data']) == ['00001', '00002', '00003']
+        g = h5['data/00003']
+        assert g.attrs['locationName'] == 'END'
+        p = g['particles']
+        assert p.attrs['speciesType'] == 'electron'
+        assert p.attrs['numParticles'] == 50
+        np.testing.assert_allclose(p.attrs['chargeLive'], expected['weight'][1:].sum())
+        assert p['momentum/z'].chunks == (16,)
+        assert p['momentum/z'].compression == 'gzip'
+        np.testing.assert_array_equal(p['momentum/z'][:], expected['pz'])
+        np.testing.assert_array_equal(p['particleStatus'][:], expected['status'])
+        np.testing.assert_array_equal(p['time'][:], expected['t'])
+
+
+def test_write_beam_snapshots_resume(tmp_path):
+    elements = ['BEGINNING', 'Q1', 'END']
+    path = tmp_path / 'beam.h5'
+    write_beam_snapshots(TaoReplay(bunch_records(elements[:2])), path, elements[:2])
+
+    # Simulate an interrupted write
+    with h5py.File(path, 'a') as h5:
+        del h5['data/00002'].attrs['snapshotComplete']
+
+    with BeamSnapshotWriter(path) as writer:
+        assert writer.completed() == {'BEGINNING': '00001'}
+
+    # Only the missing elements are fetched
+    tao = TaoReplay(bunch_records(elements[1:]))
+    assert write_beam_snapshots(tao, path, elements) == ['Q1', 'END']
+    with h5py.File(path, 'r') as h5:
+        names = [h5['data'][name].attrs['locationName'] for name in h5['data']]
+    assert names == elements
+
+    with BeamSnapshotWriter(path) as writer:
+        with pytest.raises(ValueError):
+            writer.write('END', {})
+
+
+def test_beam_snapshot_writer_background_error(tmp_path):
+    with pytest.raises(KeyError):
+        with BeamSnapshotWriter(tmp_path / 'beam.h5', background=True) as writer:
+            writer.write('BAD', {})
+
+
+def test_beam_snapshot_writer_write_after_error(tmp_path):
+    path = tmp_path / 'beam.h5'
+    data = TaoReplay(bunch_records(['Q1'])).bunch_data('Q1')
+    writer = BeamSnapshotWriter(path, background=True)
+    writer.write('BAD', {})
+    writer._queue.join()
+
+    # Refused, and not counted as written
+    for _ in range(2):
+        with pytest.raises(KeyError):
+            writer.write('Q1', data)
+    assert writer.completed() == {}
+    # Already raised by write
+    writer.close()
+
+    with BeamSnapshotWriter(path) as writer:
+        assert writer.completed() == {}
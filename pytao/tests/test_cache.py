@@ -0,0 +1,89 @@
+from pytao.tao_ctypes.cache import CommandCache, calc_toggle, is_cacheable, is_read_only
+from pytao.tests.fake_libtao import fake_tao
+
+
+def test_is_cacheable():
+    assert is_cacheable('python lat_ele_list 1@0')
+    assert is_cacheable('python ele:head 1@0>>3|model')
+    assert is_cacheable('python plot_list t')
+    assert not is_cacheable('python merit')
+    assert not is_cacheable('python datum_create X.A[1]^^beta.a')
+    assert not is_cacheable('show lattice')
+
+
+def test_is_read_only():
+    assert is_read_only('python merit')
+    assert is_read_only('python global')
+    assert not is_cacheable('python global')
+    assert is_read_only('show lattice')
+    for cmd in ['set ele Q1 k1 = 0.1', 'reinit tao', 'call file.tao',
+                'python var_v1_create q 1 2', 'python data_d2_destroy X']:
+        assert not is_read_only(cmd)
+
+
+def test_command_cache():
+    cache = CommandCache(maxsize=2)
+    assert cache.get('a') is None
+    cache.put('a', ['1'])
+    cache.put('b', ['2'])
+    assert cache.get('a') == ['1']
+    cache.put('c', ['3'])
+    # b was least recently used
+    assert cache.get('b') is None
+    assert cache.get('c') == ['3']
+
+    cache.update('python ele:head 1')
+    assert cache.get('a') == ['1']
+    cache.update('set ele Q1 k1 = 0.1')
+    assert cache.get('a') is None
+
+    stats = cache.stats()
+    assert stats['generation'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 3
+
+
+def test_calc_toggle():
+    assert calc_toggle('set global plot_on = F') == ('plot_on', False)
+    assert calc_toggle('set global lattice_calc_on=.true.') == ('lattice_calc_on', True)
+    assert calc_toggle('set global track_type = beam') is None
+    assert calc_toggle('set global lattice_calc_on = maybe') is None
+
+
+def test_command_cache_calc_toggle():
+    cache = CommandCache()
+    cache.put('a', ['1'])
+    # Nothing changed while off
+    cache.update('set global plot_on = F')
+    cache.update('set global lattice_calc_on = F')
+    cache.update('python lat_list 1@0>>*|model ele.s')
+    cache.update('set global plot_on = T')
+    cache.update('set global lattice_calc_on = T')
+    assert cache.generation == 0
+    assert cache.get('a') == ['1']
+
+    # Changed while off: Tao recalculates when turned back on
+    cache.update('set global lattice_calc_on = F')
+    cache.update('set ele Q1 k1 = 0.1')
+    cache.put('b', ['2'])
+    cache.update('set global lattice_calc_on = T')
+    assert cache.generation == 2
+    assert cache.get('b') is None
+
+    # Turned on without being known to be off
+    cache.update('set global plot_on = T')
+    assert cache.generation == 3
+
+
+def test_suspend_calc_nested_with_cache():
+    tao = fake_tao(cache_size=16)
+    libtao = tao.so_lib
+    assert tao.tao_global()['lattice_calc_on']
+    with tao.suspend_calc():
+        # Not served from the cache
+        assert not tao.tao_global()['lattice_calc_on']
+        with tao.suspend_calc():
+            pass
+        assert libtao.globals == {'plot_on': False, 'lattice_calc_on': False}
+    assert libtao.globals == {'plot_on': True, 'lattice_calc_on': True}
+    assert libtao.commands.count('set global lattice_calc_on = T') == 1
@@ -0,0 +1,80 @@
+import ctypes
+
+import numpy as np
+import pytest
+
+from pytao.tao_ctypes.core import scratch_array
+from pytao.tests.fake_libtao import FakeLibtao, fake_tao
+
+
+def test_scratch_array():
+    buffer = (ctypes.c_double * 3)(1.0, 2.0, 3.0)
+    view = scratch_array(ctypes.cast(buffer, ctypes.POINTER(ctypes.c_double)), 3)
+    assert view.tolist() == [1.0, 2.0, 3.0]
+    # No copy
+    buffer[1] = 5.0
+    assert view[1] == 5.0
+
+    # A NULL pointer is not dereferenced
+    empty = scratch_array(ctypes.POINTER(ctypes.c_int)(), 0)
+    assert empty.shape == (0,)
+    assert empty.dtype == np.intc
+
+
+def test_cmd_array_copy():
+    libtao = FakeLibtao(real=[1.0, 2.0, 3.0], integer=[4, 5])
+    tao = fake_tao(libtao)
+
+    view = tao.cmd_real('python lat_list -array_out * ele.s', copy=False)
+    assert np.shares_memory(view, libtao.real_buffer())
+    assert not view.flags.writeable
+    with pytest.raises(ValueError):
+        view[0] = 0.0
+
+    array = tao.cmd_real('python lat_list -array_out * ele.s')
+    assert not np.shares_memory(array, libtao.real_buffer())
+    assert array.flags.writeable
+    assert array.tolist() == [1.0, 2.0, 3.0]
+
+    integers = tao.cmd_integer('python lat_list -array_out * orbit.state')
+    assert integers.dtype == np.intc
+    assert integers.tolist() == [4, 5]
+
+
+def test_cmd_array_out():
+    libtao = FakeLibtao(real=[1.0, 2.0, 3.0], integer=[4, 5])
+    tao = fake_tao(libtao)
+
+    out = np.zeros(3)
+    assert tao.cmd_real('python lat_list -array_out * ele.s', out=out) is out
+    assert out.tolist() == [1.0, 2.0, 3.0]
+    assert not np.shares_memory(out, libtao.real_buffer())
+
+    # Integers fit in a float array, as in bunch_array
+    out = np.zeros(2)
+    tao.cmd_integer('python lat_list -array_out * orbit.state', out=out)
+    assert out.tolist() == [4.0, 5.0]
+
+    with pytest.raises(ValueError, match='shape'):
+        tao.cmd_real('python lat_list -array_out * ele.s', out=np.zeros(2))
+    with pytest.raises(ValueError, match='dtype'):
+        tao.cmd_real('python lat_list -array_out * ele.s', out=np.zeros(3, dtype=np.intc))
+
+
+def test_cmd_array_empty():
+    # The array pointers are NULL
+    tao = fake_tao(FakeLibtao())
+    for copy in [True, False]:
+        array = tao.cmd_real('python lat_list -array_out * ele.s', copy=copy)
+        assert array.shape == (0,)
+        assert array.dtype == np.float64
+    out = np.zeros(0, dtype=np.intc)
+    assert tao.cmd_integer('python lat_list -array_out * orbit.state', out=out) is out
+
+
+def test_cmd_array_error():
+    libtao = FakeLibtao({'python bad': ['[ERROR | 2024-JAN-01] bad']}, real=[1.0])
+    tao = fake_tao(libtao)
+    assert tao.cmd_real('python bad', raises=False) is None
+    with pytest.raises(RuntimeError, match='bad'):
+        tao.cmd_real('python bad')
@@ -0,0 +1,75 @@
+import math
+import sys
+
+import numpy as np
+import pytest
+
+from pytao.util.evaluate_expression import compile_expr, eval_expr
+
+
+def test_eval_expr():
+    assert eval_expr('2*sqrt(4) + pi') == 4 + math.pi
+    assert eval_expr('atan2(1, 1) * 4') == pytest.approx(math.pi)
+    assert eval_expr('-2**2 % 3') == 2
+    assert eval_expr('k1 * l', {'k1': 0.5, 'l': 2}) == 1.0
+    assert eval_expr('e_log > 2') is True
+    with pytest.raises(ValueError):
+        # math domain error
+        eval_expr('sqrt(-1)')
+
+
+def test_eval_expr_arrays():
+    x = np.linspace(0.1, 1, 5)
+    np.testing.assert_allclose(eval_expr('sqrt(x) * exp(-x) + erf(x)', {'x': x}),
+                               [math.sqrt(v) * math.exp(-v) + math.erf(v) for v in x])
+    np.testing.assert_allclose(eval_expr('pow(2, 3)', use_numpy=True), 8)
+
+
+def test_eval_expr_factorial():
+    # Tao data are floats
+    x = np.array([0.0, 3.0, 5.0, 2.5])
+    np.testing.assert_allclose(eval_expr('factorial(x)', {'x': x}), [1, 6, 120, math.gamma(3.5)])
+    assert eval_expr('factorial(n)', {'n': 4.0}) == 24
+    assert eval_expr('factorial(4)') == 24
+
+
+def test_compile_expr_cached():
+    assert compile_expr('1 + k1') is compile_expr('1 + k1')
+
+
+@pytest.mark.parametrize('expr', [
+    '__import__("os")',
+    '().__class__',
+    'x.real',
+    'x[0]',
+    '"abc"',
+    'lambda: 1',
+    'open("f")',
+    'sqrt(x=1)',
+    '[1, 2]',
+    '_x + 1',
+    'True',
+])
+def test_eval_expr_not_allowed(expr):
+    with pytest.raises(ValueError):
+        eval_expr(expr, {'x': 1.0})
+
+
+def test_eval_expr_walrus():
+    # := is a SyntaxError before Python 3.8
+    with pytest.raises(ValueError if sys.version_info >= (3, 8) else SyntaxError):
+        eval_expr('(x := 1)', {'x': 1.0})
+
+
+def test_eval_expr_reserved_variable():
+    with pytest.raises(ValueError):
+        eval_expr('sin + 1', {'sin': 2.0})
+    with pytest.raises(ValueError):
+        eval_expr('pi * x', {'pi': 3, 'x': np.ones(2)})
+
+
+def test_eval_expr_errors():
+    with pytest.raises(SyntaxError):
+        eval_expr('1 +')
+    with pytest.raises(NameError):
+        eval_expr('undefined + 1')
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from pytao import TaoReplay
+from pytao.tests.replay_records import array_record, cmd_record
+
+
+def test_derivative_labels():
+    tao = TaoReplay([
+        cmd_record('python data_d2_array 1', ['orbit', 'twiss']),
+        cmd_record('python data_d1_array 1@orbit', ['1;orbit;orbit;y;T;1;4', '2;orbit;orbit;x;T;1;4']),
+        cmd_record('python data_d1_array 1@twiss', []),
+        cmd_record('python data_d_array 1@orbit.y', []),
+        cmd_record('python data_d_array 1@orbit.x', [
+            '1;orbit.x;target;;;BPM1;0.0000000E+00;1.5000000E-03;0.0000000E+00;T;T;T;1.0000000E+06;T',
+            '2;orbit.x;target;;;BPM2;1.0000000E-04;-2.5000000E-03;0.0000000E+00;F;T;F;1.0000000E+06;T']),
+        cmd_record('python var_general', ['quad_k1;0;2', 'quad_k2;1;1']),
+        cmd_record('python var_v_array quad_k1', [
+            '0;Q00W[K1];0.0;-0.84;-0.84;F;F;1.0E+05',
+            '1;Q01W[K1];0.0;-0.13;-0.13;T;T;1.0E+05',
+            '2;Q02W[K1];0.0;-0.13;-0.13;T;T;1.0E+05']),
+        cmd_record('python var_v_array quad_k2', ['1;Q01W[K2];0.0;1.0;1.0;T;T;1.0E+05']),
+    ])
+    labels = tao.derivative_labels()
+    assert labels == {'data': ['orbit.x[1]'],
+                      'variables': ['quad_k1[1]', 'quad_k1[2]', 'quad_k2[1]']}
+    with tao.collect_stats() as stats:
+        assert tao.derivative_labels(data=False) == {'data': None, 'variables': labels['variables']}
+    assert 'python data_d2_array' not in stats.as_dict()
+
+
+def test_lat_table():
+    base = '-track_only 1@0>>*|model'
+    tao = TaoReplay([
+        array_record('integer', f'python lat_list -array_out {base} ele.ix_ele', [0, 1, 2]),
+        cmd_record(f'python lat_list {base} ele.name', ['BEGINNING', 'Q1', 'END']),
+        array_record('real', f'python lat_list -array_out {base} ele.a.beta', [10.0, 12.5, 11.0]),
+        array_record('integer', f'python lat_list -array_out {base} orbit.state', [1, 1, 1]),
+        array_record('real', f'python lat_list -array_out {base} ele.vec0', np.arange(18)),
+    ])
+    table = tao.lat_table(['ele.ix_ele', 'ele.name', 'ele.a.beta', 'orbit.state', 'ele.vec0'])
+    assert list(table) == ['ele.ix_ele', 'ele.name', 'ele.a.beta', 'orbit.state', 'ele.vec0']
+    assert table['ele.ix_ele'].tolist() == [0, 1, 2]
+    assert table['ele.name'].tolist() == ['BEGINNING', 'Q1', 'END']
+    assert table['ele.a.beta'].tolist() == [10.0, 12.5, 11.0]
+    assert table['orbit.state'].dtype.kind == 'i'
+    assert table['ele.vec0'].shape == (3, 6)
+
+    tao = TaoReplay([array_record('integer', f'python lat_list -array_out {base} ele.ix_ele', [0, 1, 2]),
+                     array_record('real', f'python lat_list -array_out {base} ele.vec0', np.arange(4))])
+    with pytest.raises(ValueError):
+        tao.lat_table('ele.vec0')
+
+
+def test_lat_list_multi():
+    base = '-track_only 1@0>>Q*|model'
+    records = [
+        cmd_record('python global', ['plot_on;LOGIC;T;T', 'lattice_calc_on;LOGIC;T;T']),
+        cmd_record('set global plot_on = F'),
+        cmd_record('set global lattice_calc_on = F'),
+        array_record('real', f'python lat_list -array_out {base} ele.s', [1.0, 2.0]),
+        array_record('integer', f'python lat_list -array_out {base} orbit.state', [1, 3]),
+        array_record('real', f'python lat_list -array_out {base} ele.mat6', np.arange(72)),
+        cmd_record(f'python lat_list {base} ele.name', ['Q1', 'Q22']),
+        cmd_record('set global plot_on = T'),
+        cmd_record('set global lattice_calc_on = T'),
+    ]
+    tao = TaoReplay(records)
+    whos = ['ele.s', 'orbit.state', 'ele.name', 'ele.mat6']
+    table = tao.lat_list_multi('Q*', whos)
+    assert table.dtype.names == tuple(whos)
+    assert table['ele.s'].tolist() == [1.0, 2.0]
+    assert table['orbit.state'].dtype == np.intc
+    assert table['orbit.state'].tolist() == [1, 3]
+    assert table['ele.name'].tolist() == ['Q1', 'Q22']
+    np.testing.assert_array_equal(table['ele.mat6'][1], np.arange(36, 72).reshape(6, 6))
+
+    out = np.zeros_like(table)
+    assert TaoReplay(records).lat_list_multi('Q*', whos, out=out) is out
+    np.testing.assert_array_equal(out, table)
+
+    with pytest.raises(ValueError):
+        TaoReplay(records).lat_list_multi('Q*', whos, out=out[:1])
+
+    # Element names longer than the previous ones
+    records[6] = cmd_record(f'python lat_list {base} ele.name', ['Q1', 'Q22LONG'])
+    with pytest.raises(ValueError, match='too long'):
+        TaoReplay(records).lat_list_multi('Q*', whos, out=out)
+
+
+def test_bunch_data():
+    rng = np.random.default_rng(0)
+    n = 100
+    coords = {c: rng.normal(size=n) * 1e-3 for c in ['x', 'px', 'y', 'py', 't', 'pz']}
+    coords['charge'] = np.full(n, 1e-15)
+    coords['p0c'] = np.full(n, 1e9)
+    records = [cmd_record('python bunch_params end|model', ['species;SPECIES;F;Electron'])]
+    for c, values in coords.items():
+        records.append(array_record('real', f'python bunch1 end|model 1 {c}', values))
+    records.append(array_record('integer', 'python bunch1 end|model 1 state', np.ones(n)))
+
+    array = TaoReplay(records).bunch_array('end', ['x', 'state', 'p0c'])
+    assert array.shape == (n, 3)
+    assert array.flags.f_contiguous
+    np.testing.assert_array_equal(array[:, 0], coords['x'])
+    np.testing.assert_array_equal(array[:, 1], 1)
+
+    tao = TaoReplay(records)
+    data = tao.bunch_data('end')
+    assert list(data) == ['x', 'px', 'y', 'py', 't', 'pz', 'status', 'weight', 'z', 'species']
+    p0c = coords['p0c']
+    np.testing.assert_allclose(data['px'], coords['px'] * p0c)
+    np.testing.assert_allclose(data['py'], coords['py'] * p0c)
+    pz = np.sqrt((coords['pz'] + 1)**2 - coords['px']**2 - coords['py']**2) * p0c
+    np.testing.assert_allclose(data['pz'], pz, rtol=1e-14)
+    np.testing.assert_array_equal(data['x'], coords['x'])
+    np.testing.assert_array_equal(data['weight'], coords['charge'])
+    np.testing.assert_array_equal(data['z'], 0)
+    assert data['status'].tolist() == [1] * n
+    assert data['species'] == 'electron'
+
+    x = data['x']
+    assert tao.bunch_data('end', out=data) is data
+    assert data['x'] is x
+    np.testing.assert_allclose(data['pz'], pz, rtol=1e-14)
+
+
+def test_evaluate_many():
+    from pytao.tao_ctypes import TaoEvaluateError
+
+    def record(expression, values=None, error=None):
+        return array_record('real', f'python evaluate -array_out {expression}', values, error=error)
+
+    records = [record('lat::orbit.x[end]', [1.5e-3]),
+               record('lat::r.11[1:3]', [1.0, 2.0, 3.0]),
+               record('bad::x', error='[ERROR | 2024-JAN-01] tao_evaluate_expression: bad')]
+
+    tao = TaoReplay(records)
+    with tao.collect_stats() as stats:
+        values = tao.evaluate_many(['lat::orbit.x[end]', 'lat::r.11[1:3]', 'lat::orbit.x[end]'])
+    assert sum(d['count'] for d in stats.as_dict().values()) == 2
+    assert values['lat::orbit.x[end]'] == 1.5e-3
+    assert isinstance(values['lat::orbit.x[end]'], float)
+    np.testing.assert_array_equal(values['lat::r.11[1:3]'], [1.0, 2.0, 3.0])
+
+    with pytest.raises(TaoEvaluateError) as excinfo:
+        tao.evaluate_many(['bad::x', 'lat::orbit.x[end]'])
+    assert list(excinfo.value.errors) == ['bad::x']
+    assert 'tao_evaluate_expression' in excinfo.value.errors['bad::x']
+    assert excinfo.value.values == {'lat::orbit.x[end]': 1.5e-3}
+
+    values = tao.evaluate_many(['bad::x', 'lat::orbit.x[end]'], raises=False)
+    assert values == {'bad::x': None, 'lat::orbit.x[end]': 1.5e-3}
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+
+# Modules that `import pytao` must not load. They are imported on first use.
+DEFERRED_MODULES = [
+    'asyncio',
+    'h5py',
+    'matplotlib',
+    'multiprocessing',
+    'pexpect',
+    'pytao.gui.main',
+    'pytao.interface_commands',
+    'pytao.tao_pexpect',
+    'subprocess',
+    'tkinter',
+]
+
+# Cumulative import time of pytao, excluding numpy, in milliseconds.
+IMPORT_BUDGET_MS = 100
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter with `python -X importtime`.
+
+    Returns a dict of imported module name: cumulative import time in us
+    """
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                       capture_output=True, text=True, check=True)
+    times = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_pytao_defers_modules():
+    times = import_times('pytao')
+    loaded = [m for m in DEFERRED_MODULES if m in times]
+    assert not loaded, f'import pytao loads: {loaded}'
+
+
+def test_import_pytao_budget():
+    # Take the best of a few runs to reduce noise
+    elapsed = []
+    for _ in range(3):
+        times = import_times('pytao')
+        elapsed.append(times['pytao'] - times.get('numpy', 0))
+    best_ms = min(elapsed) / 1000
+    assert best_ms < IMPORT_BUDGET_MS, f'import pytao took {best_ms:.1f} ms (excluding numpy), budget is {IMPORT_BUDGET_MS} ms'
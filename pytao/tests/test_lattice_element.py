@@ -0,0 +1,87 @@
+from pytao.util.lattice_element import lat_element
+
+
+HEAD = '\n'.join([
+    'name;STR;F;Q1',
+    'key;STR;F;Quadrupole',
+    's;REAL;F;1.5',
+    'ab;STRUCT;T;x;REAL;1.0;n;INT;3',
+    'vec;REAL_ARR;T;1.0;2.0',
+    'has#twiss;LOGIC;F;T',
+    'num#lord_slave;INT;F;0',
+])
+
+
+class FakePipe:
+    """
+    Stands in for a tao_interface, counting the commands.
+    """
+    def __init__(self):
+        self.generation = 0
+        self.cmds = []
+
+    def cmd_in(self, cmd):
+        self.cmds.append(cmd)
+        if cmd.startswith('python ele:head'):
+            return HEAD
+        if cmd.startswith('python ele:twiss'):
+            return 'beta_a;REAL;F;10.0\nalpha_a;REAL;F;-1.0'
+        if cmd.startswith('python ele:mat6'):
+            return 'mat6_1;REAL_ARR;F;1.0;0.0;0.0;0.0;0.0;0.0'
+        return ''
+
+
+def test_lat_element_cache():
+    pipe = FakePipe()
+    ele = lat_element(1, 0, 5, 'design', pipe)
+    assert pipe.cmds == ['python ele:head 1@0>>5|design']
+    assert ele.params['name'].value == 'Q1'
+    # can_vary is F for design
+    assert not ele.params['s'].can_vary
+    assert ele.has['twiss'].value is True
+    assert ele.num['lord_slave'].value == 0
+
+    # The GUI replaces and changes parameters of its element
+    ele.params['s'].value = 3.0
+    ele.params['name'] = None
+
+    ele2 = lat_element(1, 0, 5, 'design', pipe)
+    assert len(pipe.cmds) == 1
+    assert ele2.params['s'].value == 1.5
+    assert ele2.params['name'].value == 'Q1'
+
+    # Sub-blocks are fetched on access
+    assert ele2.twiss['beta_a'].value == 10.0
+    assert ele.twiss['alpha_a'].value == -1.0
+    assert ele2.mat6['mat6_1'].value[0] == 1.0
+    assert pipe.cmds[1:] == ['python ele:twiss 1@0>>5|design', 'python ele:mat6 1@0>>5|design mat6']
+
+    # Other elements are fetched
+    lat_element(1, 0, 6, 'design', pipe)
+    assert len(pipe.cmds) == 4
+
+    # The lattice changed
+    pipe.generation += 1
+    lat_element(1, 0, 5, 'design', pipe).twiss
+    assert pipe.cmds[4:] == ['python ele:head 1@0>>5|design', 'python ele:twiss 1@0>>5|design']
+
+
+def test_lat_element_without_generation():
+    pipe = FakePipe()
+    pipe.generation = None
+    lat_element(1, 0, 5, 'model', pipe)
+    lat_element(1, 0, 5, 'model', pipe)
+    assert len(pipe.cmds) == 2
+
+
+def test_lat_element_copies_structs():
+    pipe = FakePipe()
+    ele = lat_element(1, 0, 5, 'model', pipe)
+    assert ele.params['ab'].get_component('x') == 1.0
+    ele.params['ab'].value[0].value = 2.0
+    ele.params['vec'].value[1] = 5.0
+
+    ele2 = lat_element(1, 0, 5, 'model', pipe)
+    assert len(pipe.cmds) == 1
+    assert ele2.params['ab'].get_component('x') == 1.0
+    assert ele2.params['vec'].value == [1.0, 2.0]
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from pytao import TaoReplay
+from pytao.tests.replay_records import array_record, cmd_record
+
+
+NAMES = ['BEGINNING', 'D1', 'Q1', 'M1', 'Q2W', 'D1', 'Q1', 'END']
+KEYS = ['Beginning_Ele', 'Drift', 'Quadrupole', 'Marker', 'Quadrupole', 'Drift', 'Quadrupole', 'Marker']
+S = [0.0, 1.0, 1.5, 1.5, 2.0, 3.0, 3.5, 3.5]
+
+
+def lat_records():
+    base = '-track_only 1@0>>*|model'
+    return [
+        array_record('integer', f'python lat_list -array_out {base} ele.ix_ele', np.arange(len(NAMES))),
+        cmd_record(f'python lat_list {base} ele.name', NAMES),
+        cmd_record(f'python lat_list {base} ele.key', KEYS),
+        array_record('real', f'python lat_list -array_out {base} ele.s', S),
+    ]
+
+
+def calc_records():
+    return [
+        cmd_record('python global', ['plot_on;LOGIC;T;T', 'lattice_calc_on;LOGIC;T;T']),
+        cmd_record('set global plot_on = F'),
+        cmd_record('set global lattice_calc_on = F'),
+        cmd_record('set global lattice_calc_on = T'),
+        cmd_record('set global plot_on = T'),
+    ]
+
+
+def test_lattice_index():
+    tao = TaoReplay(lat_records())
+    index = tao.lattice_index()
+    assert tao.lattice_index() is index
+    assert len(index) == 8
+    assert index.names.tolist() == NAMES
+
+    # Duplicates are kept
+    assert index.indices('Q1') == [2, 6]
+    assert index.indices('q1') == [2, 6]
+    assert index.indices('NOPE') == []
+    assert 'd1' in index
+
+    assert index.match('Q*').tolist() == [2, 4, 6]
+    assert index.match('Q%').tolist() == [2, 6]
+    assert index.match('*', key='marker').tolist() == [3, 7]
+    assert index.match(r'^Q\dW$', regex=True).tolist() == [4]
+    assert index.match(r'^q', regex=True).tolist() == []
+
+    assert index.at_s(0.0) == 0
+    assert index.at_s(0.5) == 1
+    # Element ends are included
+    assert index.at_s(1.5) == 2
+    assert index.at_s(1.7) == 4
+    assert index.at_s(np.array([0.2, 2.5, 3.5])).tolist() == [1, 5, 6]
+    with pytest.raises(ValueError):
+        index.at_s(4.0)
+    with pytest.raises(ValueError):
+        index.at_s(np.array([1.0, -1.0]))
+
+
+def test_lattice_index_rebuild():
+    tao = TaoReplay(lat_records())
+    index = tao.lattice_index()
+    index.refresh()
+    generation = index.generation
+    with tao.collect_stats() as stats:
+        index.indices('Q1')
+    assert not stats.as_dict()
+
+    tao.cmd_cache.bump()
+    with tao.collect_stats() as stats:
+        index.indices('Q1')
+    assert sum(d['count'] for d in stats.as_dict().values()) == 4
+    assert index.generation != generation
+
+
+def test_twiss_at_s_array():
+    def twiss(beta):
+        return [f'beta_a;REAL;F;{beta}', 'alpha_a;REAL;F;0.5', 'ix_ele;INT;F;3', 'location;ENUM;F;Inside']
+
+    tao = TaoReplay(lat_records() + calc_records() + [
+        cmd_record('python twiss_at_s 1@0>>0->0.5|model', twiss(1.0)),
+        cmd_record('python twiss_at_s 1@0>>3->0|model', twiss(2.0)),
+        cmd_record('python twiss_at_s 1@0>>4->0.5|model', twiss(3.0)),
+    ])
+    s = np.array([0.5, 1.5, 0.5, 2.5])
+    table = tao.twiss_at_s_array(s)
+    assert table.dtype.names == ('s', 'beta_a', 'alpha_a', 'ix_ele')
+    assert table['s'].tolist() == s.tolist()
+    assert table['beta_a'].tolist() == [1.0, 2.0, 1.0, 3.0]
+    assert table['ix_ele'].dtype.kind == 'i'
+    assert tao.twiss_at_s_array(s.reshape(2, 2)).shape == (2, 2)
+    with pytest.raises(ValueError):
+        tao.twiss_at_s_array([5.0])
+
+
+def test_twiss_at_s_array_keeps_index():
+    tao = TaoReplay(lat_records() + calc_records() + [
+        cmd_record('python twiss_at_s 1@0>>0->0.5|model', ['beta_a;REAL;F;1.0']),
+    ])
+    tao.twiss_at_s_array([0.5])
+    generation = tao.generation
+    with tao.collect_stats() as stats:
+        table = tao.twiss_at_s_array([0.5])
+    assert table['beta_a'].tolist() == [1.0]
+    # Calculations are suspended without changing the generation
+    assert stats.as_dict()['set']['count'] == 4
+    assert tao.generation == generation
+    assert 'python lat_list' not in stats.as_dict()
+    assert 'python twiss_at_s' in stats.as_dict()
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+
+from pytao import TaoObjective, TaoReplay
+from pytao.tests.fake_libtao import FakeLibtao, fake_tao
+from pytao.tests.replay_records import cmd_record
+
+
+def objective_records():
+    return [
+        cmd_record('python var_general', ['quad_k1;1;2']),
+        cmd_record('python var_v_array quad_k1', [
+            '1;Q01W[K1];0.0;-0.1;-0.1;T;T;1.0E+05',
+            '2;Q02W[K1];0.0;0.2;0.2;T;T;1.0E+05']),
+        cmd_record('python global', ['plot_on;LOGIC;T;F', 'lattice_calc_on;LOGIC;T;T']),
+        cmd_record('set global lattice_calc_on = F'),
+        cmd_record('set var quad_k1[1]|model = 0.5'),
+        cmd_record('set var quad_k1[2]|model = -0.25'),
+        cmd_record('set global lattice_calc_on = T'),
+        cmd_record('python merit', ['  1.50000000000000E+00']),
+        cmd_record('derivative'),
+        cmd_record('python derivative', ['1;1;1;1.0;2.0', '1;2;1;3.0;4.0', '1;3;1;5.0;6.0']),
+    ]
+
+
+def test_tao_objective():
+    tao = TaoReplay(objective_records())
+    objective = TaoObjective(tao)
+    assert objective.variables == ['quad_k1[1]', 'quad_k1[2]']
+    np.testing.assert_array_equal(objective.x0(), [-0.1, 0.2])
+
+    x = np.array([0.5, -0.25])
+    with tao.collect_stats() as stats:
+        assert objective.f(x) == 1.5
+        # Same x: nothing is sent
+        assert objective(x.copy()) == 1.5
+    counts = {verb: d['count'] for verb, d in stats.as_dict().items()}
+    assert counts == {'set': 4, 'python merit': 1}
+    assert objective.n_set == 1
+
+    m = objective.derivative_matrix(x)
+    np.testing.assert_array_equal(m, [[1, 2], [3, 4], [5, 6]])
+    assert objective.n_set == 1
+
+    assert [t['call'] for t in objective.timings] == ['f', 'f', 'derivative_matrix']
+    assert all(t['total'] >= t['set'] + t['read'] - 1e-9 for t in objective.timings)
+    summary = objective.timing_summary()
+    assert summary['f']['count'] == 2
+    assert summary['derivative_matrix']['count'] == 1
+
+    with pytest.raises(ValueError):
+        objective.f([1.0])
+
+
+def test_tao_objective_variables():
+    tao = TaoReplay(objective_records() + [
+        cmd_record('set var quad_k1[2]|model = 1.0'),
+        cmd_record('set var quad_k1[1]|model = 2.0'),
+    ])
+    objective = TaoObjective(tao, variables=['quad_k1[2]', 'quad_k1[1]'])
+    # Columns in the order of the variables
+    np.testing.assert_array_equal(objective.derivative_matrix([1.0, 2.0]), [[2, 1], [4, 3], [6, 5]])
+
+    with pytest.raises(ValueError, match='quad_k2'):
+        TaoObjective(tao, variables=['quad_k1[1]', 'quad_k2[1]']).jac([0.0, 0.0])
+
+
+def test_tao_objective_derivative_columns():
+    records = objective_records()
+    records[-1] = cmd_record('python derivative', ['1;1;1;1.0', '1;2;1;3.0;4.0;7.0'])
+    objective = TaoObjective(TaoReplay(records))
+    with pytest.raises(ValueError, match='3 columns'):
+        objective.derivative_matrix([0.5, -0.25])
+
+    # Trailing variables may be missing
+    records[-1] = cmd_record('python derivative', ['1;1;1;1.0', '1;2;1;3.0'])
+    objective = TaoObjective(TaoReplay(records))
+    np.testing.assert_array_equal(objective.derivative_matrix([0.5, -0.25]), [[1, 0], [3, 0]])
+
+
+def test_tao_objective_invalidation():
+    tao = TaoReplay(objective_records() + [
+        cmd_record('set var quad_k1[1]|model = 1.0', ['[ERROR] bad value']),
+        cmd_record('python merit', ['  2.00000000000000E+00']),
+        cmd_record('python merit', ['  3.00000000000000E+00']),
+    ])
+    objective = TaoObjective(tao)
+    x = np.array([0.5, -0.25])
+    assert objective.f(x) == 1.5
+
+    # A failed set leaves the lattice partly set: x is sent again
+    with pytest.raises(RuntimeError):
+        objective.f([1.0, 2.0])
+    assert objective.f(x) == 2.0
+    assert objective.n_set == 2
+
+    # The lattice changed outside of the objective
+    tao.cmd('set global lattice_calc_on = F')
+    tao.cmd('set var quad_k1[1]|model = 0.5')
+    with tao.collect_stats() as stats:
+        assert objective.f(x) == 3.0
+    assert stats.as_dict()['set']['count'] == 4
+
+
+class LinearLibtao(FakeLibtao):
+    """
+    Lattice with the data model values A @ x, for the variables quad_k1[1..n].
+    """
+    def __init__(self, A, meas, weight, merit_type):
+        super().__init__()
+        self.A, self.meas, self.weight, self.merit_type = np.asarray(A), meas, weight, merit_type
+        self.x = np.zeros(self.A.shape[1])
+
+    def tao_c_command(self, cmd):
+        words = cmd.decode('utf-8').split()
+        if words[:2] == ['set', 'var']:
+            self.x[int(words[2].split('[')[1].split(']')[0]) - 1] = float(words[-1])
+        model = self.A @ self.x
+        delta = model - self.meas
+        delta[(self.merit_type == 'max') & (delta < 0)] = 0
+        self.outputs = {
+            'python var_general': [f'quad_k1;1;{len(self.x)}'],
+            'python var_v_array quad_k1': [f'{i+1};Q{i+1}[K1];0.0;{v:.17g};0.0;T;T;1.0'
+                                           for i, v in enumerate(self.x)],
+            'python data_d2_array 1': ['orbit'],
+            'python data_d1_array 1@orbit': ['1;orbit;orbit;x;T;1;4'],
+            'python data_d_array 1@orbit.x': [f'{i+1};orbit.x;{mt};;;BPM{i+1};{me:.17g};{mo:.17g};0.0;T;T;T;{w:.17g};T'
+                                              for i, (mt, me, mo, w) in
+                                              enumerate(zip(self.merit_type, self.meas, model, self.weight))],
+            'python merit': [f'{np.sum(self.weight * delta**2):.16E}'],
+            'python derivative': [f'1;{i+1};1;' + ';'.join(f'{v:.17g}' for v in row) for i, row in enumerate(self.A)],
+        }
+        super().tao_c_command(cmd)
+
+
+def test_tao_objective_jac():
+    libtao = LinearLibtao(A=[[1.0, 2.0], [-3.0, 0.5], [0.2, 0.1], [1.0, 1.0]],
+                          meas=np.array([0.3, -0.1, 0.0, 5.0]),
+                          weight=np.array([1.0, 2.0, 10.0, 3.0]),
+                          merit_type=np.array(['target', 'target', 'max', 'max']))
+    objective = TaoObjective(fake_tao(libtao))
+    x = np.array([0.5, 0.75])
+    grad = objective.jac(x)
+    assert grad.shape == (2,)
+
+    h = 1e-6
+    fd = [(objective.f(x + h*e) - objective.f(x - h*e)) / (2*h) for e in np.eye(2)]
+    np.testing.assert_allclose(grad, fd, rtol=1e-6)
+
+    # Only changed variables are set, with one lattice calculation
+    libtao.commands.clear()
+    objective.f(x + [0.0, 0.25])
+    assert [cmd for cmd in libtao.commands if cmd.startswith('set')] == [
+        'set global plot_on = F', 'set global lattice_calc_on = F',
+        'set var quad_k1[2]|model = 1.0', 'set global lattice_calc_on = T', 'set global plot_on = T']
@@ -0,0 +1,64 @@
+import copy
+import pickle
+
+from pytao.util.parameters import tao_parameter, tao_parameter_dict, str_to_tao_param
+
+
+LINES = [
+    'real_param;REAL;T; 1.5000000000000000E+00',
+    'bad_real;REAL;F;abc',
+    'int_param;INT;F;3',
+    'logic_param;LOGIC;T;F',
+    '',
+    'axis^type;ENUM;T;s',
+    'beam_file;FILE;T;',
+    'ele_name;STR;T;Q1;ix_ele',
+    'arr;REAL_ARR;T;1.0;2.0;;next',
+    'ab;STRUCT;T;x;REAL;1.0;n;INT;3',
+]
+
+
+def test_tao_parameter_dict():
+    d = tao_parameter_dict(LINES)
+    assert list(d) == ['real_param', 'bad_real', 'int_param', 'logic_param', 'axis^type',
+                       'beam_file', 'ele_name', 'arr', 'ab']
+    assert d['real_param'].value == 1.5
+    assert d['real_param'].can_vary and not d['real_param'].is_ignored
+    assert d['bad_real'].value is None
+    assert d['int_param'].value == 3
+    assert d['logic_param'].value is False
+    assert d['axis^type'].prefix == 'axis'
+    assert d['axis^type'].name == 'type'
+    assert d['beam_file'].value == ''
+    assert d['ele_name'].value == 'Q1'
+    assert d['ele_name'].sub_param == 'ix_ele'
+    assert d['arr'].value == [1.0, 2.0, 0.0]
+    assert d['arr'].sub_param == 'next'
+    assert d['ab'].get_component('x') == 1.0
+    assert d['ab'].get_component('n') == 3
+    assert repr(d['int_param']) == 'int_param;INT;False;3'
+
+
+def test_tao_parameter_lazy_value():
+    p = str_to_tao_param('x;REAL;T;2.5')
+    # The GUI may change the type before the value is used
+    p.type = 'STR'
+    assert p.value == 2.5
+    p.value = '3'
+    assert p.value == '3'
+    assert str(p) == '3'
+
+
+def test_tao_parameter_slots():
+    p = tao_parameter('n', 'INT', 'I', '7')
+    assert not hasattr(p, '__dict__')
+    assert p.is_ignored
+    for p2 in (copy.copy(p), pickle.loads(pickle.dumps(p))):
+        assert p2.value == 7
+        assert p2.name == 'n'
+
+
+def test_tao_parameter_unknown_type(capsys):
+    p = tao_parameter('z', 'NOT_A_TYPE', 'T', '1')
+    assert 'UNKNOWN PARAMETER TYPE' in capsys.readouterr().out
+    assert p.value is None
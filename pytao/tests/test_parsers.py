@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from pytao.util import parsers
+
+
+DATA_D_LINES = [
+    '1;orbit.x;target;;;BPM1;0.0000000E+00;1.5000000E-03;0.0000000E+00;T;T;T;1.0000000E+06;T',
+    '2;orbit.x;target;;;BPM2;1.0000000E-04;-2.5000000E-03;0.0000000E+00;F;T;F;1.0000000E+06;T',
+]
+
+
+def test_parse_data_d_array_dicts():
+    datums = parsers.parse_data_d_array(DATA_D_LINES)
+    assert len(datums) == 2
+    assert list(datums[0]) == parsers.DATA_D_COLS
+    assert datums[1]['ix_d1'] == 2
+    assert datums[1]['ele_name'] == 'BPM2'
+    assert datums[1]['model_value'] == -2.5e-3
+    # 'F' is False
+    assert datums[1]['useit_opt'] is False
+    assert datums[1]['good_user'] is False
+    assert datums[1]['useit_plot'] is True
+
+
+@pytest.mark.parametrize('layout', ['columns', 'structured'])
+def test_parse_data_d_array_columnar(layout):
+    datums = parsers.parse_data_d_array(DATA_D_LINES)
+    data = parsers.parse_data_d_array(DATA_D_LINES, layout=layout)
+    for name in parsers.DATA_D_COLS:
+        assert data[name].tolist() == [d[name] for d in datums]
+    assert data['model_value'].dtype == float
+    assert data['useit_opt'].dtype == bool
+    assert data['ix_d1'].dtype.kind == 'i'
+
+
+def test_parse_data_d_array_empty():
+    assert parsers.parse_data_d_array([]) == []
+    assert len(parsers.parse_data_d_array([], layout='structured')) == 0
+    assert len(parsers.parse_data_d_array([], layout='columns')['weight']) == 0
+
+
+def test_parse_data_d_array_extra_fields():
+    lines = [DATA_D_LINES[0] + ';extra', DATA_D_LINES[1]]
+    assert parsers.parse_data_d_array(lines) == parsers.parse_data_d_array(DATA_D_LINES)
+    with pytest.raises(ValueError):
+        parsers.parse_data_d_array(['1;orbit.x;target'], layout='columns')
+    with pytest.raises(ValueError):
+        parsers.parse_data_d_array(DATA_D_LINES, layout='rows')
+
+
+def test_parse_data_d_array_dataframe():
+    pd = pytest.importorskip('pandas')
+    df = parsers.parse_data_d_array(DATA_D_LINES, layout='dataframe')
+    assert isinstance(df, pd.DataFrame)
+    np.testing.assert_array_equal(df['weight'].values, [1e6, 1e6])
+
+
+def derivative_lines(m, per_line, ix_uni=1):
+    lines = []
+    for i, row in enumerate(m):
+        for j in range(0, len(row), per_line):
+            vals = ';'.join(f'{v: .7E}' for v in row[j:j+per_line])
+            lines.append(f'{ix_uni};{i+1};{j+1};{vals}')
+    return lines
+
+
+@pytest.mark.parametrize('per_line', [1, 3, 10])
+def test_parse_derivative(per_line):
+    m = np.arange(35, dtype=float).reshape(5, 7) - 10
+    m2 = 2*m[:3]
+    lines = derivative_lines(m, per_line) + [''] + derivative_lines(m2, per_line, ix_uni=2)
+    out = parsers.parse_derivative(lines)
+    assert list(out) == [1, 2]
+    # All rows, including the last
+    np.testing.assert_array_equal(out[1], m)
+    np.testing.assert_array_equal(out[2], m2)
+
+
+
+def test_parse_derivative_sparse():
+    pytest.importorskip('scipy')
+    m = np.zeros((4, 6))
+    m[1, 2] = 1.5
+    m[3, 5] = -2
+    out = parsers.parse_derivative(derivative_lines(m, 4), sparse=True)
+    assert out[1].nnz == 2
+    np.testing.assert_array_equal(out[1].toarray(), m)
+
+
+def test_parse_derivative_bad():
+    assert parsers.parse_derivative([]) == {}
+    with pytest.raises(ValueError):
+        parsers.parse_derivative(['1;1;1;1.0;bad;2.0'])
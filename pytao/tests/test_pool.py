@@ -0,0 +1,85 @@
+import concurrent.futures
+import os
+import time
+
+import pytest
+
+from pytao.tao_ctypes import pool as pool_module
+from pytao.tao_ctypes.pool import TaoPool, TaoWorkerError
+
+
+class FakeTao:
+    """
+    Stands in for Tao in the worker processes. Commands:
+        'crash': the process exits
+        'fail': raises RuntimeError
+        'sleep {t}': sleeps t seconds
+        anything else: returned with the process id
+    """
+    def __init__(self, init):
+        if init == 'bad init':
+            raise RuntimeError('Unable to init Tao')
+
+    def cmd(self, cmd):
+        if cmd == 'crash':
+            os._exit(3)
+        if cmd == 'fail':
+            raise RuntimeError('failed')
+        if cmd.startswith('sleep'):
+            time.sleep(float(cmd.split()[1]))
+        return [cmd, os.getpid()]
+
+    def double(self, x):
+        return 2*x
+
+
+def fake_worker_main(conn, init, so_lib):
+    # Imported by the spawned workers from this module
+    pool_module._serve(conn, lambda: FakeTao(init))
+
+
+@pytest.fixture
+def fake_tao(monkeypatch):
+    monkeypatch.setattr(TaoPool, '_worker_main', staticmethod(fake_worker_main))
+
+
+def test_tao_pool_map(fake_tao):
+    with TaoPool(n_workers=2) as pool:
+        jobs = [[f'a{i}', ('double', (i,))] for i in range(10)]
+        results = pool.map(jobs, timeout=60)
+    # In the order of the jobs
+    assert [r[0][0] for r in results] == [f'a{i}' for i in range(10)]
+    assert [r[1] for r in results] == [2*i for i in range(10)]
+    # In the workers
+    assert os.getpid() not in {r[0][1] for r in results}
+
+
+def test_tao_pool_errors(fake_tao):
+    with TaoPool(n_workers=1) as pool:
+        with pytest.raises(RuntimeError, match='failed'):
+            pool.submit(['fail']).result(timeout=60)
+        pid = pool.submit(['a']).result(timeout=60)[0][1]
+
+        with pytest.raises(TaoWorkerError):
+            pool.submit(['crash']).result(timeout=60)
+        # The worker was restarted
+        assert pool._workers[0].n_restarts == 1
+        assert pool.submit(['a']).result(timeout=60)[0][1] != pid
+
+
+def test_tao_pool_init_error(fake_tao):
+    pool = TaoPool('bad init', n_workers=1)
+    with pytest.raises(RuntimeError, match='Unable to init Tao'):
+        # Fails in submit, or in the future, depending on when the worker fails
+        pool.submit(['a']).result(timeout=60)
+    pool.close()
+
+
+def test_tao_pool_map_timeout(fake_tao):
+    with TaoPool(n_workers=1) as pool:
+        pool.map([['a']], timeout=60)
+        t0 = time.monotonic()
+        with pytest.raises(concurrent.futures.TimeoutError):
+            # Each job takes less than the timeout, but not all of them
+            pool.map([['sleep 0.4']] * 4, timeout=1.0)
+        assert time.monotonic() - t0 < 1.4
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from pytao.tao_ctypes.cache import CommandCache
+from pytao.tao_ctypes.core import Tao
+from pytao.tao_ctypes.replay import TaoRecorder, TaoReplay, decode_array, encode_array
+from pytao.tao_ctypes.util import error_in_lines
+
+
+def test_encode_array():
+    for a in [np.linspace(0, 1, 7), np.arange(5, dtype=np.int32), np.empty(0)]:
+        b = decode_array(encode_array(a))
+        assert b.dtype == a.dtype
+        assert np.array_equal(a, b)
+
+
+def test_replay():
+    records = [
+        {'type': 'cmd', 'cmd': 'python global', 'dt': 0, 'lines': ['plot_on;LOGIC;T;T', 'n_opti_cycles;INT;T;20']},
+        {'type': 'real', 'cmd': 'python evaluate -array_out 1+1', 'dt': 0, 'array': encode_array(np.array([1.0]))},
+        {'type': 'real', 'cmd': 'python evaluate -array_out 1+1', 'dt': 0, 'array': encode_array(np.array([2.0]))},
+        {'type': 'real', 'cmd': 'python evaluate -array_out x', 'dt': 0, 'error': 'ERROR detected: x'},
+    ]
+    tao = TaoReplay(records)
+
+    assert tao.tao_global() == {'plot_on': True, 'n_opti_cycles': 20}
+    # Served in order, then the last one repeats
+    assert tao.evaluate('1+1')[0] == 1
+    assert tao.evaluate('1+1')[0] == 2
+    assert tao.evaluate('1+1')[0] == 2
+
+    assert tao.evaluate('x', raises=False) is None
+    with pytest.raises(RuntimeError):
+        tao.evaluate('x')
+    with pytest.raises(KeyError):
+        tao.cmd('show lattice')
+
+
+class FakeTao(Tao):
+    """
+    Tao without libtao, with fixed outputs.
+    """
+    def __init__(self):
+        self.so_lib = None
+        self.so_lib_file = None
+        self.cmd_cache = CommandCache(maxsize=0)
+
+    def init(self, cmd):
+        return [f'Initialized with {cmd}']
+
+    def cmd(self, cmd, raises=True, cache=True):
+        if cmd == 'python global':
+            lines = ['plot_on;LOGIC;T;F', 'n_opti_cycles;INT;T;20']
+        elif cmd == 'bad':
+            lines = ['[ERROR | 2024-JAN-01] bad command']
+        else:
+            lines = [cmd.upper()]
+        err = error_in_lines(lines)
+        if err and raises:
+            raise RuntimeError(f'Command: {cmd} causes error: {err}')
+        return lines
+
+    def cmd_real(self, cmd, raises=True, *, copy=True, out=None):
+        if cmd.endswith('bad'):
+            if raises:
+                raise RuntimeError('ERROR detected: bad')
+            return None
+        return np.linspace(0, 1, 5)
+
+    def cmd_integer(self, cmd, raises=True, *, copy=True, out=None):
+        return np.arange(4, dtype=np.intc)
+
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / 'session.trace.gz')
+    tao = FakeTao()
+    cmd_integer = tao.cmd_integer
+    # An instance attribute, as bound by other code
+    tao.cmd_integer = cmd_integer
+
+    def session(tao):
+        results = [tao.init('-noplot'), tao.tao_global(), tao.cmd('show x'),
+                   tao.cmd('bad', raises=False), tao.cmd_real('python evaluate -array_out 1+1'),
+                   tao.cmd_integer('python lat_list -array_out * ele.ix_ele'),
+                   tao.cmd_real('python evaluate -array_out bad', raises=False)]
+        with pytest.raises(RuntimeError):
+            tao.cmd('bad')
+        with pytest.raises(RuntimeError):
+            tao.cmd_real('python evaluate -array_out bad')
+        return results
+
+    with TaoRecorder(tao, path) as recorder:
+        recorded = session(tao)
+    assert recorder.n_records == 9
+
+    # The original methods are back
+    assert 'cmd' not in tao.__dict__
+    assert tao.cmd.__func__ is FakeTao.cmd
+    assert tao.cmd_integer is cmd_integer
+    with pytest.raises(RuntimeError):
+        tao.cmd_real('bad')
+
+    replayed = session(TaoReplay(path))
+    for a, b in zip(recorded, replayed):
+        if isinstance(a, np.ndarray):
+            assert a.dtype == b.dtype
+            np.testing.assert_array_equal(a, b)
+        else:
+            assert a == b
+    assert replayed[-1] is None
@@ -0,0 +1,30 @@
+import json
+
+from pytao.tao_ctypes.stats import TaoStats, command_verb
+
+
+def test_command_verb():
+    assert command_verb('python lat_list -array_out 1@0>>*|model ele.s') == 'python lat_list'
+    assert command_verb('set ele Q1 k1 = 0.1') == 'set'
+    assert command_verb('') == ''
+
+
+def test_tao_stats():
+    stats = TaoStats()
+    timer = stats.timer('python lat_list 1@0>>*|model ele.s')
+    timer.lap('libtao')
+    timer.lap('output')
+    stats.add('python lat_list 1@0>>*|model ele.s', 'parse', 0.5)
+    stats.timer('set global plot_on = F').hit()
+
+    d = stats.as_dict()
+    assert d['python lat_list']['count'] == 1
+    assert d['python lat_list']['parse'] == 0.5
+    assert d['python lat_list']['total'] >= 0.5
+    assert d['set']['cache_hits'] == 1
+
+    assert json.loads(stats.to_json()) == d
+    lines = stats.to_csv().splitlines()
+    assert lines[0].startswith('verb,count,cache_hits')
+    # Slowest first
+    assert lines[1].startswith('python lat_list,1')
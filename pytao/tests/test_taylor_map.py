@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from pytao.util.parsers import parse_taylor_map
+from pytao.util.taylor_map import TaylorMap, taylor_map_arrays
+
+
+def taylor_map_lines(order, seed=0):
+    rng = np.random.default_rng(seed)
+    expns = [e for e in itertools.product(range(order + 1), repeat=6) if sum(e) <= order]
+    lines = []
+    for out in range(1, 7):
+        # Not all terms in every output
+        for i, expn in enumerate(expns, 1):
+            if rng.random() < 0.7:
+                lines.append(f'{out};{i};{rng.normal(): .16E};' + ';'.join(map(str, expn)))
+    return lines
+
+
+def evaluate_terms(tt, x):
+    out = np.zeros_like(x)
+    for i, terms in tt.items():
+        for expn, coef in terms.items():
+            out[:, i-1] += coef * np.prod(x**np.array(expn), axis=1)
+    return out
+
+
+def test_parse_taylor_map():
+    lines = ['1;1; 1.0000000000000000E+00;1;0;0;0;0;0',
+             '2;1;-2.5000000000000000E-01;3;0;0;0;0;0',
+             '2;2; 5.0000000000000000E-01;0;1;0;0;0;1']
+    tt = parse_taylor_map(lines)
+    assert tt == {1: {(1, 0, 0, 0, 0, 0): 1.0},
+                  2: {(3, 0, 0, 0, 0, 0): -0.25, (0, 1, 0, 0, 0, 1): 0.5},
+                  3: {}, 4: {}, 5: {}, 6: {}}
+    tmap = parse_taylor_map(lines, as_array=True)
+    assert len(tmap) == 3
+    assert tmap.order == 3
+    assert tmap.to_dict() == tt
+
+
+@pytest.mark.parametrize('order', [1, 3])
+def test_taylor_map_evaluate(order):
+    lines = taylor_map_lines(order)
+    tt = parse_taylor_map(lines)
+    tmap = TaylorMap.from_lines(lines)
+    assert TaylorMap.from_dict(tt).to_dict() == tmap.to_dict() == tt
+
+    x = np.random.default_rng(1).normal(size=(50, 6)) * 0.1
+    expected = evaluate_terms(tt, x)
+    np.testing.assert_allclose(tmap.evaluate(x), expected, rtol=1e-12, atol=1e-14)
+    np.testing.assert_allclose(tmap.evaluate(x[3]), expected[3], rtol=1e-12, atol=1e-14)
+
+
+def test_taylor_map_evaluate_chunks(monkeypatch):
+    from pytao.util import taylor_map
+    lines = taylor_map_lines(2)
+    tmap = TaylorMap.from_lines(lines)
+    x = np.random.default_rng(2).normal(size=(1000, 6))
+    expected = tmap.evaluate(x)
+    monkeypatch.setattr(taylor_map, 'EVALUATE_CHUNK_SIZE', 1)
+    np.testing.assert_allclose(TaylorMap.from_lines(lines).evaluate(x), expected, rtol=1e-14)
+
+
+def test_taylor_map_errors():
+    tmap = TaylorMap.from_lines([])
+    assert tmap.order == 0
+    np.testing.assert_array_equal(tmap.evaluate(np.ones((2, 6))), np.zeros((2, 6)))
+    with pytest.raises(ValueError):
+        tmap.evaluate(np.ones((2, 5)))
+    with pytest.raises(ValueError):
+        TaylorMap(np.zeros((3, 6)), np.zeros((2, 6)))
+    with pytest.raises(ValueError):
+        parse_taylor_map(['1;1;1.0;1;0;0'])
+
+
+def test_taylor_map_arrays_fallback():
+    lines = taylor_map_lines(3)
+    # Extra fields are ignored, as in the dict parser
+    extra = [line + ';x' for line in lines]
+    i_out, coef, exponents = taylor_map_arrays(lines)
+    for a, b in zip(taylor_map_arrays(extra), (i_out, coef, exponents)):
+        np.testing.assert_array_equal(a, b)
+    assert TaylorMap.from_lines(lines).to_dict() == parse_taylor_map(lines)
@@ -0,0 +1,101 @@
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+from pytao.tao_ctypes import util
+from pytao.tao_ctypes.util import parse_pytype, parse_tao_python_data, parse_tao_python_data1
+
+
+LINES = [
+    'eta_x;REAL;F;  9.0969865321048662E+00',
+    'n_slice;INT;T;20',
+    'is_on;LOGIC;T;T',
+    'field_calc;ENUM;T;Bmad_Standard',
+    'descrip;STR;T;a;b',
+    'beam_file;FILE;T;',
+    'mat.xx;REAL;T;1.5',
+    'vec;REAL_ARR;T;1.0;2.0;3.0',
+    'z;COMPLEX;F;1.0;2.0',
+    'ab;STRUCT;T;x;REAL;1.0;n;INT;3',
+]
+
+
+def parse_by_line(lines, clean_key=True):
+    dat = {}
+    for line in lines:
+        dat.update(parse_tao_python_data1(line, clean_key))
+    return dat
+
+
+def assert_same(d1, d2):
+    assert list(d1) == list(d2)
+    for key in d1:
+        assert type(d1[key]) == type(d2[key])
+        if isinstance(d1[key], np.ndarray):
+            np.testing.assert_array_equal(d1[key], d2[key])
+        else:
+            assert d1[key] == d2[key]
+
+
+@pytest.mark.parametrize('clean_key', [True, False])
+def test_parse_tao_python_data(clean_key):
+    expected = parse_by_line(LINES, clean_key)
+    # Compiles, then uses the cached schema
+    assert_same(parse_tao_python_data(LINES, clean_key), expected)
+    assert_same(parse_tao_python_data(LINES, clean_key), expected)
+    assert ('mat_xx' in expected) == clean_key
+    assert expected['descrip'] == ['a', 'b']
+    assert expected['ab'] == {'x': 1.0, 'n': 3}
+    assert expected['z'] == complex(1, 2)
+
+
+def test_parse_tao_python_data_schema_change():
+    lines1 = ['a;REAL;T;1.0', 'b;INT;T;2']
+    lines2 = ['a;REAL;T;1.0', 'b;REAL;F;2.5']
+    assert parse_tao_python_data(lines1) == {'a': 1.0, 'b': 2}
+    assert parse_tao_python_data(lines2) == {'a': 1.0, 'b': 2.5}
+    assert parse_tao_python_data(lines1) == {'a': 1.0, 'b': 2}
+
+
+def test_parse_tao_python_data_duplicates():
+    lines = ['a;REAL;T;1.0', 'b;INT;T;2', 'a;REAL;T;3.0']
+    assert_same(parse_tao_python_data(lines), parse_by_line(lines))
+
+
+def test_parse_tao_python_data_no_value():
+    lines = ['a;REAL;T;1.0', 'b;STR;T']
+    assert parse_tao_python_data(lines) == {'a': 1.0, 'b': []}
+    assert parse_tao_python_data([]) == {}
+
+
+def test_parse_tao_python_data_schema_cache_size():
+    util._SCHEMAS.clear()
+    for i in range(util._MAX_SCHEMAS + 10):
+        assert parse_tao_python_data([f'a{i};INT;T;{i}']) == {f'a{i}': i}
+    assert len(util._SCHEMAS) == util._MAX_SCHEMAS
+
+
+def test_parse_tao_python_data_threads():
+    util._SCHEMAS.clear()
+
+    def parse(j):
+        # Each thread evicts schemas of the others
+        for i in range(util._MAX_SCHEMAS):
+            assert parse_tao_python_data([f'a{j}_{i};INT;T;{i}']) == {f'a{j}_{i}': i}
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        for future in [executor.submit(parse, j) for j in range(8)]:
+            future.result()
+    assert len(util._SCHEMAS) == util._MAX_SCHEMAS
+
+
+def test_parse_pytype():
+    assert parse_pytype('REAL', ['1.5']) == 1.5
+    assert parse_pytype('INUM', '3') == 3
+    assert parse_pytype('LOGIC', 'F') is False
+    assert parse_pytype('SPECIES', ['electron']) == 'electron'
+    with pytest.raises(ValueError):
+        parse_pytype('NOT_A_TYPE', '1')
+    with pytest.raises(ValueError):
+        parse_tao_python_data(['a;NOT_A_TYPE;T;1'])
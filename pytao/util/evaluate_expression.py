@@ -1,34 +1,154 @@
+'''
+Safe evaluation of arithmetic expressions, like "2*sqrt(k1) + pi".
+
+Expressions are parsed once, checked against a whitelist of syntax and
+functions, compiled, and cached. They can be evaluated on floats with the
+math functions, or on whole NumPy arrays with the equivalent ufuncs.
+'''
+import ast
 import math
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+
+def _factorial(x):
+    """
+    math.factorial, also for integral floats, as in Tao data, and the gamma function
+    for other floats. math.factorial rejects floats since Python 3.10.
+    """
+    if float(x).is_integer():
+        return math.factorial(int(x))
+    return math.gamma(x + 1)
+
+
 local_funcs = {
-    "acos": math.acos, 
-    "acosh": math.acosh, 
-    "asin": math.asin, 
-    "asinh": math.asinh, 
-    "atan": math.atan, 
-    "atan2": math.atan2, 
-    "atanh": math.atanh, 
-    "ceil": math.ceil, 
-    "cos": math.cos, 
-    "cosh": math.cosh, 
+    "acos": math.acos,
+    "acosh": math.acosh,
+    "asin": math.asin,
+    "asinh": math.asinh,
+    "atan": math.atan,
+    "atan2": math.atan2,
+    "atanh": math.atanh,
+    "ceil": math.ceil,
+    "cos": math.cos,
+    "cosh": math.cosh,
     "degrees": math.degrees,
     "e_log": math.e,
-    "erf": math.erf, 
-    "erfc": math.erfc, 
-    "exp": math.exp, 
-    "factorial": math.factorial, 
-    "floor": math.floor, 
-    "gamma": math.gamma, 
-    "log": math.log, 
-    "log10": math.log10, 
-    "pi": math.pi, 
-    "pow": math.pow, 
-    "radians": math.radians, 
-    "sin": math.sin, 
-    "sinh": math.sinh, 
+    "erf": math.erf,
+    "erfc": math.erfc,
+    "exp": math.exp,
+    "factorial": _factorial,
+    "floor": math.floor,
+    "gamma": math.gamma,
+    "log": math.log,
+    "log10": math.log10,
+    "pi": math.pi,
+    "pow": math.pow,
+    "radians": math.radians,
+    "sin": math.sin,
+    "sinh": math.sinh,
     "sqrt": math.sqrt,
     "tan": math.tan,
     "tanh": math.tanh}
 
-def eval_expr(expr):
-  if "__" in expr or "=" in expr: raise  # Disallow unsafe evaluations.
-  return eval(expr, local_funcs)
+# Equivalents of local_funcs that work element-wise on arrays
+numpy_funcs = {
+    "acos": np.arccos,
+    "acosh": np.arccosh,
+    "asin": np.arcsin,
+    "asinh": np.arcsinh,
+    "atan": np.arctan,
+    "atan2": np.arctan2,
+    "atanh": np.arctanh,
+    "ceil": np.ceil,
+    "cos": np.cos,
+    "cosh": np.cosh,
+    "degrees": np.degrees,
+    "e_log": np.e,
+    "erf": np.vectorize(math.erf, otypes=[float]),
+    "erfc": np.vectorize(math.erfc, otypes=[float]),
+    "exp": np.exp,
+    "factorial": np.vectorize(_factorial, otypes=[float]),
+    "floor": np.floor,
+    "gamma": np.vectorize(math.gamma, otypes=[float]),
+    "log": np.log,
+    "log10": np.log10,
+    "pi": np.pi,
+    "pow": np.power,
+    "radians": np.radians,
+    "sin": np.sin,
+    "sinh": np.sinh,
+    "sqrt": np.sqrt,
+    "tan": np.tan,
+    "tanh": np.tanh}
+
+# Maximum number of compiled expressions kept by compile_expr
+EXPR_CACHE_SIZE = 256
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+if sys.version_info < (3, 8):
+    # Numbers are parsed as ast.Num before Python 3.8
+    _ALLOWED_NODES += (ast.Num,)
+
+
+def _check_node(node, expr):
+    if not isinstance(node, _ALLOWED_NODES):
+        raise ValueError(f'{type(node).__name__} is not allowed in expression: {expr}')
+    if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+        raise ValueError(f'Only numbers are allowed in expression: {expr}')
+    if sys.version_info < (3, 8) and isinstance(node, ast.Num) and not isinstance(node.n, (int, float)):
+        raise ValueError(f'Only numbers are allowed in expression: {expr}')
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or not callable(local_funcs.get(node.func.id)):
+            raise ValueError(f'Only calls of {sorted(k for k, v in local_funcs.items() if callable(v))} are allowed in expression: {expr}')
+        if node.keywords:
+            raise ValueError(f'Keyword arguments are not allowed in expression: {expr}')
+    if isinstance(node, ast.Name) and node.id.startswith('_'):
+        raise ValueError(f'Names starting with _ are not allowed in expression: {expr}')
+
+
+@lru_cache(maxsize=EXPR_CACHE_SIZE)
+def compile_expr(expr):
+    '''
+    Parses expr, checks that it only uses arithmetic, comparisons, numbers,
+    names and calls of the functions in local_funcs, and compiles it.
+
+    Returns the code object. Results are cached.
+    Raises ValueError for expressions that are not allowed, and SyntaxError.
+    '''
+    tree = ast.parse(expr.strip(), mode='eval')
+    for node in ast.walk(tree):
+        _check_node(node, expr)
+    return compile(tree, '<expression>', 'eval')
+
+
+def eval_expr(expr, variables=None, *, use_numpy=None):
+    '''
+    Evaluates an arithmetic expression, like "2*sqrt(k1) + pi".
+
+    expr: expression string. See compile_expr for what is allowed.
+    variables: optional dict of name: value for the other names in expr.
+        Values can be NumPy arrays, to evaluate over whole arrays.
+        Names of local_funcs, like sin or pi, raise a ValueError.
+    use_numpy: if True, the functions are NumPy ufuncs (see numpy_funcs).
+        By default, they are used if any variable is an array,
+        and the math functions otherwise.
+    '''
+    code = compile_expr(expr)
+    if use_numpy is None:
+        use_numpy = variables is not None and any(isinstance(v, np.ndarray) for v in variables.values())
+    funcs = numpy_funcs if use_numpy else local_funcs
+    namespace = {'__builtins__': {}}
+    if variables:
+        shadowed = sorted(set(variables) & set(funcs))
+        if shadowed:
+            raise ValueError(f'Variable names {shadowed} are reserved for functions and constants')
+        namespace.update(variables)
+    namespace.update(funcs)
+    return eval(code, namespace)
@@ -1,10 +1,128 @@
 '''
 This module defines the lat_element class, representing a single lattice
-element in tao
+element in tao, and the element_cache that lat_element uses to avoid
+fetching the same element again until the lattice changes.
 '''
+import copy
+import weakref
+from collections import OrderedDict
+
 from .parameters import tao_parameter
 from .parameters import tao_parameter_dict
 
+
+class element_cache():
+    '''
+    LRU cache of the output of 'python ele:...' commands, and of the
+    lat_element head data parsed from it, for one tao_interface.
+
+    All entries are dropped when the lattice generation of the pipe
+    (pipe.generation) changes. Pipes without a generation are not cached.
+
+    Init arguments:
+    pipe: the tao_interface object to use for fetching the element info
+    maxsize: maximum number of cached elements
+    '''
+    def __init__(self, pipe, maxsize=256):
+        self._pipe = weakref.ref(pipe)
+        self.maxsize = maxsize
+        self.generation = None
+        self._data = OrderedDict()
+
+    def element(self, ele_id):
+        '''
+        Returns the dict of cached data of the element ele_id, in the form
+        uni@branch>>ele_ix|which, after checking the generation.
+        '''
+        generation = getattr(self._pipe(), 'generation', None)
+        if generation is None or generation != self.generation:
+            self._data.clear()
+            self.generation = generation
+        d = self._data.get(ele_id)
+        if d is None:
+            d = {}
+            if generation is not None and self.maxsize > 0:
+                self._data[ele_id] = d
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        else:
+            self._data.move_to_end(ele_id)
+        return d
+
+    def cmd_in(self, ele_id, sub, args=''):
+        '''
+        Returns the output string of 'python ele:{sub} {ele_id} {args}'
+        '''
+        d = self.element(ele_id)
+        key = (sub, args)
+        if key not in d:
+            cmd = f'python ele:{sub} {ele_id} {args}'.rstrip()
+            d[key] = self._pipe().cmd_in(cmd)
+        return d[key]
+
+    def clear(self):
+        self._data.clear()
+
+
+_ELEMENT_CACHES = weakref.WeakKeyDictionary()
+
+
+def get_element_cache(pipe):
+    '''
+    Returns the element_cache of pipe, creating it on first use.
+    '''
+    try:
+        return _ELEMENT_CACHES[pipe]
+    except KeyError:
+        cache = _ELEMENT_CACHES[pipe] = element_cache(pipe)
+        return cache
+    except TypeError:
+        # Not weak referenceable, so not cached
+        return element_cache(pipe, maxsize=0)
+
+
+def _parse_head(data_list, which):
+    '''
+    Splits the lines of 'python ele:head' into the param, has and num lines.
+    '''
+    p_list = [] # For parameters
+    h_list = [] # For has#...
+    n_list = [] # For num#...
+    # All elements have gen_attribs:
+    h_list.append("gen_attribs;LOGIC;F;T")
+    for item in data_list:
+        if item.find("has#") != -1:
+            h_list.append(item[4:])
+        elif item.find("num#") != -1:
+            n_list.append(item[4:])
+        else:
+            # Manually set can_vary to F for base and design
+            if which != "model":
+                item_parts = item.split(';')
+                item = ""
+                for i in range(len(item_parts)):
+                    if i != 2:
+                        item += item_parts[i] + ';'
+                    else:
+                        item += 'F;'
+                # Remove extra ;
+                item = item[:-1]
+            p_list.append(item)
+
+    return tao_parameter_dict(p_list), tao_parameter_dict(h_list), tao_parameter_dict(n_list)
+
+
+# Parameter types whose value is a list, of components or numbers
+_LIST_TYPES = ('STRUCT', 'REAL_ARR')
+
+
+def _copy_dict(d):
+    # The GUI replaces and changes the parameters of its element,
+    # and the components of STRUCTs, so each lat_element gets its own copies
+    return OrderedDict((k, copy.deepcopy(v) if v.type in _LIST_TYPES else copy.copy(v))
+                       for k, v in d.items())
+
+
 class lat_element():
     '''
     Holds the essential information for a given lattice element.
@@ -16,6 +134,13 @@ class lat_element():
         This holds whether or not this element has a given property
     self.num: An ordered dictionary of ints
         This holds the number of something this element has
+    self.twiss, self.orbit, self.mat6: Ordered dictionaries of tao_parameters
+        from python ele:twiss, ele:orbit and ele:mat6.
+        These are only fetched when accessed.
+
+    The output of 'python ele:...' commands is cached per pipe until
+    the lattice changes (see element_cache), so elements are only
+    fetched from tao once per lattice generation.
 
     Init arguments:
     u_ix: the universe index of the desired element
@@ -30,34 +155,41 @@ class lat_element():
         self.pipe = pipe
         self.id = str(u_ix) + '@' + str(ix_branch) \
                 + '>>' + str(ix_ele) + '|' + which
-        fetch_cmd = "python ele:head " + self.id
-        data_list = self.pipe.cmd_in(fetch_cmd)
-        data_list = data_list.splitlines()
-
-        p_list = [] # For parameters
-        h_list = [] # For has#...
-        n_list = [] # For num#...
-        # All elements have gen_attribs:
-        h_list.append("gen_attribs;LOGIC;F;T")
-        for item in data_list:
-            if item.find("has#") != -1:
-                h_list.append(item[4:])
-            elif item.find("num#") != -1:
-                n_list.append(item[4:])
-            else:
-                # Manually set can_vary to F for base and design
-                if which != "model":
-                    item_parts = item.split(';')
-                    item = ""
-                    for i in range(len(item_parts)):
-                        if i != 2:
-                            item += item_parts[i] + ';'
-                        else:
-                            item += 'F;'
-                    # Remove extra ;
-                    item = item[:-1]
-                p_list.append(item)
-
-        self.params = tao_parameter_dict(p_list)
-        self.has = tao_parameter_dict(h_list)
-        self.num = tao_parameter_dict(n_list)
+        self._cache = get_element_cache(pipe)
+
+        d = self._cache.element(self.id)
+        if 'head' not in d:
+            data_list = self.cmd_in('head').splitlines()
+            d['head'] = _parse_head(data_list, which)
+        params, has, num = d['head']
+
+        self.params = _copy_dict(params)
+        self.has = _copy_dict(has)
+        self.num = _copy_dict(num)
+
+    def cmd_in(self, sub, args=''):
+        '''
+        Returns the (cached) output string of: python ele:{sub} {self.id} {args}
+        Example:
+            element.cmd_in('mat6', 'vec0')
+        '''
+        return self._cache.cmd_in(self.id, sub, args)
+
+    def block(self, sub, args=''):
+        '''
+        Returns the output of python ele:{sub} as an ordered dictionary
+        of tao_parameters.
+        '''
+        return tao_parameter_dict(self.cmd_in(sub, args).splitlines())
+
+    @property
+    def twiss(self):
+        return self.block('twiss')
+
+    @property
+    def orbit(self):
+        return self.block('orbit')
+
+    @property
+    def mat6(self):
+        return self.block('mat6', 'mat6')
@@ -28,6 +28,30 @@ tao_startup_param_list = [
 
 #-------------------------------------------------
 
+# Types whose value is kept as given
+_UNCONVERTED_TYPES = frozenset(['STR', 'FILE', 'DAT_TYPE', 'DAT_TYPE_Z', 'DAT_TYPE_E',
+        'ELE_PARAM',
+        'REAL_ARR', 'ENUM', 'ENUM_Z', 'STRUCT', 'COMPONENT', 'SPECIES'])
+
+def _to_int(x):
+    try:
+        return int(x)
+    except:
+        return None
+
+def _to_float(x):
+    try:
+        return float(x)
+    except:
+        return None
+
+def _to_bool(x):
+    return x == 'T'
+
+# Types whose value is converted from the string, on first access
+_CONVERTERS = {'INT': _to_int, 'INUM': _to_int, 'REAL': _to_float, 'LOGIC': _to_bool}
+
+
 class tao_parameter():
     '''
     Basic class for holding the properties of a parameter in Tao.
@@ -42,10 +66,15 @@ class tao_parameter():
     value:          The value held in the parameter, should be of the
                     appropriate type for the specified param_type
                     (or 'T'/'F' for LOGIC)
+                    INT, INUM, REAL and LOGIC values are converted from the
+                    string when first accessed.
     NOTE: It is unclear if sub_param is actually ever set by a Tao python command. -- DCS 11/2020
     sub_param:      The name of the sub_parameter associated with this parameter,
                     For example: ele_name has the sub parameter ix_ele.
     '''
+    # Many of these are held by the GUI, so there is no instance __dict__.
+    # _convert is the converter for the string in _value, or None once converted.
+    __slots__ = ('prefix', 'name', 'type', 'can_vary', 'is_ignored', 'sub_param', '_value', '_convert')
 
     def __init__(self, param_name, param_type, can_vary, param_value, sub_param=None):
         # Enums and inums may have a prefix attached to their name, as in
@@ -61,29 +90,25 @@ class tao_parameter():
         self.is_ignored = (can_vary == 'I')
         self.sub_param = sub_param #associated sub_parameter (name)
 
-        if param_type in ['STR', 'FILE', 'DAT_TYPE', 'DAT_TYPE_Z', 'DAT_TYPE_E',
-                'ELE_PARAM',
-                'REAL_ARR', 'ENUM', 'ENUM_Z', 'STRUCT', 'COMPONENT', 'SPECIES']:
-            self.value = param_value
-        elif param_type == 'INT':
-            try:
-                self.value = int(param_value)
-            except:
-                self.value = None
-        elif param_type == 'REAL':
-            try:
-                self.value = float(param_value)
-            except:
-                self.value = None
-        elif param_type == 'LOGIC':
-            self.value = (param_value == 'T')
-        elif param_type == 'INUM':
-            try:
-                self.value = int(param_value)
-            except:
-                self.value = None
-        else:
+        self._value = param_value
+        self._convert = _CONVERTERS.get(param_type)
+        if (self._convert is None) and (param_type not in _UNCONVERTED_TYPES):
             print ('UNKNOWN PARAMETER TYPE: ' + param_type)
+            self._value = None
+
+    @property
+    def value(self):
+        # The type may be changed after construction (by the GUI),
+        # the value is converted according to the original type.
+        if self._convert is not None:
+            self._value = self._convert(self._value)
+            self._convert = None
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self._convert = None
 
     def __str__(self):
         return str(self.value)
@@ -124,9 +149,13 @@ def tao_parameter_dict(param_list):
     '''
     this_dict = OrderedDict()
     for param_str in param_list:
-        if param_str.strip() == '': continue
         v = param_str.split(';')
-        this_dict[v[0]] = str_to_tao_param(param_str)
+        if len(v) == 4 and v[1] not in ('REAL_ARR', 'STRUCT'):
+            # Most common case: name;type;can_vary;value
+            this_dict[v[0]] = tao_parameter(*v)
+            continue
+        if param_str.strip() == '': continue
+        this_dict[v[0]] = _split_to_tao_param(v, param_str)
     return this_dict
 
 #
@@ -137,7 +166,12 @@ def str_to_tao_param(param_str):
     and returns a tao_parameter instance
     param_str MUST have at least 3 semicolons
     '''
-    v = param_str.split(';')
+    return _split_to_tao_param(param_str.split(';'), param_str)
+
+def _split_to_tao_param(v, param_str):
+    '''
+    str_to_tao_param, with v = param_str.split(';')
+    '''
     if len(v) < 3:
         msg = str(param_str) + " is not a valid param_string (not enough semicolons)"
         raise InvalidParamError(msg)
@@ -1,5 +1,10 @@
+import warnings
+from itertools import repeat
+
 import numpy as np
 
+from pytao.util.taylor_map import TaylorMap, taylor_map_arrays
+
 
 
 # Helpers
@@ -34,9 +39,11 @@ DATA_D_COLS =  ['ix_d1',
  'good_user',
  'weight',
  'exists']
-DATA_D_TYPES = [int, str, str, str, str, str, float, float, float, bool, bool, bool, float, bool]
+DATA_D_TYPES = [int, str, str, str, str, str, float, float, float, _parse_str_bool, _parse_str_bool, _parse_str_bool, float, _parse_str_bool]
+
+DATA_D_LAYOUTS = ('dicts', 'columns', 'structured', 'dataframe')
 
-def parse_data_d_array(lines):
+def parse_data_d_array(lines, layout='dicts'):
     """
     Parses the output of the 'python data_d_array' command into a list of dicts. 
     
@@ -48,11 +55,22 @@ def parse_data_d_array(lines):
     dat = parse_data_d_array(lines)
     df = pd.DataFrame(dat)
     
+    For large data arrays, the columnar layouts are much faster:
+    
+    lines = tao.cmd('python data_d_array 1@orbit.x')
+    cols = parse_data_d_array(lines, layout='columns')
+    cols['model_value'] # np.ndarray of floats
+    
     
     Parameters
     ----------
     lines : list of str
         The output of the 'python data_d_array' command to parse
+    layout : str, optional
+        'dicts': list of dicts, one per datum (default)
+        'columns': dict of 1-D arrays, one per column
+        'structured': NumPy structured array, with a field per column
+        'dataframe': pandas DataFrame. pandas must be installed.
     
     Returns
     -------
@@ -63,28 +81,118 @@ def parse_data_d_array(lines):
             'meas_value', 'model_value', 'design_value', 
             'useit_opt', 'useit_plot', 'good_user', 
             'weight', 'exists'
+        or the same columns in the requested layout.
     
     """ 
-    result = []
-    for line in lines:
-        d = {}
-        result.append(d)
-        vals = line.split(';')
-        for name, typ, val in zip(DATA_D_COLS, DATA_D_TYPES, vals):
-            d[name] = typ(val)
-        
-    return result
+    if layout not in DATA_D_LAYOUTS:
+        raise ValueError(f'Unknown layout: {layout}. Must be one of: {DATA_D_LAYOUTS}')
+    
+    fields = _data_d_fields(lines)
+    
+    if layout == 'dicts':
+        cols = [_parse_list(typ, strs) for typ, strs in zip(DATA_D_TYPES, fields)]
+        return [dict(zip(DATA_D_COLS, row)) for row in zip(*cols)]
+    
+    columns = {name:_COLUMN_PARSERS[typ](strs) for name, typ, strs in zip(DATA_D_COLS, DATA_D_TYPES, fields)}
+    if layout == 'columns':
+        return columns
+    if layout == 'structured':
+        return columns_to_structured(columns)
+    
+    import pandas as pd
+    return pd.DataFrame(columns)
 
 
+def _data_d_fields(lines):
+    """
+    Splits data_d_array lines into a list of string lists, one per column.
+    
+    All lines are split at once, when they have the expected number of fields.
+    """
+    ncol = len(DATA_D_COLS)
+    vals = ';'.join(lines).split(';') if lines else []
+    if len(vals) == len(lines)*ncol:
+        return [vals[i::ncol] for i in range(ncol)]
+    
+    # Extra fields are ignored
+    rows = [line.split(';') for line in lines]
+    for line, row in zip(lines, rows):
+        if len(row) < ncol:
+            raise ValueError(f'Expected {ncol} fields in data_d_array line: {line}')
+    return [[row[i] for row in rows] for i in range(ncol)]
 
-def parse_derivative(lines):
+
+def _parse_list(typ, strs):
+    """
+    Parses a list of strings with typ, parsing each distinct bool string once.
+    """
+    if typ is str:
+        return strs
+    if typ is _parse_str_bool:
+        lookup = {s:_parse_str_bool(s) for s in set(strs)}
+        return list(map(lookup.__getitem__, strs))
+    return list(map(typ, strs))
+
+
+def _bool_array(strs):
+    return np.fromiter(_parse_list(_parse_str_bool, strs), dtype=bool, count=len(strs))
+
+
+_COLUMN_PARSERS = {
+    int: lambda strs: np.array(strs, dtype=int),
+    float: lambda strs: np.array(strs, dtype=float),
+    str: lambda strs: np.array(strs, dtype=str),
+    _parse_str_bool: _bool_array,
+}
+
+
+def columns_to_structured(columns):
+    """
+    Converts a dict of 1-D arrays of the same length to a NumPy structured array.
+    """
+    dtype = [(name, arr.dtype) for name, arr in columns.items()]
+    n = len(next(iter(columns.values()))) if columns else 0
+    out = np.empty(n, dtype=dtype)
+    for name, arr in columns.items():
+        out[name] = arr
+    return out
+
+
+
+def _fromstring(s, count):
+    """
+    Parses count numbers from a ';' separated string.
+    """
+    with warnings.catch_warnings():
+        # Unparsable data is a DeprecationWarning, and will be an error in future NumPy
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            x = np.fromstring(s, sep=';')
+        except (ValueError, DeprecationWarning) as ex:
+            raise ValueError(f'Cannot parse numbers: {ex}')
+    if len(x) != count:
+        raise ValueError(f'Expected {count} numbers, parsed {len(x)}')
+    return x
+
+
+def parse_derivative(lines, sparse=False):
     """
     Parses the output of tao python derivative
     
+    Each line has the form:
+        {ix_uni};{ix_dModel};{ix_dVar};{value};{value};...
+    where the values are for consecutive variables, starting at ix_dVar.
+    
     Parameters
     ----------
     lines : list of str
         The output of the 'python derivative' command to parse
+    sparse : bool, optional
+        If True, the matrices are scipy.sparse CSR matrices,
+        without the entries that are exactly zero. 
+        Requires scipy.
+        This is not faster than dense parsing, which is dominated by the
+        text conversion. It only saves memory for large, mostly zero matrices.
     
     Returns
     -------
@@ -92,35 +200,47 @@ def parse_derivative(lines):
         Dictionary with keys corresponding to universe indexes (int),
         with dModel_dVar as the value:
             np.ndarray with shape (n_data, n_var)    
-    """
-    universes = {}
-
-    # Build up matrices
-    for line in lines:
-        x = line.split(';')
-        if len(x) <= 1:
-            continue
-        iu = int(x[0])
-          
-        if iu not in universes:
-            # new universe
-            rows = universes[iu] = []
-            rowdat = []
-            row_id = int(x[1])
         
-        if int(x[1]) == row_id:
-            # accumulate more data
-            rowdat += x[3:]     
-        else:
-            # Finish row
-            rows.append(rowdat)   
-            rowdat = x[3:]  
-            row_id = int(x[1])
-           
-    # cast to float    
+        Rows are the data and columns the variables used in the optimization.
+        See tao.derivative_labels for their names.
+    """
+    lines = [line for line in lines if ';' in line]
+    if not lines:
+        return {}
+    
+    # Parse everything at once, then pick out the 3 header numbers of each line
+    n_fields = np.fromiter(map(str.count, lines, repeat(';')), dtype=np.intp, count=len(lines)) + 1
+    flat = _fromstring(';'.join(lines), n_fields.sum())
+    starts = np.cumsum(n_fields) - n_fields
+    iu, id, iv0 = (flat[starts + i].astype(int) for i in range(3))
+    is_value = np.ones(len(flat), dtype=bool)
+    for i in range(3):
+        is_value[starts + i] = False
+    vals = flat[is_value]
+    
+    # Row and column of each value
+    n_vals = n_fields - 3
+    line_of = np.repeat(np.arange(len(lines)), n_vals)
+    offset = np.arange(len(vals)) - np.repeat(np.cumsum(n_vals) - n_vals, n_vals)
+    rows = id[line_of] - 1
+    cols = iv0[line_of] - 1 + offset
+    unis = iu[line_of]
+    
+    if sparse:
+        from scipy.sparse import csr_matrix
+    
     out = {}
-    for iu, vals in universes.items():
-        out[iu] = np.array(vals).astype(float)
+    for u in dict.fromkeys(iu.tolist()):
+        sel = unis == u
+        r, c, v = rows[sel], cols[sel], vals[sel]
+        shape = (r.max() + 1, c.max() + 1) if len(v) else (0, 0)
+        if sparse:
+            nonzero = v != 0
+            m = csr_matrix((v[nonzero], (r[nonzero], c[nonzero])), shape=shape)
+        else:
+            m = np.zeros(shape)
+            m[r, c] = v
+        out[u] = m
         
     return out
 
@@ -240,7 +360,7 @@ def parse_spin_invariant(flat_array):
 
 
     
-def parse_taylor_map(lines):
+def parse_taylor_map(lines, as_array=False):
     """
     Parses the output of the `python taylor_map` command.
     
@@ -248,22 +368,25 @@ def parse_taylor_map(lines):
     ----------
     lines : list of str
         The output of the 'python taylor_map' command to parse
+    as_array : bool, optional
+        If True, return a TaylorMap, with exponent and coefficient arrays
+        and a vectorized evaluate method.
     
     Returns
     -------
     dict of dict of taylor terms:
         {2: { (3,0,0,0,0,0)}: 4.56, ... 
             corresponding to: px_out = 4.56 * x_in^3
-    
+    or TaylorMap if as_array
     
     """
+    i_out, coef, exponents = taylor_map_arrays(lines)
+    if as_array:
+        return TaylorMap.from_terms(i_out, coef, exponents)
+    
     tt = {i:{} for i in range(1,7)}
-    for term_str in lines:
-        t = term_str.split(';')
-        out = int(t[0])
-        coef = float(t[2])
-        exponents =  tuple([int(i) for i in t[3:]])
-        tt[out][exponents] = coef
+    for out, expn, c in zip(i_out.tolist(), map(tuple, exponents.tolist()), coef.tolist()):
+        tt[out][expn] = c
     return tt    
     
     
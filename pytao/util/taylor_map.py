@@ -0,0 +1,214 @@
+'''
+Array representation of a Taylor map from the 'python taylor_map' command.
+'''
+import numpy as np
+
+
+# Number of values in the monomial arrays computed at once by TaylorMap.evaluate.
+# Small enough to stay in cache.
+EVALUATE_CHUNK_SIZE = 2**17
+
+
+def taylor_map_arrays(lines):
+    """
+    Parses the output of the `python taylor_map` command into arrays.
+
+    Each line has the form:
+        {i_out};{i_term};{coef};{e1};{e2};{e3};{e4};{e5};{e6}
+
+    Returns
+    -------
+    i_out : np.ndarray of int, shape (n_lines,)
+    coef : np.ndarray of float, shape (n_lines,)
+    exponents : np.ndarray of int, shape (n_lines, 6)
+    """
+    n = len(lines)
+    if n == 0:
+        return np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, 6), dtype=int)
+    # One vectorized pass over all lines. The integer fields are exact as floats.
+    try:
+        data = np.loadtxt(lines, delimiter=';', ndmin=2)
+    except ValueError:
+        data = None
+    if data is None or data.shape != (n, 9):
+        for line in lines:
+            if len(line.split(';')) < 9:
+                raise ValueError(f'Expected 9 fields in taylor_map line: {line}')
+        data = np.array([line.split(';')[:9] for line in lines], dtype=float)
+    i_out = data[:, 0].astype(int)
+    coef = data[:, 2].copy()
+    exponents = data[:, 3:9].astype(int)
+    return i_out, coef, exponents
+
+
+class TaylorMap:
+    '''
+    Taylor map from 6 phase space coordinates to 6 outputs, stored as arrays.
+
+    exponents:      (n_terms, 6) int array of the exponents of each monomial,
+                    shared by all outputs.
+    coefficients:   (n_terms, 6) float array, with the coefficient of each
+                    monomial for each output. Outputs without a term have 0.
+
+    Output i (0-based) is:
+        sum over t of coefficients[t, i] * prod over j of x[j]**exponents[t, j]
+
+    Example:
+        lines = tao.cmd('python taylor_map beginning end 3')
+        tmap = TaylorMap.from_lines(lines)
+        out = tmap.evaluate(particles)  # particles has shape (n, 6)
+    '''
+
+    def __init__(self, exponents, coefficients):
+        self.exponents = np.asarray(exponents, dtype=int)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        if self.exponents.ndim != 2 or self.exponents.shape[1] != 6:
+            raise ValueError(f'exponents must have shape (n_terms, 6), got {self.exponents.shape}')
+        if self.coefficients.shape != self.exponents.shape:
+            raise ValueError(f'coefficients must have shape {self.exponents.shape}, got {self.coefficients.shape}')
+        self._plan = None
+
+    @classmethod
+    def from_terms(cls, i_out, coef, exponents):
+        """
+        Creates a TaylorMap from the arrays of terms, as returned by taylor_map_arrays.
+        Monomials that appear in several outputs are stored once.
+        """
+        exponents = np.asarray(exponents, dtype=int).reshape(-1, 6)
+        # Each monomial as one integer, with the exponents as digits, which is much
+        # faster than np.unique(axis=0) and sorts the same
+        base = int(exponents.max(initial=0)) + 1
+        keys = exponents @ (base ** np.arange(5, -1, -1))
+        _, first, index = np.unique(keys, return_index=True, return_inverse=True)
+        unique = exponents[first]
+        coefficients = np.zeros((len(unique), 6))
+        # Later duplicates of the same term replace earlier ones, as in parse_taylor_map
+        coefficients[index.reshape(-1), np.asarray(i_out) - 1] = coef
+        # Sort by order, then as np.unique
+        order = np.argsort(unique.sum(axis=1), kind='stable')
+        return cls(unique[order], coefficients[order])
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Creates a TaylorMap from the output of the `python taylor_map` command.
+        """
+        return cls.from_terms(*taylor_map_arrays(lines))
+
+    @classmethod
+    def from_dict(cls, tt):
+        """
+        Creates a TaylorMap from the dict of dict of taylor terms returned
+        by parse_taylor_map (and tao.taylor_map).
+        """
+        i_out = [out for out, terms in tt.items() for _ in terms]
+        coef = [c for terms in tt.values() for c in terms.values()]
+        exponents = [e for terms in tt.values() for e in terms]
+        return cls.from_terms(i_out, coef, np.array(exponents, dtype=int).reshape(-1, 6))
+
+    def to_dict(self):
+        """
+        Returns the map as a dict of dict of taylor terms, as parse_taylor_map.
+        Zero coefficients are not included.
+        """
+        tt = {i:{} for i in range(1, 7)}
+        expn = [tuple(e) for e in self.exponents.tolist()]
+        for i in range(6):
+            for t in np.flatnonzero(self.coefficients[:, i]).tolist():
+                tt[i+1][expn[t]] = float(self.coefficients[t, i])
+        return tt
+
+    @property
+    def order(self):
+        """
+        Maximum order of the terms.
+        """
+        if len(self.exponents) == 0:
+            return 0
+        return int(self.exponents.sum(axis=1).max())
+
+    def __len__(self):
+        return len(self.exponents)
+
+    def __repr__(self):
+        return f'<TaylorMap with {len(self)} terms, order {self.order}>'
+
+    def _evaluation_plan(self):
+        """
+        Returns the plan for computing the monomials, degree by degree:
+            coefficients: coefficients of all monomials needed, with zeros
+                          for the intermediate ones
+            steps: list of (start, stop, parent, var), computing
+                   monomials[start:stop] = monomials[parent] * x[var]
+        Monomial 0 is the constant 1.
+        """
+        if self._plan is not None:
+            return self._plan
+
+        terms = [tuple(e) for e in self.exponents.tolist()]
+        # Close the set under removing one power of the first variable with a nonzero exponent.
+        # That variable is the one multiplied to get the monomial from its parent.
+        step_of = {(0,)*6: (None, -1)}
+        stack = list(terms)
+        while stack:
+            expn = stack.pop()
+            if expn in step_of:
+                continue
+            var = next(j for j, e in enumerate(expn) if e)
+            parent = expn[:var] + (expn[var] - 1,) + expn[var+1:]
+            step_of[expn] = (parent, var)
+            stack.append(parent)
+
+        # Contiguous blocks of the same degree and variable
+        monomials = sorted(step_of, key=lambda e: (sum(e), step_of[e][1]))
+        position = {expn:i for i, expn in enumerate(monomials)}
+        coefficients = np.zeros((len(monomials), 6))
+        coefficients[[position[e] for e in terms]] = self.coefficients
+
+        steps = []
+        start = 1
+        for i in range(2, len(monomials) + 1):
+            if i < len(monomials) and sum(monomials[i]) == sum(monomials[start]) \
+                    and step_of[monomials[i]][1] == step_of[monomials[start]][1]:
+                continue
+            parent = np.array([position[step_of[e][0]] for e in monomials[start:i]])
+            steps.append((start, i, parent, step_of[monomials[start]][1]))
+            start = i
+
+        self._plan = (coefficients, steps)
+        return self._plan
+
+    def evaluate(self, coords):
+        """
+        Applies the map to coordinates.
+
+        Parameters
+        ----------
+        coords : array_like
+            Phase space coordinates (x, px, y, py, z, pz) with shape (6,)
+            or (n, 6), for example a particle array.
+
+        Returns
+        -------
+        np.ndarray with the same shape as coords
+        """
+        coords = np.asarray(coords, dtype=float)
+        if coords.shape[-1] != 6 or coords.ndim > 2:
+            raise ValueError(f'coords must have shape (6,) or (n, 6), got {coords.shape}')
+        x = coords.reshape(-1, 6)
+        n = len(x)
+        out = np.zeros((n, 6))
+        if len(self) == 0:
+            return out.reshape(coords.shape)
+
+        coefficients, steps = self._evaluation_plan()
+        chunk = max(256, EVALUATE_CHUNK_SIZE // len(coefficients))
+        for i0 in range(0, n, chunk):
+            xt = np.ascontiguousarray(x[i0:i0+chunk].T)
+            monomials = np.empty((len(coefficients), xt.shape[1]))
+            monomials[0] = 1
+            for start, stop, parent, var in steps:
+                np.multiply(monomials[parent], xt[var], out=monomials[start:stop])
+            np.matmul(monomials.T, coefficients, out=out[i0:i0+chunk])
+
+        return out.reshape(coords.shape)